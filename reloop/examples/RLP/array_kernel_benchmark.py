@@ -0,0 +1,99 @@
+from reloop.languages.rlp import *
+from reloop.languages.rlp.grounding.block import BlockGrounder
+from reloop.languages.rlp.logkb import NumpyKb
+from rbf_kernel import rbf_kernel, rbf_kernel_blocks
+import multiprocessing
+import numpy as np
+import resource
+import sys
+import time
+
+"""
+Compares grounding the LP-SVM of linear_svm_cora.py with the rbf kernel loaded as n^2 facts into the knowledge base to
+grounding it with the kernel predicate backed by a function computing blocks of the kernel, see
+:func:`.BlockGrounder.add_array_predicate`. The papers have random binary word vectors of the size of Cora, i.e. 1433
+words and 18 words per paper on average. Every grounding runs in a process of its own, such that its peak memory is
+measured separately.
+
+Usage: python array_kernel_benchmark.py [largest number of papers with kernel facts] [number of papers]
+"""
+
+WORDS = 1433
+GAMMA = 0.01
+
+
+def lp_svm(grounder):
+    model = RlpProblem("LP-SVM with an rbf kernel", LpMinimize, grounder, None)
+
+    I, Z, X, J = sub_symbols('I', 'Z', 'X', 'J')
+    weight = numeric_predicate("weight", 1)
+    slack = numeric_predicate("slack", 1)
+    b = numeric_predicate("b", 0)
+    model.add_reloop_variable(weight, slack, b)
+
+    label = numeric_predicate("label", 1)
+    kernel = numeric_predicate("kernel", 2)
+    paper = boolean_predicate("paper", 2)
+
+    model += RlpSum([I, Z], paper(I, Z), slack(I))
+    model += ForAll([I, Z], paper(I, Z),
+                    label(I) * (RlpSum([X, J], paper(X, J), weight(X) * label(X) * kernel(Z, J)) + b()) + slack(I) >= 1)
+    model += ForAll([I, Z], paper(I, Z), slack(I) >= 0)
+    return model, kernel
+
+
+def papers_kb(count):
+    random = np.random.RandomState(0)
+    papers = np.arange(count)
+    vectors = (random.rand(count, WORDS) < 18.0 / WORDS).astype(float)
+
+    logkb = NumpyKb()
+    logkb.load_facts("paper", np.column_stack((papers, papers)))
+    logkb.load_facts("label", np.column_stack((papers, random.choice([-1, 1], count))))
+    return logkb, papers, vectors
+
+
+def ground(count, with_facts, results):
+    logkb, papers, vectors = papers_kb(count)
+    memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+
+    grounder = BlockGrounder(logkb)
+    model, kernel = lp_svm(grounder)
+    if with_facts:
+        for rows, columns, values in rbf_kernel_blocks(vectors, GAMMA):
+            # an object array keeps the ids of the papers integers next to the float values
+            facts = np.empty((len(values), 3), dtype=object)
+            facts[:, 0], facts[:, 1], facts[:, 2] = papers[rows], papers[columns], values
+            logkb.load_facts("kernel", facts)
+    else:
+        grounder.add_array_predicate(kernel, lambda rows, columns: rbf_kernel(vectors, rows, columns, GAMMA),
+                                     papers, papers)
+    lp, varmap = grounder.ground(model)
+
+    # ru_maxrss is given in kilobytes
+    results.put((time.time() - start, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - memory) / 1024.0,
+                 lp[1].nnz))
+
+
+def measure(count, with_facts):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=ground, args=(count, with_facts, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+largest_facts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+largest_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2708
+
+for count in sorted(set([250, 500, 1000, largest_count])):
+    if count > largest_count:
+        continue
+    seconds, megabytes, entries = measure(count, False)
+    line = "{0} papers: {1} entries, array {2:.2f}s +{3:.0f}MB".format(count, entries, seconds, megabytes)
+    if count <= largest_facts:
+        seconds, megabytes, entries = measure(count, True)
+        line += ", facts {0:.2f}s +{1:.0f}MB".format(seconds, megabytes)
+    print line
@@ -28,7 +28,8 @@ given paper_id
 The labels were generated by combining the five least abundant labels to the -1 and the most common label to 1.
 
 Computing the kernel can be achieved in two ways. We provide a pgpsql function for in database computation of the kernel.
-Alternatively you can choose to precompute the kernel with numpy and populate the database before running reloop.
+Alternatively you can choose to precompute the kernel with numpy and populate the database before running reloop, see
+rbf_kernel.py. Kernel values below a threshold can be left out to sparsify the kernel.
 """
 
 db_name = raw_input(
@@ -112,50 +113,21 @@ file.close()
 
 #Kernel Computation
 if raw_input("Do you want to precompute the Kernel ?(y/n)") == 'y':
-    import numpy as np
     import time
-    file = open("../cora/reldata/" + path, "r")
+    from rbf_kernel import word_vectors, copy_kernel
+
+    threshold = float(raw_input("Kernel values up to which threshold should be left out? (0 keeps all values): ") or 0)
     cora_cursor.execute("DROP TABLE IF EXISTS rbf_values;")
     cora_cursor.execute("CREATE TABLE rbf_values (paper1_id int , paper2_id int, rbf_value float );")
     log.info("Starting kernel computation...")
 
-    def rbf_kernel(x, y, gamma=0.01):
-        res = np.linalg.norm(x-y) ** 2
-        res *= -1 * gamma
-        return np.exp(res)
-
-    bin_vectors = {}
+    # the kernel is computed from the word vectors scanned above, block by block, and copied into the database
     start = time.time()
-    for index, line in enumerate(file):
-        temp = line.split(",")
-        paper_id = temp[0]
-        bin_vector = np.array(np.int32(temp[1:len(temp)-1]))
-        bin_vectors[paper_id] = bin_vector
-
-    rbf_values = {}
-
-    i = 0
-    for paper_id, bin_vector in bin_vectors.iteritems():
-        rbf_values[paper_id] = {}
-        for paper_id2, bin_vector2 in bin_vectors.iteritems():
-            rbf_values[paper_id][paper_id2] = rbf_kernel(bin_vector, bin_vector2)
-
-    end = time.time()
-    log.info("Time needed to compute the rbf kernel: " + str(end-start))
-
-    values = []
-    print ("Finished computing kernel values.")
-    for p_id, k_values in rbf_values.iteritems():
-        for paper_id, kernel_value in k_values.iteritems():
-            values.append((p_id, paper_id, kernel_value))
-        i += 1
-        if i % 100 == 0:
-            log.info(str(i) + " papers scanned.")
-
-
-    cora_cursor.execute("INSERT INTO rbf_values VALUES " +  ",".join([ "(" + str(p_id) + ", " + str(paper_id) + ", " + str(kernel_value) + ")" for p_id, paper_id, kernel_value in values]) + ";")
+    paper_ids, vectors = word_vectors([int(paper_id) for paper_id, word_id, value in bin_vectors],
+                                      [int(word_id) for paper_id, word_id, value in bin_vectors])
+    count = copy_kernel(cora_cursor, "rbf_values", paper_ids, vectors, gamma=0.01, threshold=threshold)
+    log.info("Time needed to compute and store " + str(count) + " kernel values: " + str(time.time() - start))
     log.info("Successfully populated " + db_name + " with precomputed kernel values.")
-    file.close()
 
 cora_connection.commit()
 cora_connection.close()
\ No newline at end of file
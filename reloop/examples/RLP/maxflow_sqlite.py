@@ -0,0 +1,89 @@
+from reloop.languages.rlp import *
+from reloop.languages.rlp.grounding.block import BlockGrounder
+from reloop.languages.rlp.grounding.sql import SQLGrounder
+from reloop.languages.rlp.logkb import PyDatalogLogKb, SQLiteKb
+from pyDatalog import pyDatalog
+import numpy as np
+import sys
+import time
+
+"""
+Maxflow example on a synthetic flow network, which uses the embedded SQLite knowledge base. The facts are bulk loaded
+from numpy arrays into an in-memory database (or into a database file) and do not need a database server. The grounding
+time is compared to the one with the PyDatalog knowledge base.
+
+Usage: python maxflow_sqlite.py [number of nodes] [number of edges] [database file]
+
+Facts can also be loaded from csv files, one fact per line:
+
+logkb.load_csv("cost", "cost.csv", numeric=True)
+"""
+
+
+def maxflow(grounder):
+    model = RlpProblem("maxflow on a synthetic flow network", LpMaximize, grounder, None)
+
+    X, Y, Z = sub_symbols('X', 'Y', 'Z')
+
+    flow = numeric_predicate("flow", 2)
+    cost = numeric_predicate("cost", 2)
+    model.add_reloop_variable(flow)
+
+    source = boolean_predicate("source", 1)
+    target = boolean_predicate("target", 1)
+    edge = boolean_predicate("edge", 2)
+    node = boolean_predicate("node", 1)
+
+    model += RlpSum([X, Y], source(X) & edge(X, Y), flow(X, Y))
+
+    outFlow = RlpSum([X, ], edge(X, Z), flow(X, Z))
+    inFlow = RlpSum([Y, ], edge(Z, Y), flow(Z, Y))
+    model += ForAll([Z, ], node(Z) & ~source(Z) & ~target(Z), inFlow >= outFlow)
+    model += ForAll([Z, ], node(Z) & ~source(Z) & ~target(Z), inFlow <= outFlow)
+
+    model += ForAll([X, Y], edge(X, Y), flow(X, Y) >= 0)
+    model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= cost(X, Y))
+    return model
+
+
+def ground(name, grounder):
+    model = maxflow(grounder)
+    start = time.time()
+    lp, varmap = grounder.ground(model)
+    print "{0}: {1:.2f}s for {2} rows and {3} columns".format(name, time.time() - start, lp[1].shape[0],
+                                                             lp[1].shape[1])
+
+
+nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+edges = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+database = sys.argv[3] if len(sys.argv) > 3 else ":memory:"
+
+# a path through all nodes guarantees a flow from the first to the last node
+random = np.random.RandomState(0)
+edge_facts = np.vstack((np.column_stack((np.arange(nodes - 1), np.arange(1, nodes))),
+                        random.randint(0, nodes, size=(edges - nodes + 1, 2))))
+edge_facts = np.unique(edge_facts[edge_facts[:, 0] != edge_facts[:, 1]].view("i8,i8")).view(int).reshape(-1, 2)
+cost_facts = np.column_stack((edge_facts, random.randint(1, 100, size=len(edge_facts))))
+
+start = time.time()
+logkb = SQLiteKb(database)
+logkb.load_facts("node", np.arange(nodes).reshape(-1, 1))
+logkb.load_facts("edge", edge_facts)
+logkb.load_facts("cost", cost_facts, numeric=True)
+logkb.load_facts("source", [(0,)])
+logkb.load_facts("target", [(nodes - 1,)])
+print "SQLite: {0:.2f}s to load {1} edges".format(time.time() - start, len(edge_facts))
+
+start = time.time()
+for x in range(nodes):
+    pyDatalog.assert_fact("node", x)
+for x, y, z in cost_facts.tolist():
+    pyDatalog.assert_fact("edge", x, y)
+    pyDatalog.assert_fact("cost", x, y, z)
+pyDatalog.assert_fact("source", 0)
+pyDatalog.assert_fact("target", nodes - 1)
+print "PyDatalog: {0:.2f}s to assert {1} edges".format(time.time() - start, len(edge_facts))
+
+ground("SQLite, SQLGrounder", SQLGrounder(logkb))
+ground("SQLite, BlockGrounder", BlockGrounder(logkb))
+ground("PyDatalog, BlockGrounder", BlockGrounder(PyDatalogLogKb()))
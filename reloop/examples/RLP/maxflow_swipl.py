@@ -62,7 +62,7 @@ for cost in costs:
 
 
 #prolog.consult("maxflow_swipl.pl")
-logkb = PrologKB(prolog)
+logkb = PrologKB(prolog, cache_tables=True)
 # BlockGrounding not supported yet
 grounder = RecursiveGrounder(logkb)
 solver = CvxoptSolver()
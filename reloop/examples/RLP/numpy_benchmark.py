@@ -0,0 +1,116 @@
+from reloop.languages.rlp import *
+from reloop.languages.rlp.grounding.block import BlockGrounder
+from reloop.languages.rlp.logkb import PyDatalogLogKb, NumpyKb
+from pyDatalog import pyDatalog
+import numpy as np
+import sys
+import time
+
+"""
+Compares the grounding time of the in-memory NumpyKb with the one of the PyDatalog knowledge base, both grounded with
+the BlockGrounder. The maxflow example is scaled from the 10 edges of maxflow_example.py to 10, 100 and 1000 times as
+many edges, sudoku from the 9 x 9 board to boards of 16 x 16 up to 36 x 36 cells, i.e. up to 64 times as many fill
+variables.
+
+Usage: python numpy_benchmark.py [largest maxflow scale] [largest sudoku box size]
+"""
+
+
+def maxflow(grounder):
+    model = RlpProblem("maxflow on a synthetic flow network", LpMaximize, grounder, None)
+
+    X, Y, Z = sub_symbols('X', 'Y', 'Z')
+
+    flow = numeric_predicate("flow", 2)
+    cost = numeric_predicate("cost", 2)
+    model.add_reloop_variable(flow)
+
+    source = boolean_predicate("source", 1)
+    target = boolean_predicate("target", 1)
+    edge = boolean_predicate("edge", 2)
+    node = boolean_predicate("node", 1)
+
+    model += RlpSum([X, Y], source(X) & edge(X, Y), flow(X, Y))
+
+    outFlow = RlpSum([X, ], edge(X, Z), flow(X, Z))
+    inFlow = RlpSum([Y, ], edge(Z, Y), flow(Z, Y))
+    model += ForAll([Z, ], node(Z) & ~source(Z) & ~target(Z), inFlow >= outFlow)
+    model += ForAll([Z, ], node(Z) & ~source(Z) & ~target(Z), inFlow <= outFlow)
+
+    model += ForAll([X, Y], edge(X, Y), flow(X, Y) >= 0)
+    model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= cost(X, Y))
+    return model
+
+
+def sudoku(grounder):
+    model = RlpProblem("sudoku", LpMaximize, grounder, None)
+
+    I, J, X, U, V = sub_symbols('I', 'J', 'X', 'U', 'V')
+
+    num = boolean_predicate("num", 1)
+    boxind = boolean_predicate("boxind", 1)
+    box = boolean_predicate("box", 4)
+    initial = boolean_predicate("initial", 3)
+    fill = numeric_predicate("fill", 3)
+    model.add_reloop_variable(fill)
+
+    model += ForAll([I, J], num(I) & num(J), RlpSum([X, ], num(X), fill(I, J, X)) |eq| 1)
+    model += ForAll([I, X], num(I) & num(X), RlpSum([J, ], num(J), fill(I, J, X)) |eq| 1)
+    model += ForAll([J, X], num(J) & num(X), RlpSum([I, ], num(I), fill(I, J, X)) |eq| 1)
+    model += ForAll([X, U, V], num(X) & boxind(U) & boxind(V), RlpSum([I, J], box(I, J, U, V), fill(I, J, X)) |eq| 1)
+    model += ForAll([I, J, X], num(X) & num(I) & num(J), fill(I, J, X) >= 0)
+    model += ForAll([I, J, X], initial(I, J, X), fill(I, J, X) |eq| 1)
+
+    model += RlpSum([X, ], num(X), fill(1, 1, X))
+    return model
+
+
+def maxflow_facts(scale):
+    # a path through all nodes guarantees a flow from the first to the last node
+    random = np.random.RandomState(0)
+    nodes = 7 * scale
+    edge_facts = np.vstack((np.column_stack((np.arange(nodes - 1), np.arange(1, nodes))),
+                            random.randint(0, nodes, size=(10 * scale - nodes + 1, 2))))
+    edge_facts = np.unique(edge_facts[edge_facts[:, 0] != edge_facts[:, 1]].view("i8,i8")).view(int).reshape(-1, 2)
+    return {"node": np.arange(nodes).reshape(-1, 1), "edge": edge_facts,
+            "cost": np.column_stack((edge_facts, random.randint(1, 100, size=len(edge_facts)))),
+            "source": np.array([[0]]), "target": np.array([[nodes - 1]])}
+
+
+def sudoku_facts(size):
+    numbers = range(1, size * size + 1)
+    return {"num": np.array(numbers).reshape(-1, 1), "boxind": np.arange(1, size + 1).reshape(-1, 1),
+            "box": np.array([(i, j, (i - 1) / size + 1, (j - 1) / size + 1) for i in numbers for j in numbers]),
+            "initial": np.array([[1, 1, 1]])}
+
+
+def compare(name, model, facts):
+    logkb = NumpyKb()
+    for relation_name, relation in facts.items():
+        logkb.load_facts(relation_name, relation)
+
+    pyDatalog.clear()
+    for relation_name, relation in facts.items():
+        PyDatalogLogKb().assert_facts(relation_name, relation)
+
+    times = []
+    for kb in (logkb, PyDatalogLogKb()):
+        grounder = BlockGrounder(kb)
+        start = time.time()
+        lp, varmap = grounder.ground(model(grounder))
+        times.append(time.time() - start)
+
+    print "{0}: {1} rows, {2} columns, NumpyKb {3:.2f}s, PyDatalog {4:.2f}s, speedup {5:.1f}".format(
+        name, lp[1].shape[0], lp[1].shape[1], times[0], times[1], times[1] / times[0])
+
+
+largest_scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+largest_size = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+
+scale = 1
+while scale <= largest_scale:
+    compare("maxflow x{0}".format(scale), maxflow, maxflow_facts(scale))
+    scale *= 10
+
+for size in range(3, largest_size + 1):
+    compare("sudoku {0}x{0}".format(size * size), sudoku, sudoku_facts(size))
@@ -0,0 +1,101 @@
+from cStringIO import StringIO
+import numpy as np
+import scipy.sparse
+
+"""
+Precomputes the rbf kernel exp(-gamma * ||x - y||^2) of all pairs of papers for the LP-SVM examples, see
+linearsvm_load.py. The squared distances are expanded into ||x||^2 + ||y||^2 - 2 x.y, such that every block of the Gram
+matrix is a single matrix product computed by BLAS, and the kernel values are streamed into the database block by block
+with COPY instead of being held in memory at once.
+"""
+
+
+def word_vectors(papers, words):
+    """
+    :param papers: A sequence of the paper of every occurrence of a word
+    :param words: A sequence of the index of the word of every occurrence
+    :return: A tuple of the array of the distinct papers and the sparse binary matrix of their word vectors, which holds
+             a row for every paper. Papers without any word do not occur.
+    """
+    paper_ids, rows = np.unique(np.asarray(papers), return_inverse=True)
+    words = np.asarray(words, dtype=int)
+    vectors = scipy.sparse.csr_matrix((np.ones(len(rows)), (rows, words)), shape=(len(paper_ids), words.max() + 1))
+    # a word occurring twice in a paper is still a binary entry
+    vectors.data[:] = 1
+    return paper_ids, vectors
+
+
+def rbf_kernel_blocks(vectors, gamma=0.01, block_size=1000, threshold=0.0):
+    """
+    Computes the rbf kernel of all pairs of rows of a matrix block by block. Every block of block_size x block_size
+    pairs is computed with one dense matrix product, the memory thus does not grow with the number of rows.
+
+    :param vectors: A sparse or dense matrix holding a vector in every row
+    :param gamma: The width of the kernel
+    :param block_size: The number of rows of a block
+    :param threshold: Kernel values not above the threshold are left out, which sparsifies the kernel
+    :return: A generator of tuples (rows, columns, values) of numpy arrays holding the pairs of rows of a block and
+             their kernel values
+    """
+    vectors = scipy.sparse.csr_matrix(vectors, dtype=float)
+    count = vectors.shape[0]
+
+    for row_start in range(0, count, block_size):
+        row_range = np.arange(row_start, min(row_start + block_size, count))
+        for column_start in range(0, count, block_size):
+            column_range = np.arange(column_start, min(column_start + block_size, count))
+            values = rbf_kernel(vectors, row_range, column_range, gamma)
+
+            if threshold > 0:
+                rows, columns = np.nonzero(values > threshold)
+                values = values[rows, columns]
+            else:
+                rows, columns = np.indices(values.shape)
+                rows, columns, values = rows.ravel(), columns.ravel(), values.ravel()
+            yield rows + row_start, columns + column_start, values
+
+
+def rbf_kernel(vectors, rows, columns, gamma=0.01):
+    """
+    Computes the rbf kernel of all pairs of the given rows of a matrix with one dense matrix product. Bound to the
+    vectors, it backs the kernel predicate of an LP-SVM without storing the kernel, see
+    :func:`.BlockGrounder.add_array_predicate`.
+
+    :param vectors: A sparse or dense matrix holding a vector in every row
+    :param rows: A numpy array of the rows of the first vectors of the pairs
+    :param columns: A numpy array of the rows of the second vectors of the pairs
+    :param gamma: The width of the kernel
+    :return: The dense numpy array of the kernel values, with a row per entry of rows and a column per entry of columns
+    """
+    row_block = scipy.sparse.csr_matrix(vectors[rows], dtype=float).toarray()
+    column_block = scipy.sparse.csr_matrix(vectors[columns], dtype=float).toarray()
+    distances = np.dot(row_block, column_block.T)
+    distances *= -2
+    distances += np.einsum("ij,ij->i", row_block, row_block)[:, None]
+    distances += np.einsum("ij,ij->i", column_block, column_block)[None, :]
+    # rounding errors may turn the distance of equal vectors slightly negative
+    np.maximum(distances, 0, out=distances)
+    return np.exp(-gamma * distances)
+
+
+def copy_kernel(cursor, table, paper_ids, vectors, gamma=0.01, block_size=1000, threshold=0.0):
+    """
+    Streams the rbf kernel of the papers into a table with one COPY per block.
+
+    :param cursor: A psycopg2 cursor
+    :param table: The name of the table, which has the columns paper1_id, paper2_id and rbf_value
+    :param paper_ids: The array of the id of the paper of every row of vectors
+    :param vectors: The matrix of the word vectors of the papers, see :func:`word_vectors`
+    :param gamma: see :func:`rbf_kernel_blocks`
+    :param block_size: see :func:`rbf_kernel_blocks`
+    :param threshold: see :func:`rbf_kernel_blocks`
+    :return: The number of kernel values stored
+    """
+    count = 0
+    for rows, columns, values in rbf_kernel_blocks(vectors, gamma, block_size, threshold):
+        # formatting all rows of a block at once is several times faster than numpy.savetxt
+        fields = np.column_stack((paper_ids[rows], paper_ids[columns], values)).ravel().tolist()
+        text = StringIO(("%d\t%d\t%r\n" * len(values)) % tuple(fields))
+        cursor.copy_from(text, table, columns=("paper1_id", "paper2_id", "rbf_value"))
+        count += len(values)
+    return count
@@ -1,4 +1,8 @@
+import Queue
 import itertools as it
+import multiprocessing
+import traceback
+from reloop.languages.rlp import *
 from reloop.solvers.lpsolver import *
 from pyDatalogUtil import *
 
@@ -69,18 +73,12 @@ def enumStates(fTypes, fActions):
     yield [(t,x,y) for t,k in zip(fTypes,s) for x,y in k]
 
 
-def solve_dobss_subproblems(grounderClass, logkb, solverClass):
+def build_dobss_subproblem(grounderClass, logkb, solverClass):
   """
-  Instantiate a RLP model and solve it with given grounder logkb and solver, using the sequential LP method derived
-  from state enumeration with the DOBSS MIQP.
+  Instantiate the RLP model of the DOBSS subproblems with given grounder logkb and solver. The model depends on the
+  state of the integer variable through the ivarState facts only, hence it is built once and solved for every state.
+  Returns the model together with its grounder.
   """
-  
-  # DATALOG: ask followerType(X), ask followerAction(Y)
-  followerType(X)
-  followerAction(Y)
-  
-  # calculate state enumeration
-  ivarStates = enumStates(X.data,Y.data)
 
   # data binding
   leader_action = boolean_predicate("leaderAction",1)
@@ -97,20 +95,16 @@ def solve_dobss_subproblems(grounderClass, logkb, solverClass):
 
   M = 1000
 
-  # main iteration over all possible states
-  for state in ivarStates:
-    # temporarily assert the current state to the LogKB
-    assertAll("ivarState",state)
-
-    # initialize and build RLP model
-    grounder = grounderClass(logkb)
-    model = RlpProblem("Stackelberg-DOBSS", LpMaximize, grounder, solverClass)
-    model.add_reloop_variable(leader_strategy)
-    model.add_reloop_variable(slack)
+  # initialize and build RLP model once. Only the ivarState facts change between the states, hence an incremental
+  # grounder only has to query the summands depending on them again.
+  grounder = grounderClass(logkb)
+  model = RlpProblem("Stackelberg-DOBSS", LpMaximize, grounder, solverClass())
+  model.add_reloop_variable(leader_strategy)
+  model.add_reloop_variable(slack)
 
-    I, J, L = sub_symbols('I', 'J', 'L')
+  I, J, L = sub_symbols('I', 'J', 'L')
 
-    model += RlpSum([L,I,J], leader_action(I) & follower_type(L) & follower_action(J),
+  model += RlpSum([L,I,J], leader_action(I) & follower_type(L) & follower_action(J),
 	          follower_occurrence(L) 
 	          * leader_util(L,I,J)
 	          * follower_state(L,J)
@@ -118,22 +112,169 @@ def solve_dobss_subproblems(grounderClass, logkb, solverClass):
 	        )
 
 
-    model += RlpSum([I,], leader_action(I), leader_strategy(I)) |eq| 1.0
+  model += RlpSum([I,], leader_action(I), leader_strategy(I)) |eq| 1.0
   
-    model += ForAll([I,], leader_action(I), leader_strategy(I) |ge| 0.0)
+  model += ForAll([I,], leader_action(I), leader_strategy(I) |ge| 0.0)
 
   
-    model += ForAll([L,J], follower_type(L) & follower_action(J),
+  model += ForAll([L,J], follower_type(L) & follower_action(J),
 		    RlpSum([I,], leader_action(I),follower_util(L,I,J) * leader_strategy(I)) |le| slack(L)) 
 
-    model += ForAll([L,J], follower_type(L) & follower_action(J),
+  model += ForAll([L,J], follower_type(L) & follower_action(J),
 		    slack(L) - RlpSum([I,], leader_action(I),follower_util(L,I,J) * leader_strategy(I))
 		    |le| (1 - follower_state(L,J)) * M
 		    )
-    model.solve()
-    
-    # retract the current state
-    retractAll("ivarState",3)
+
+  return model, grounder
+
+
+def solve_dobss_state(model, grounder, state, warm_start = None):
+  """
+  Solve the subproblem of a single state of the integer variable by temporarily asserting it to the LogKB.
+  """
+  assertAll("ivarState",state)
+  grounder.invalidate("ivarState")
+
+  model.solve(warm_start = warm_start)
+  
+  # retract the current state
+  retractAll("ivarState",3)
+
+
+def solve_dobss_subproblems(grounderClass, logkb, solverClass, warm_start = False):
+  """
+  Instantiate a RLP model and solve it with given grounder logkb and solver, using the sequential LP method derived
+  from state enumeration with the DOBSS MIQP. If warm_start is True, the solution of a state is passed to the solver as
+  starting point for the next one, which did not pay off for the interior point method of cvxopt. Returns the first
+  state with the best objective value and the value, or (None, None) if no subproblem was solved to optimality.
+  """
+  
+  # DATALOG: ask followerType(X), ask followerAction(Y)
+  followerType(X)
+  followerAction(Y)
+  
+  # calculate state enumeration
+  ivarStates = enumStates(X.data,Y.data)
+
+  model, grounder = build_dobss_subproblem(grounderClass, logkb, solverClass)
+
+  # main iteration over all possible states. The subproblems differ only in the ivarState facts, hence the solution
+  # of a state may serve as starting point for the next one.
+  solution = None
+  best_state, best = None, None
+  for state in ivarStates:
+    solve_dobss_state(model, grounder, state, solution)
+    if warm_start:
+      solution = model.get_solution()
+
+    if model.status() == "optimal":
+      value = model.get_objective_value()
+      if best is None or value > best:
+        best_state, best = state, value
+
+  return best_state, best
+
+#
+# PARALLEL DOBSS SUBPROBLEMS
+#
+
+# model and grounder of a worker process, see init_dobss_worker
+dobss_worker = None
+
+def dobss_upper_bound():
+  """
+  An upper bound on the objective of every subproblem: the expected leader utility if the leader received its
+  highest utility against every follower type.
+  """
+  followerOccurrence(T,P)
+  occurrence = dict(zip(T.data,P.data))
+
+  leaderUtility(T,X,Y,V)
+  best = {}
+  for t,v in zip(T.data,V.data):
+    best[t] = max(best.get(t,v),v)
+
+  return sum(occurrence[t] * best.get(t,0) for t in occurrence)
+
+def init_dobss_worker(grounderClass, logkb, solverClass):
+  """
+  Build the subproblem model within a worker process. Every worker asserts its states to its own copy of the LogKB.
+  """
+  global dobss_worker
+  dobss_worker = build_dobss_subproblem(grounderClass, logkb, solverClass)
+
+def solve_dobss_worker(state):
+  """
+  Solve the subproblem of a state within a worker process. Returns the state, the objective value, the solution keyed
+  by predicate name and arguments and None, or None for the value and the solution if the subproblem is infeasible.
+  The pool passes only the results of successful tasks to callbacks, hence an error is returned as formatted
+  traceback in the last element instead of being raised.
+  """
+  try:
+    model, grounder = dobss_worker
+    solve_dobss_state(model, grounder, state)
+
+    if model.status() != "optimal":
+      return state, None, None, None
+
+    solution = dict(((k.name, tuple(str(a) for a in k.args)), v) for k,v in model.get_solution().items())
+    return state, model.get_objective_value(), solution, None
+  except Exception:
+    return state, None, None, traceback.format_exc()
+
+def solve_dobss_parallel(grounderClass, logkb, solverClass, processes = None, upper_bound = None, tolerance = 1e-6,
+                         backlog = None):
+  """
+  Solve the DOBSS subproblems in a pool of worker processes. Each worker builds the model once and grounds it
+  incrementally for the states it receives. Yields (state, objective value, solution) whenever a subproblem improves
+  on the best objective value found so far. Stops as soon as a subproblem attains the upper bound, which defaults to
+  dobss_upper_bound(). Results are collected in the order the subproblems are solved in, such that a slow state does
+  not hold back the others. The states are enumerated lazily and at most backlog of them, by default twice the number
+  of processes, are submitted to the pool at a time, such that stopping early also stops the enumeration.
+  """
+
+  if upper_bound is None:
+    upper_bound = dobss_upper_bound()
+
+  # DATALOG: ask followerType(X), ask followerAction(Y)
+  followerType(X)
+  followerAction(Y)
+
+  ivarStates = enumStates(X.data,Y.data)
+  if backlog is None:
+    backlog = 2 * (processes or multiprocessing.cpu_count())
+
+  # the workers are forked after the facts have been loaded, hence they start with the same LogKB
+  pool = multiprocessing.Pool(processes, init_dobss_worker, (grounderClass, logkb, solverClass))
+  try:
+    # the pool puts every result into the queue as soon as it is solved, a new state is submitted whenever one is
+    # collected
+    completed = Queue.Queue()
+    pending = 0
+    for state in it.islice(ivarStates, backlog):
+      pool.apply_async(solve_dobss_worker, (state,), callback = completed.put)
+      pending += 1
+
+    best = None
+    while pending:
+      state, value, solution, error = completed.get()
+      pending -= 1
+      if error is not None:
+        raise RuntimeError("Solving the DOBSS subproblem of state %s failed:\n%s" % (state, error))
+
+      if value is not None and (best is None or value > best):
+        best = value
+        yield state, value, solution
+
+        if best >= upper_bound - tolerance:
+          break
+
+      for next_state in it.islice(ivarStates, 1):
+        pool.apply_async(solve_dobss_worker, (next_state,), callback = completed.put)
+        pending += 1
+  finally:
+    pool.terminate()
+    pool.join()
 
 #
 # DOBSS BLOCK LP
@@ -207,7 +348,7 @@ def solve_dobss_block(grounderClass, logkb, solverClass):
 
   # build and instantiate model
   grounder = grounderClass(logkb)
-  model = RlpProblem("Stackelberg-DOBSS", LpMaximize, grounder, solverClass)
+  model = RlpProblem("Stackelberg-DOBSS", LpMaximize, grounder, solverClass())
   model.add_reloop_variable(leader_strategy)
   model.add_reloop_variable(slack)
 
@@ -30,7 +30,7 @@ analyzer = LiftingAnalysis(logfile)
 # instance all the time.
 solver = lambda : analyzer
 logkb = PyDatalogLogKb()
-grounder = BlockGrounder
+grounder = lambda logkb : BlockGrounder(logkb, incremental=True)
 
 # build the model and analyze it
 solve_dobss_subproblems(grounder, logkb, solver)
@@ -0,0 +1,32 @@
+from reloop.languages.rlp.grounding.block import BlockGrounder
+from reloop.languages.rlp.logkb import PyDatalogLogKb
+from reloop.solvers.lpsolver import CvxoptSolver
+
+import sys
+import time
+import cvxopt
+
+from DOBSS import *
+from pyDatalogUtil import *
+
+from ring_network import *
+
+# Running the DOBSS subproblems on a ring network model in parallel.
+# Usage: python DOBSS_ring_network_parallel.py [number of processes]
+
+cvxopt.solvers.options["show_progress"] = False
+
+loadFacts("facts/large_ring.facts")
+
+processes = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+logkb = PyDatalogLogKb()
+grounder = lambda logkb : BlockGrounder(logkb, incremental=True)
+solver = lambda : CvxoptSolver()
+
+start = time.time()
+for state, value, solution in solve_dobss_parallel(grounder, logkb, solver, processes):
+  selected = [(t,x) for t,x,y in state if y == 1]
+  print "{0:.1f}s: objective {1} for follower actions {2}".format(time.time() - start, value, selected)
+
+print "{0:.1f}s: done".format(time.time() - start)
@@ -27,7 +27,7 @@ for sname in X.data:
   analyzer = LiftingAnalysis(logfile, dumpSingleMatrices = True, dumpBlockMatrix = True)
   solver = lambda : analyzer
   logkb = PyDatalogLogKb()
-  grounder = BlockGrounder
+  grounder = lambda logkb : BlockGrounder(logkb, incremental=True)
   solve_dobss_subproblems(grounder, logkb, solver)
   
   analyzer.liftingAnalysis()
@@ -0,0 +1,75 @@
+from reloop.languages.rlp import *
+from reloop.languages.rlp.grounding.recursive import RecursiveGrounder
+from reloop.languages.rlp.logkb import SQLiteKb
+import numpy as np
+import sys
+import time
+
+"""
+Reports the number of SQL statements and the grounding time of the RecursiveGrounder on a SQLite database, once with
+the bindings of the sums and the lookups of numeric predicates staged into temporary tables and once with a query per
+binding. The maxflow example is scaled from the 10 edges of maxflow_example.py to 10, 100 and 1000 times as many edges.
+
+Usage: python staging_benchmark.py [largest maxflow scale]
+"""
+
+
+def maxflow(grounder):
+    model = RlpProblem("maxflow on a synthetic flow network", LpMaximize, grounder, None)
+
+    X, Y, Z = sub_symbols('X', 'Y', 'Z')
+
+    flow = numeric_predicate("flow", 2)
+    cost = numeric_predicate("cost", 2)
+    model.add_reloop_variable(flow)
+
+    source = boolean_predicate("source", 1)
+    target = boolean_predicate("target", 1)
+    edge = boolean_predicate("edge", 2)
+    node = boolean_predicate("node", 1)
+
+    model += RlpSum([X, Y], source(X) & edge(X, Y), flow(X, Y))
+
+    outFlow = RlpSum([X, ], edge(X, Z), flow(X, Z))
+    inFlow = RlpSum([Y, ], edge(Z, Y), flow(Z, Y))
+    model += ForAll([Z, ], node(Z) & ~source(Z) & ~target(Z), inFlow |eq| outFlow)
+
+    model += ForAll([X, Y], edge(X, Y), flow(X, Y) >= 0)
+    model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= cost(X, Y))
+    return model
+
+
+def maxflow_kb(scale, staging_threshold):
+    # a path through all nodes guarantees a flow from the first to the last node
+    random = np.random.RandomState(0)
+    nodes = 7 * scale
+    edge_facts = np.vstack((np.column_stack((np.arange(nodes - 1), np.arange(1, nodes))),
+                            random.randint(0, nodes, size=(10 * scale - nodes + 1, 2))))
+    edge_facts = np.unique(edge_facts[edge_facts[:, 0] != edge_facts[:, 1]].view("i8,i8")).view(int).reshape(-1, 2)
+
+    logkb = SQLiteKb()
+    logkb.staging_threshold = staging_threshold
+    logkb.load_facts("node", np.arange(nodes).reshape(-1, 1))
+    logkb.load_facts("edge", edge_facts)
+    logkb.load_facts("cost", np.column_stack((edge_facts, random.randint(1, 100, size=len(edge_facts)))), numeric=True)
+    logkb.load_facts("source", np.array([[0]]))
+    logkb.load_facts("target", np.array([[nodes - 1]]))
+    return logkb
+
+
+largest_scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+scale = 1
+while scale <= largest_scale:
+    results = []
+    for staging_threshold in (SQLiteKb.staging_threshold, sys.maxint):
+        logkb = maxflow_kb(scale, staging_threshold)
+        statements = logkb.statements
+        grounder = RecursiveGrounder(logkb)
+        start = time.time()
+        lp, varmap = grounder.ground(maxflow(grounder))
+        results.append((logkb.statements - statements, time.time() - start))
+
+    print "maxflow x{0}: {1} rows, staged {2} statements in {3:.2f}s, per binding {4} statements in {5:.2f}s".format(
+        scale, lp[1].shape[0], results[0][0], results[0][1], results[1][0], results[1][1])
+    scale *= 10
@@ -0,0 +1,26 @@
+from reloop.languages.rlp.grounding.block import BlockGrounder
+from reloop.languages.rlp.logkb import SQLiteKb
+from reloop.solvers.lpsolver import CvxoptSolver
+import sudoku_example
+
+"""
+Sudoku example, which uses the embedded SQLite knowledge base. The facts are bulk loaded into an in-memory database,
+the box predicate is loaded as facts instead of being derived by a rule.
+"""
+
+initial = [(1, 1, 5), (2, 1, 6), (4, 1, 8), (5, 1, 4), (6, 1, 7), (1, 2, 3), (3, 2, 9), (7, 2, 6), (3, 3, 8),
+           (2, 4, 1), (5, 4, 8), (8, 4, 4), (1, 5, 7), (2, 5, 9), (4, 5, 6), (6, 5, 2), (8, 5, 1), (9, 5, 8),
+           (2, 6, 5), (5, 6, 3), (8, 6, 9), (7, 7, 2), (3, 8, 6), (7, 8, 8), (9, 8, 7), (4, 9, 3), (5, 9, 1),
+           (6, 9, 6), (8, 9, 5)]
+
+logkb = SQLiteKb()
+logkb.load_facts("num", [(u,) for u in range(1, 10)])
+logkb.load_facts("boxind", [(u,) for u in range(1, 4)])
+logkb.load_facts("box", [(i, j, (i - 1) / 3 + 1, (j - 1) / 3 + 1) for i in range(1, 10) for j in range(1, 10)])
+logkb.load_facts("initial", initial)
+
+grounder = BlockGrounder(logkb)
+# Note: CVXOPT needs to be compiled with glpk support. See the CVXOPT documentation.
+solver = CvxoptSolver(solver_solver='glpk')
+
+sudoku_example.sudoku(grounder, solver)
@@ -0,0 +1,363 @@
+from rlp import *
+from sympy import lambdify
+from sympy.logic.boolalg import *
+from sympy.core import *
+import numpy as np
+
+# the largest value of a combined join key before the keys are compacted again
+MAX_KEY = 2 ** 62
+
+
+def evaluate(query_symbols, logical_query, coeff_expr, relations, constant_id, numbers):
+    """
+    Answers a logical query over relations stored as integer-encoded column arrays. The query is split into clauses
+    like by :class:`.SQLRenderer`, i.e. Or(And(pred1, Not(pred2), rel1, ...), ...), every clause is answered by joins
+    and filters on arrays and the distinct answers of all clauses are returned.
+
+    :param query_symbols: The symbols to be queried
+    :param logical_query: The logical query
+    :param coeff_expr: The coefficient expression evaluated for every answer or None
+    :param relations: A dict mapping the name of a relation to a two-dimensional numpy array of constant ids
+    :param constant_id: A function mapping a constant of the query to its id or to None if it does not occur in any fact
+    :param numbers: A numpy array holding the numeric value of every constant id, nan for constants that are no numbers
+    :return: A tuple of the list of the id columns of the query symbols and the numpy array of the coefficients or None
+    """
+    logical_query = sympify(logical_query)
+    clauses = logical_query.args if isinstance(logical_query, Or) else (logical_query,)
+    results = [Clause(clause, relations, constant_id, numbers).answer(query_symbols, coeff_expr)
+               for clause in clauses]
+
+    columns = [np.concatenate([result[0][index] for result in results]) for index in range(len(query_symbols))]
+    values = np.concatenate([result[1] for result in results]) if coeff_expr is not None else None
+    return distinct(columns, values)
+
+
+class Clause(object):
+    """
+    A conjunction of positive predicates, negated predicates and relations, which is answered by joining the relations
+    of its predicates one after the other. Every intermediate result is a set of bindings, which holds a column of
+    constant ids for every bound symbol.
+    """
+
+    def __init__(self, clause, relations, constant_id, numbers):
+        """
+        :param clause: The conjunction as sympy expression
+        :param relations: see :func:`evaluate`
+        :param constant_id: see :func:`evaluate`
+        :param numbers: see :func:`evaluate`
+        """
+        self.relations = relations
+        self.constant_id = constant_id
+        self.numbers = numbers
+
+        self.positive = []
+        self.negative = []
+        # tuples (relation, negated)
+        self.conditions = []
+        self.satisfiable = True
+        for condition in (clause.args if isinstance(clause, And) else (clause,)):
+            self.add(condition)
+
+    def add(self, condition, negated=False):
+        if isinstance(condition, BooleanPredicate):
+            (self.negative if negated else self.positive).append(condition)
+        elif isinstance(condition, Not):
+            self.add(condition.args[0], not negated)
+        elif isinstance(condition, Rel):
+            self.conditions.append((condition, negated))
+        elif isinstance(condition, (BooleanTrue, BooleanFalse)):
+            if isinstance(condition, BooleanTrue) == negated:
+                self.satisfiable = False
+        else:
+            raise ValueError('Invalid query type: ' + str(type(condition)))
+
+    def answer(self, query_symbols, coeff_expr, overrides=None):
+        """
+        :param query_symbols: see :func:`evaluate`
+        :param coeff_expr: see :func:`evaluate`
+        :param overrides: see :func:`join`
+        :return: A tuple of the list of the id columns of the query symbols and the numpy array of the coefficients or
+                 None
+        """
+        bindings, size = self.join(overrides)
+        if not size:
+            return [np.zeros(0, dtype=np.int64) for _ in query_symbols], np.zeros(0)
+
+        for symbol in query_symbols:
+            if symbol not in bindings:
+                raise ValueError("The query symbol " + str(symbol) + " does not occur in a positive predicate")
+        columns = [bindings[symbol] for symbol in query_symbols]
+
+        values = None
+        if coeff_expr is not None:
+            values = self.evaluate_expression(sympify(coeff_expr), bindings, size)
+        return columns, values
+
+    def join(self, overrides=None):
+        """
+        Joins the relations of the positive predicates, smallest first and preferring predicates sharing a symbol with
+        the symbols bound so far. Relations are checked as soon as their symbols are bound, negated predicates at last.
+
+        :param overrides: An optional dict mapping positions in :attr:`positive` to the rows read instead of the
+                          relation of the predicate, e.g. the new facts of a semi-naive evaluation step
+        :return: A tuple of the bindings, a dict mapping the symbols to columns of constant ids, and their number
+        """
+        if not self.satisfiable:
+            return {}, 0
+
+        bindings, size = {}, 1
+        conditions = list(self.conditions)
+
+        overrides = overrides or {}
+        candidates = [(predicate, self.select(predicate, overrides.get(position)))
+                      for position, predicate in enumerate(self.positive)]
+        while candidates and size:
+            bound = set(bindings)
+            shared = [candidate for candidate in candidates if bound.intersection(candidate[1][0])]
+            predicate, (symbols, rows) = min(shared or candidates, key=lambda candidate: len(candidate[1][1]))
+            candidates = [candidate for candidate in candidates if candidate[0] is not predicate]
+
+            bindings, size = join(bindings, size, symbols, rows)
+
+            remaining = []
+            for condition, negated in conditions:
+                if all(symbol in bindings for symbol in condition.atoms(SubSymbol)):
+                    bindings, size = self.filter(bindings, size, self.check(condition, negated, bindings, size))
+                else:
+                    remaining.append((condition, negated))
+            conditions = remaining
+
+        if not size:
+            return bindings, 0
+        for condition, negated in conditions:
+            unbound = [symbol for symbol in condition.atoms(SubSymbol) if symbol not in bindings]
+            if unbound:
+                raise ValueError("The symbols " + str(unbound) + " of " + str(condition) +
+                                 " do not occur in a positive predicate")
+            bindings, size = self.filter(bindings, size, self.check(condition, negated, bindings, size))
+
+        for predicate in self.negative:
+            if not size:
+                break
+            bindings, size = self.filter(bindings, size, self.absent(predicate, bindings, size))
+
+        return bindings, size
+
+    def select(self, predicate, rows=None):
+        """
+        Selects the rows of the relation of a predicate matching its constants and repeated symbols.
+
+        :param predicate: The predicate
+        :param rows: The rows to select from or None for the relation of the predicate
+        :return: A tuple of the list of the distinct symbols of the predicate and a two-dimensional numpy array holding
+                 the column of every symbol
+        """
+        if rows is None:
+            rows = self.relations.get(predicate.name)
+        if rows is None or rows.shape[1] != len(predicate.args):
+            return [], np.zeros((0, 0), dtype=np.int64)
+
+        mask = np.ones(len(rows), dtype=bool)
+        symbols, positions = [], []
+        for index, arg in enumerate(predicate.args):
+            if isinstance(arg, SubSymbol):
+                if arg in symbols:
+                    mask &= rows[:, index] == rows[:, positions[symbols.index(arg)]]
+                else:
+                    symbols.append(arg)
+                    positions.append(index)
+            else:
+                constant = self.constant_id(arg)
+                if constant is None:
+                    return symbols, np.zeros((0, len(symbols)), dtype=np.int64)
+                mask &= rows[:, index] == constant
+
+        return symbols, rows[mask][:, positions]
+
+    def absent(self, predicate, bindings, size):
+        """
+        Computes the anti join of the bindings with a negated predicate. Symbols of the predicate which are not bound
+        are existentially quantified, i.e. a binding is removed if any row of the relation matches it.
+
+        :param predicate: The negated predicate
+        :param bindings: The bindings
+        :param size: The number of bindings
+        :return: A boolean numpy array, True for the bindings without any matching row
+        """
+        rows = self.relations.get(predicate.name)
+        if rows is None or rows.shape[1] != len(predicate.args):
+            return np.ones(size, dtype=bool)
+
+        mask = np.ones(len(rows), dtype=bool)
+        left, right = [], []
+        for index, arg in enumerate(predicate.args):
+            if isinstance(arg, SubSymbol):
+                if arg in bindings:
+                    left.append(bindings[arg])
+                    right.append(rows[:, index])
+            else:
+                constant = self.constant_id(arg)
+                if constant is None:
+                    return np.ones(size, dtype=bool)
+                mask &= rows[:, index] == constant
+
+        if not left:
+            return np.full(size, not np.any(mask), dtype=bool)
+        left_keys, right_keys = combined_keys(left, [column[mask] for column in right])
+        return np.in1d(left_keys, right_keys, invert=True)
+
+    def check(self, condition, negated, bindings, size):
+        """
+        :param condition: A relation, e.g. X > 3 or Eq(X, Y)
+        :param negated: True if the relation is negated
+        :param bindings: The bindings, which bind all symbols of the relation
+        :param size: The number of bindings
+        :return: A boolean numpy array, True for the bindings satisfying the relation
+        """
+        if condition.func in (Eq, Ne) and all(isinstance(side, SubSymbol) or not side.atoms(SubSymbol)
+                                                 for side in (condition.lhs, condition.rhs)):
+            # (in)equality of constants, which need not be numbers
+            result = self.identifiers(condition.lhs, bindings, size) == self.identifiers(condition.rhs, bindings, size)
+            if condition.func is Ne:
+                result = ~result
+        else:
+            lhs = self.evaluate_expression(condition.lhs, bindings, size)
+            rhs = self.evaluate_expression(condition.rhs, bindings, size)
+            with np.errstate(invalid='ignore'):
+                result = comparison(condition.func)(lhs, rhs)
+        return ~result if negated else result
+
+    def identifiers(self, side, bindings, size):
+        if isinstance(side, SubSymbol):
+            return bindings[side]
+        constant = self.constant_id(side)
+        return np.full(size, -1 if constant is None else constant, dtype=np.int64)
+
+    def evaluate_expression(self, expr, bindings, size):
+        """
+        :param expr: A numeric sympy expression of bound symbols
+        :param bindings: The bindings
+        :param size: The number of bindings
+        :return: A numpy array holding the value of the expression for every binding
+        """
+        symbols = sorted(expr.atoms(SubSymbol), key=str)
+        if not symbols:
+            return np.full(size, float(expr))
+        function = lambdify(symbols, expr, "numpy", dummify=True)
+        result = function(*[self.numbers[bindings[symbol]] for symbol in symbols])
+        return np.broadcast_to(np.asarray(result, dtype=float), (size,))
+
+    @staticmethod
+    def filter(bindings, size, mask):
+        return dict((symbol, column[mask]) for symbol, column in bindings.items()), int(np.count_nonzero(mask))
+
+
+def join(bindings, size, symbols, rows):
+    """
+    Joins bindings with the rows of a relation on their shared symbols by sorting the keys of the relation and
+    searching the keys of the bindings. Without shared symbols the cross product is built.
+
+    :param bindings: A dict mapping the symbols bound so far to columns of constant ids
+    :param size: The number of bindings
+    :param symbols: The symbols of the relation
+    :param rows: A two-dimensional numpy array holding a column for every symbol of the relation
+    :return: A tuple of the joined bindings and their number
+    """
+    shared = [index for index, symbol in enumerate(symbols) if symbol in bindings]
+
+    if shared:
+        left_keys, right_keys = combined_keys([bindings[symbols[index]] for index in shared],
+                                              [rows[:, index] for index in shared])
+        left, right = join_indices(left_keys, right_keys)
+    else:
+        left = np.repeat(np.arange(size), len(rows))
+        right = np.tile(np.arange(len(rows)), size)
+
+    result = dict((symbol, column[left]) for symbol, column in bindings.items())
+    for index, symbol in enumerate(symbols):
+        if symbol not in result:
+            result[symbol] = rows[right, index]
+    return result, len(left)
+
+
+def join_indices(left_keys, right_keys):
+    """
+    :param left_keys: A numpy array of int keys
+    :param right_keys: A numpy array of int keys
+    :return: A tuple of numpy arrays holding the indices of all pairs of equal keys
+    """
+    order = np.argsort(right_keys, kind='mergesort')
+    sorted_keys = right_keys[order]
+    lower = np.searchsorted(sorted_keys, left_keys, side='left')
+    upper = np.searchsorted(sorted_keys, left_keys, side='right')
+    counts = upper - lower
+
+    left = np.repeat(np.arange(len(left_keys)), counts)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(counts) - counts, counts)
+    right = order[np.repeat(lower, counts) + offsets]
+    return left, right
+
+
+def combined_keys(left_columns, right_columns):
+    """
+    Combines several columns of constant ids into a single int key per row, consistently for both sides of a join.
+
+    :param left_columns: A list of numpy arrays of constant ids
+    :param right_columns: A list of numpy arrays of constant ids, one for every left column
+    :return: A tuple of the numpy arrays of the keys of the left and the right rows
+    """
+    left_keys = left_columns[0].astype(np.int64)
+    right_keys = right_columns[0].astype(np.int64)
+    for left, right in zip(left_columns[1:], right_columns[1:]):
+        base = max(left.max() if len(left) else 0, right.max() if len(right) else 0) + 1
+        highest = max(left_keys.max() if len(left_keys) else 0, right_keys.max() if len(right_keys) else 0) + 1
+        if highest * base >= MAX_KEY:
+            # number the distinct keys from zero again
+            unique, inverse = np.unique(np.concatenate((left_keys, right_keys)), return_inverse=True)
+            left_keys, right_keys = inverse[:len(left_keys)], inverse[len(left_keys):]
+        left_keys = left_keys * base + left
+        right_keys = right_keys * base + right
+    return left_keys, right_keys
+
+
+def distinct(columns, values):
+    """
+    Removes duplicate answers, i.e. answers with equal constants and coefficient.
+
+    :param columns: A list of numpy arrays of constant ids
+    :param values: A numpy array of coefficients or None
+    :return: A tuple of the columns and the values of the distinct answers, in their order of first occurrence
+    """
+    keys = list(columns) + ([values] if values is not None else [])
+    if not keys or len(keys[0]) < 2:
+        return columns, values
+
+    order = np.lexsort(keys[::-1])
+    first = np.zeros(len(order), dtype=bool)
+    first[0] = True
+    for key in keys:
+        ordered = key[order]
+        first[1:] |= ordered[1:] != ordered[:-1]
+
+    keep = np.sort(order[first])
+    return [column[keep] for column in columns], values[keep] if values is not None else None
+
+
+def comparison(rel_class):
+    """
+    :param rel_class: A sympy relation class, e.g. StrictLessThan
+    :return: The corresponding numpy comparison
+    """
+    if rel_class is LessThan:
+        return np.less_equal
+    if rel_class is StrictLessThan:
+        return np.less
+    if rel_class is GreaterThan:
+        return np.greater_equal
+    if rel_class is StrictGreaterThan:
+        return np.greater
+    if rel_class is Equality:
+        return np.equal
+    if rel_class is Unequality:
+        return np.not_equal
+    raise NotImplementedError('Evaluation of relation ' + str(rel_class) + ' is not implemented')
@@ -1,3 +1,4 @@
 from grounder import *
 from block import *
 from recursive import *
+from cache import *
\ No newline at end of file
@@ -1,18 +1,32 @@
-from grounder import Grounder
+from grounder import Grounder, GroundBlock, LpAssembler, OBJECTIVE, EQUALITY, INEQUALITY
 from reloop.languages.rlp import *
 from reloop.languages.rlp.visitor import *
+from reloop.languages.rlp.logkb import AnswerTable, AnswerTableBuilder, normalized_constant
+from reloop.languages.rlp.columnar import distinct
 from sympy.core import *
+from sympy import lambdify
 import scipy as sp
 import scipy.sparse
 import numpy as np
 from ordered_set import OrderedSet
 import logging
+import hashlib
+from collections import namedtuple
 
 
 from sympy.sets import EmptySet
 
 log = logging.getLogger(__name__)
 
+CompiledSummand = namedtuple('CompiledSummand', 'query query_symbols coef_expr variable variable_qs_indices '
+                                                'constr_qs_indices')
+CompiledConstraint = namedtuple('CompiledConstraint', 'name is_equality summands')
+CompiledProblem = namedtuple('CompiledProblem', 'objective constraints')
+
+# A numeric predicate backed by an array instead of facts, see BlockGrounder.add_array_predicate. values holds the numpy
+# array or the function computing blocks of it and positions a dict per axis mapping the constants to their positions.
+ArrayPredicate = namedtuple('ArrayPredicate', 'values positions')
+
 
 class BlockGrounder(Grounder):
     """
@@ -20,165 +34,469 @@ class BlockGrounder(Grounder):
     grounding each contraint and objective into a 'block' of the matrix and then building the whole lp matrix.
     """
 
-    def __init__(self, logkb):
+    def __init__(self, logkb, cache=None, incremental=False):
         """
-        Initialize the BlockGrounder by creating new row and column dictionaries and a dictionary for the blocks of the
-        matrix.
+        Initialize the BlockGrounder by creating new column dictionaries.
 
         :param logkb: The knowledge base used for querying expressions
+        :param cache: An optional :class:`.GroundingCache`. If given, the grounded matrices are stored on disk and
+                      loaded instead of grounding again, as long as neither the model nor the data of the knowledge
+                      base have changed.
+        :param incremental: If True, the answers of the knowledge base are kept between calls of :func:`ground` and
+                            only the summands depending on predicates passed to :func:`invalidate` are queried again.
         :return:
         """
         self.logkb = logkb
+        self.cache = cache
+        self.incremental = incremental
+        self.answers = {}
+        self.changing_predicates = set()
         self.col_dicts = {}
-        self.row_dicts = {}
-        self.blocks = {}
+        self.arrays = {}
+
+    def add_array_predicate(self, predicate, values, *axes):
+        """
+        Backs a numeric predicate by an array instead of facts of the knowledge base. Summands whose coefficient
+        contains the predicate look its values up in the array, see :func:`array_entries`. The dense kernel of an
+        LP-SVM, for instance, is thus inserted into the lp as a block without loading n^2 facts into the knowledge base.
+
+        :param predicate: The type of the numeric predicate, see :func:`.numeric_predicate`
+        :param values: A numpy array with an axis per argument of the predicate or a function, which is called with a
+                       numpy array of positions per axis and returns the array of the values of all combinations of
+                       these positions, e.g. lambda rows, columns: kernel(features[rows], features[columns])
+        :param axes: For every argument the sequence of its constants in the order of the corresponding axis
+        """
+        assert len(axes) == predicate.arity, "An array predicate needs a sequence of constants per argument"
+        if not callable(values):
+            values = np.asarray(values, dtype=float)
+            assert values.shape == tuple(len(axis) for axis in axes), "The shape of the array does not match the axes"
+
+        positions = [dict((normalized_constant(constant), position) for position, constant in enumerate(axis))
+                     for axis in axes]
+        self.arrays[predicate.name] = ArrayPredicate(values, positions)
+        self.answers = {}
+
+    def fingerprint(self):
+        """
+        Combines the fingerprint of the knowledge base with the arrays backing numeric predicates, see
+        :func:`.LogKb.fingerprint`.
+
+        :return: A str or None if the data cannot be fingerprinted, e.g. because an array is computed by a function
+        """
+        fingerprint = self.logkb.fingerprint()
+        if fingerprint is None or not self.arrays:
+            return fingerprint
+
+        sha = hashlib.sha1(fingerprint)
+        for name, array in sorted(self.arrays.items()):
+            if callable(array.values):
+                return None
+            sha.update(name)
+            sha.update(repr([sorted(positions.items()) for positions in array.positions]))
+            sha.update(np.ascontiguousarray(array.values).tobytes())
+        return sha.hexdigest()
 
     def ground(self, rlpProblem):
         """
-        Resets the status of the row and column dictionaries of the BlockGrounder instance and
-        grounds the rlp by grounding the objective and each constraint.
+        Grounds the rlp by grounding the objective and each constraint into a block and assembling the blocks into the
+        matrices of the lp as they are grounded, see :func:`ground_blocks`.
 
         :param rlpProblem: The instance of the given rlp
         :type rlpProblem: rlpProblem
         """
+        compiled = rlpProblem.compile()
+
+        cache_key = None
+        if self.cache is not None:
+            fingerprint = self.fingerprint()
+            if fingerprint is not None:
+                cache_key = self.cache.key(rlpProblem, compiled, fingerprint)
+                cached = self.cache.load(cache_key, rlpProblem)
+                if cached is not None:
+                    log.debug("\nLoaded grounding %s from the cache.", cache_key)
+                    return cached
+
+        assembler = LpAssembler(rlpProblem)
+        for block in self.ground_blocks(rlpProblem):
+            assembler.add(block)
+        lp = assembler.matrices(self.col_dicts)
+
+        if cache_key is not None:
+            self.cache.store(cache_key, lp, self.col_dicts)
 
-        self.__init__(self.logkb)
+        return lp, self.col_dicts
 
-        objective = self.objective_to_matrix(rlpProblem.objective)
+    def ground_blocks(self, rlpProblem):
+        """
+        Resets the column dictionaries and grounds the objective and every constraint of the rlp into a block, which
+        is yielded as soon as it is grounded. The rows of a block are discarded by the grounder afterwards.
 
-        for constraint in rlpProblem.constraints:
-            log.debug("\nGrounding: \n %s: %s", constraint_str(constraint), str(constraint))
-            self.constraint_to_matrix(constraint)
+        :param rlpProblem: The instance of the given rlp
+        :return: A generator of :class:`.GroundBlock`, see :func:`.Grounder.ground_blocks`
+        """
+        self.col_dicts = {}
+        if not self.incremental:
+            self.answers = {}
 
-        a = b = g = h = c = None
+        compiled = rlpProblem.compile()
 
-        for reloop_variable in rlpProblem.reloop_variables:
-            shape = (1, len(self.col_dicts[reloop_variable]))
-            if objective.has_key(reloop_variable):
-                value = objective[reloop_variable]
-                value.resize(shape)
-            else:
-                value = sp.sparse.dok_matrix(shape)
+        objective = self.expr_to_matrix(compiled.objective, OrderedSet())
+        objective.pop(None.__class__, None)
+        yield GroundBlock(OBJECTIVE, OBJECTIVE, objective, np.zeros(1))
 
-            if c is not None:
-                c = sp.sparse.hstack((c, value))
-            else:
-                c = value
+        for constraint in compiled.constraints:
+            log.debug("\nGrounding: \n %s", constraint.name)
+            row_dict = OrderedSet()
+            factors = self.expr_to_matrix(constraint.summands, row_dict)
 
-        for constraint in rlpProblem.constraints:
-            log.debug("\nAssembling: %s.", constraint_str(constraint))
-            constr_matrix = None
+            # at some point we had lhs = lhs - rhs, so now we have to put b back on the rhs
+            rhs = np.zeros(len(row_dict))
+            if None.__class__ in factors:
+                constants = factors.pop(None.__class__)
+                np.add.at(rhs, constants.row, -constants.data)
 
-            constr_name = constraint_str(constraint)
+            kind = EQUALITY if constraint.is_equality else INEQUALITY
+            yield GroundBlock(constraint.name, kind, factors, rhs)
 
-            for reloop_variable in rlpProblem.reloop_variables:
-                log.debug("\n\tkey: %s.", reloop_variable)
-                shape = (len(self.row_dicts[constr_name]), len(self.col_dicts[reloop_variable]))
-                if reloop_variable in self.blocks[constr_name]:
-                    value = self.blocks[constr_name][reloop_variable]
-                    value.resize(shape)
-                else:
-                    value = sp.sparse.dok_matrix(shape)
+        # the answers are only shared between the summands of a single grounding unless grounding incrementally
+        if not self.incremental:
+            self.answers = {}
 
-                if constr_matrix is not None:
-                    constr_matrix = sp.sparse.hstack((constr_matrix, value))
-                else:
-                    constr_matrix = value
-
-            log.debug("\n\tkey: RHS.")
-            constr_vector_shape = (len(self.row_dicts[constr_name]), 1)
-            if None.__class__ in self.blocks[constr_name]:
-                value = self.blocks[constr_name][None.__class__]
-                value.resize(constr_vector_shape)
-                constr_vector = value
-            else:
-                constr_vector = sp.sparse.dok_matrix(constr_vector_shape)
+    def variable_map(self):
+        return self.col_dicts
 
-            if isinstance(constraint, ForAll):
-                rel = constraint.relation
-            elif isinstance(constraint, Rel):
-                rel = constraint
-            else:
-                raise RuntimeError("The constraint is neither a relation nor a forall... what is it then?")
-            if isinstance(rel, Equality):
-                a = constr_matrix if a is None else sp.sparse.vstack((a, constr_matrix))
-                b = constr_vector if b is None else sp.sparse.vstack((b, constr_vector))
-            else:
-                g = constr_matrix if g is None else sp.sparse.vstack((g, constr_matrix))
-                h = constr_vector if h is None else sp.sparse.vstack((h, constr_vector))
+    def invalidate(self, *predicate_names):
+        """
+        Discards the kept answers of all queries containing one of the given predicates, such that they are queried
+        again by the next call of :func:`ground`. Without arguments all kept answers are discarded.
 
-        # at some point we had lhs = lhs - rhs, so now we have to put b back on the rhs
-        c = rlpProblem.sense * c
+        Predicates invalidated once are expected to change again. Summands containing them are therefore grounded by
+        querying the invalidated predicates separately from the rest of their query, see :func:`ask_separated`.
 
-        if a is not None and b is not None:
-            b *= -1
-            b = b.todense()
-            a = a.tocoo()
-        elif (a is not None and b is None) or (b is not None and a is None):
-            raise Exception("This is just wrong")
+        :param predicate_names: The names of the predicates whose facts have changed
+        :type predicate_names: str
+        """
+        if not predicate_names:
+            self.answers = {}
+            return
+
+        changed = set(predicate_names)
+        self.changing_predicates |= changed
+        for key, (predicates, answers) in self.answers.items():
+            if changed & predicates:
+                log.debug("\nInvalidated answers of: %s", key[0])
+                del self.answers[key]
+
+    def ask_summand(self, summand):
+        """
+        Queries the knowledge base for the answers of a compiled summand.
+
+        :param summand: The compiled summand
+        :type summand: CompiledSummand
+        :return: An :class:`.AnswerTable` or, if the summand is grounded by joining separately queried answers, a list
+                 of answer tuples, each consisting of the values of the query symbols and the coefficient
+        """
+        if array_conjuncts(summand.query, self.arrays):
+            return self.ask_arrays(summand)
 
-        if g is not None and h is not None:
-            h *= -1
-            h = h.todense()
-            g = g.tocoo()
+        if self.incremental:
+            answers = self.ask_separated(summand)
+            if answers is not None:
+                return answers
 
-        lp = c.todense().T, g, h, a, b
+        return self.ask_query(summand.query_symbols, summand.query, summand.coef_expr, table=True)
 
-        return lp, self.col_dicts
+    def ask_query(self, query_symbols, query, coef_expr=None, table=False):
+        """
+        Queries the knowledge base. If the grounder is incremental, the answers are kept and reused until one of the
+        predicates of the query is invalidated.
+
+        :param query_symbols: The symbols to be queried
+        :param query: The query as a sympy expression
+        :param coef_expr: The coefficient expression to be evaluated for every answer or None
+        :param table: If True, the answers are asked for as :class:`.AnswerTable`
+        :return: A list of answer tuples or an :class:`.AnswerTable`
+        """
+        # predicate types are created anew for every coefficient, hence queries are compared by their structure
+        key = (srepr(query), srepr(tuple(query_symbols)), srepr(coef_expr), table)
+        if key in self.answers:
+            return self.answers[key][1]
+
+        if table:
+            answers = self.logkb.ask_table(query_symbols, query, coef_expr)
+        else:
+            answers = self.logkb.ask(query_symbols, query, coef_expr)
+        if self.incremental:
+            self.answers[key] = (query_predicate_names(query), answers)
+        return answers
 
-    def objective_to_matrix(self, objective):
+    def ask_arrays(self, summand):
         """
-        Grounds the objective of the given rlp into the matrix
+        Grounds a summand whose query contains predicates backed by arrays. The rest of the query is asked for the
+        query symbols, the arguments of the array predicates and the symbols of the coefficient, and the coefficient is
+        evaluated for all answers at once with the values looked up in the arrays.
 
-        :param objective: The objective of the LP from which the corresponding block is generated from.
+        :param summand: The compiled summand
+        :type summand: CompiledSummand
+        :return: An :class:`.AnswerTable`
+        """
+        conjuncts = array_conjuncts(summand.query, self.arrays)
+        rest = [conjunct for conjunct in And.make_args(summand.query) if conjunct not in conjuncts]
+        assert rest, "The arguments of an array predicate have to be bound by the rest of the query"
+
+        coef_expr = sympify(summand.coef_expr)
+        value_symbols = [conjunct.args[-1] for conjunct in conjuncts]
+        coef_symbols = sorted(coef_expr.free_symbols - set(value_symbols), key=str)
+        symbols = list(OrderedSet(list(summand.query_symbols) + coef_symbols +
+                                  [arg for conjunct in conjuncts for arg in conjunct.args[:-1]
+                                   if isinstance(arg, SubSymbol)]))
+
+        answers = self.ask_query(symbols, And(*rest), table=True)
+        count = len(answers.columns[0]) if answers.columns else 0
+        keep = np.ones(count, dtype=bool)
+
+        lookups = []
+        for conjunct in conjuncts:
+            array = self.arrays[conjunct.func.name]
+            positions = [constant_positions(answers.columns[symbols.index(arg)], answers.constants, axis)
+                         if isinstance(arg, SubSymbol) else np.full(count, axis.get(normalized_constant(arg), -1))
+                         for arg, axis in zip(conjunct.args[:-1], array.positions)]
+            # like a missing fact, a constant not on an axis of the array has no value
+            for position in positions:
+                keep &= position >= 0
+            lookups.append((array, positions))
+
+        values = [array_values(array, [position[keep] for position in positions]) for array, positions in lookups]
+        for symbol in coef_symbols:
+            column = answers.columns[symbols.index(symbol)]
+            unique, inverse = np.unique(column[keep], return_inverse=True)
+            values.append(np.array([float(answers.constants.value(index)) for index in unique])[inverse])
+
+        coef_function = lambdify(value_symbols + coef_symbols, coef_expr, "numpy")
+        coefficients = np.zeros(np.count_nonzero(keep)) + coef_function(*values)
+
+        # like the knowledge bases, return every combination of query symbols and coefficient only once
+        columns = [column[keep] for column in answers.columns[:len(summand.query_symbols)]]
+        columns, coefficients = distinct(columns, coefficients)
+        return AnswerTable(columns, coefficients, answers.constants)
+
+    def array_entries(self, summand, row_dict, col_dict):
+        """
+        Grounds a summand whose coefficient is the product of a binary predicate backed by an array, a factor
+        depending on the constraint and a factor depending on the lp variable, e.g. the kernel summand
+        RlpSum({X, J}, paper(X, J), label(I) * label(X) * kernel(Z, J) * weight(X)) of an LP-SVM. Removing the array
+        predicate splits the query into a part binding the row and a part binding the column, which are asked
+        separately, such that the rows times the columns answers of the whole query are never materialized. The
+        values of all pairs are then taken from the array as a single block.
+
+        :param summand: The compiled summand
+        :type summand: CompiledSummand
+        :param row_dict: The OrderedSet of the rows of the expression
+        :param col_dict: The OrderedSet of the columns of the lp variable class of the summand
+        :return: A numpy array holding the (value, row, column) triplets of the summand or None if the summand cannot
+                 be split like this
         """
-        var_blocks = self.expr_to_matrix(objective, OrderedSet(), True, EmptySet())
-        return var_blocks
+        conjuncts = array_conjuncts(summand.query, self.arrays)
+        variable = summand.variable
+        if len(conjuncts) != 1 or variable is None:
+            return None
+
+        conjunct = conjuncts[0]
+        arguments, value_symbol = conjunct.args[:-1], conjunct.args[-1]
+        if len(arguments) != 2 or not all(isinstance(arg, SubSymbol) for arg in arguments):
+            return None
+
+        rest = [other for other in And.make_args(summand.query) if other is not conjunct]
+        sides = connected_conjuncts(rest)
+        side_of = dict((symbol, index) for index, (side, side_symbols) in enumerate(sides) for symbol in side_symbols)
+        if len(sides) != 2 or set(side_of.get(arg) for arg in arguments) != {0, 1}:
+            return None
+
+        # the row side binds the symbols of the constraint, the column side the arguments of the lp variable
+        row_symbols = [summand.query_symbols[index] for index in summand.constr_qs_indices]
+        column_side = set(side_of.get(arg) for arg in variable.args if isinstance(arg, SubSymbol))
+        row_side = set(side_of.get(symbol) for symbol in row_symbols)
+        if len(column_side) > 1 or len(row_side) > 1 or row_side & column_side or None in row_side | column_side:
+            return None
+        if column_side:
+            column_side = column_side.pop()
+        else:
+            column_side = 1 - row_side.pop() if row_side else 1
+        row_side = 1 - column_side
+        if side_of[arguments[0]] != row_side:
+            arguments = arguments[::-1]
+
+        factors = [[], []]
+        for factor in Mul.make_args(sympify(summand.coef_expr)):
+            if factor == value_symbol:
+                value_symbol = None
+                continue
+            factor_sides = set(side_of.get(symbol) for symbol in factor.free_symbols)
+            if len(factor_sides) > 1 or None in factor_sides:
+                return None
+            factors[factor_sides.pop() if factor_sides else row_side].append(factor)
+        if value_symbol is not None:
+            # the array value is not a factor of the coefficient
+            return None
+
+        tables = []
+        for side, argument in ((row_side, arguments[0]), (column_side, arguments[1])):
+            side_query = sides[side][0]
+            side_symbols = [symbol for symbol in summand.query_symbols if side_of.get(symbol) == side]
+            if argument not in side_symbols:
+                side_symbols.append(argument)
+            coef_expr = Mul(*factors[side]) if factors[side] else None
+            answers = self.ask_query(side_symbols, And(*side_query), coef_expr, table=True)
+            count = len(answers.columns[0])
+            values = answers.values if coef_expr is not None else np.ones(count)
+            positions = constant_positions(answers.columns[side_symbols.index(argument)], answers.constants,
+                                           self.arrays[conjunct.func.name].positions[conjunct.args.index(argument)])
+            tables.append((answers, side_symbols, values, positions))
+
+        (row_answers, row_side_symbols, row_values, row_positions), \
+            (column_answers, column_side_symbols, column_values, column_positions) = tables
+
+        argument_positions = {arguments[0]: row_positions.clip(0), arguments[1]: column_positions.clip(0)}
+        block = array_block(self.arrays[conjunct.func.name], [argument_positions[arg] for arg in conjunct.args[:-1]])
+        if conjunct.args[0] != arguments[0]:
+            block = block.T
+        block = block * row_values[:, None] * column_values[None, :]
+        # like a missing fact, a constant not on an axis of the array has no value
+        block[row_positions < 0, :] = 0
+        block[:, column_positions < 0] = 0
+
+        # only answers with a value occur in the lp, as if the whole query had been asked
+        used_rows = np.flatnonzero(block.any(axis=1))
+        used_columns = np.flatnonzero(block.any(axis=0))
+        block = block[np.ix_(used_rows, used_columns)]
+
+        row_keys = [row_answers.columns[row_side_symbols.index(symbol)][used_rows] for symbol in row_symbols]
+        column_keys = []
+        for arg in variable.args:
+            if isinstance(arg, SubSymbol):
+                column_keys.append(column_answers.columns[column_side_symbols.index(arg)][used_columns])
+            else:
+                column_keys.append(np.full(len(used_columns), column_answers.constants.intern(arg), dtype=np.int64))
+
+        rows = key_indices(row_keys, len(used_rows), row_answers.constants, row_dict)
+        columns = key_indices(column_keys, len(used_columns), column_answers.constants, col_dict)
 
-    def constraint_to_matrix(self, constraint):
+        row_indices, column_indices = np.nonzero(block)
+        return np.column_stack((block[row_indices, column_indices], rows[row_indices], columns[column_indices]))
+
+    def ask_separated(self, summand):
         """
-        Generates the corresponding block in the lp matrix from a given constraint and adds the result to the block dictionary.
+        Grounds a summand whose query is a conjunction containing invalidated predicates. The conjunction of the
+        remaining predicates and each invalidated predicate are queried separately and their answers are joined, such
+        that the part of the query whose data does not change is queried from the knowledge base only once.
 
-        :param constraint: The constraint the corresponding block is generated from.
+        :param summand: The compiled summand
+        :type summand: CompiledSummand
+        :return: A list of answer tuples or None if the query of the summand cannot be separated
+        """
+        query = summand.query
+        conjuncts = query.args if isinstance(query, And) else (query,)
+        if not all(isinstance(conjunct, BooleanPredicate) for conjunct in conjuncts):
+            return None
+
+        changing = [conjunct for conjunct in conjuncts if conjunct.func.name in self.changing_predicates]
+        static = [conjunct for conjunct in conjuncts if conjunct.func.name not in self.changing_predicates]
+        if not changing or not static:
+            return None
+
+        static_symbols = predicate_symbols(static)
+        changing_symbols = [predicate_symbols([conjunct]) for conjunct in changing]
+        coef_expr = sympify(summand.coef_expr)
+        coef_symbols = list(coef_expr.free_symbols)
+
+        bound_symbols = set(static_symbols).union(*changing_symbols)
+        if not static_symbols or not all(changing_symbols) or \
+                not bound_symbols.issuperset(list(summand.query_symbols) + coef_symbols):
+            return None
+
+        symbols = static_symbols
+        rows = self.ask_query(static_symbols, And(*static)) or []
+        for conjunct, conjunct_symbols in zip(changing, changing_symbols):
+            conjunct_rows = self.ask_query(conjunct_symbols, conjunct) or []
+            rows, symbols = join_answers(rows, symbols, conjunct_rows, conjunct_symbols)
+
+        answer_indices = [symbols.index(symbol) for symbol in summand.query_symbols]
+        coef_indices = [symbols.index(symbol) for symbol in coef_symbols]
+        coef_function = lambdify(coef_symbols, coef_expr, "math")
+
+        # like the knowledge bases, return every combination of query symbols and coefficient only once
+        answers = OrderedSet()
+        for row in rows:
+            coefficient = coef_function(*[float(row[i]) for i in coef_indices])
+            answers.add(tuple(row[i] for i in answer_indices) + (coefficient,))
+
+        return list(answers)
+
+    def compile(self, rlpProblem):
         """
-        constr_name = constraint_str(constraint)
+        Normalizes the objective and every constraint of the given rlp into the intermediate representation used by
+        :func:`expr_to_matrix`. This runs the symbolic preprocessing (expansion, normalization of the RlpSums and
+        translation of the coefficients into queries) exactly once per model.
+
+        :param rlpProblem: The instance of the given rlp
+        :type rlpProblem: rlpProblem
+        :return: The compiled objective and constraints
+        :rtype: CompiledProblem
+        """
+        objective = self.compile_expression(rlpProblem.objective, True, EmptySet())
+        constraints = []
+        name_counts = {}
+        for constraint in rlpProblem.constraints:
+            compiled = self.compile_constraint(constraint)
+
+            # structurally identical constraints are still grounded into blocks of their own
+            count = name_counts.get(compiled.name, 0)
+            name_counts[compiled.name] = count + 1
+            if count > 0:
+                compiled = compiled._replace(name=compiled.name + "_" + str(count))
+
+            constraints.append(compiled)
+
+        return CompiledProblem(objective, constraints)
 
-        self.row_dicts[constr_name] = OrderedSet()
-        row_dict = self.row_dicts[constr_name]
+    def compile_constraint(self, constraint):
+        """
+        Compiles a given constraint into a :class:`CompiledConstraint`.
 
+        :param constraint: The constraint to be compiled.
+        :return: The compiled constraint
+        :rtype: CompiledConstraint
+        """
         if isinstance(constraint, Rel):
-            lhs = constraint.lhs - constraint.rhs
+            relation = constraint
             constr_query = True
             constr_query_symbols = EmptySet()
-            if isinstance(constraint, GreaterThan):
-                lhs *= -1
         elif isinstance(constraint, ForAll):
-            lhs = constraint.relation.lhs - constraint.relation.rhs
-            if isinstance(constraint.relation, GreaterThan):
-                lhs *= -1
+            relation = constraint.relation
             constr_query = constraint.query
             constr_query_symbols = constraint.query_symbols
         else:
             raise Exception("Impossible-to-happen Exception!")
 
-        var_blocks = self.expr_to_matrix(lhs, row_dict, constr_query, constr_query_symbols)
+        lhs = relation.lhs - relation.rhs
+        if isinstance(relation, GreaterThan):
+            lhs *= -1
 
-        self.blocks[constr_name] = var_blocks
+        summands = self.compile_expression(lhs, constr_query, constr_query_symbols)
+        return CompiledConstraint(constraint_str(constraint), isinstance(relation, Equality), summands)
 
-    def expr_to_matrix(self, expr, row_dict, constr_query, constr_query_symbols):
+    def compile_expression(self, expr, constr_query, constr_query_symbols):
         """
-        First normalizes a given expression with a visitor pattern then queries the knowledge base for the given query
-        and assigns the results to their respective row and column index defined the the row and column dictionaries.
+        Normalizes a given expression with a visitor pattern and splits it into its summands. For every summand the
+        query for the knowledge base, the coefficient expression and the lp variable are determined.
 
-        :param expr: The expression to be grounded
+        :param expr: The expression to be compiled
         :type expr: Sympy Expression| RLPSum
-        :param row_dict: An OrderedSet containing the row indices for the lp matrix for the given expression
-        :type row_dict: OrderedSet
         :param constr_query: The query originating from a given constraint
         :type constr_query: Sympy Expression | RLPSum
         :param constr_query_symbols: A Set containing the query symbols for the given constraint query
         :type constr_query_symbols: FiniteSet
-        :return: A dictionary containing a unique name for the variable and the results returned from the knowledge base.
+        :return: A list of :class:`CompiledSummand`
         """
         expr = Normalizer(expr).result
 
@@ -187,12 +505,10 @@ class BlockGrounder(Grounder):
         else:
             summands = expr.args
 
-        result = {}
+        result = []
         log.debug("\nSummands: %s", str(summands))
 
         for summand in summands:
-            log.debug("\n->summand: %s", str(summand))
-
             if isinstance(summand, RlpSum):
                 summand_query = summand.query
                 summand_query_symbols = summand.query_symbols
@@ -203,52 +519,82 @@ class BlockGrounder(Grounder):
                 coef_query, coef_expr, variable = coefficient_to_query(summand)
 
             query_symbols = OrderedSet(constr_query_symbols + summand_query_symbols)
-
             query = constr_query & summand_query & coef_query
 
-            answers = self.logkb.ask(query_symbols, query, coef_expr)
             variable_qs_indices = []
             if variable is not None:
                 variable_qs_indices = [query_symbols.index(arg) for arg in variable.args if isinstance(arg, SubSymbol)]
             constr_qs_indices = [query_symbols.index(symbol) for symbol in constr_query_symbols]
 
+            result.append(CompiledSummand(query, query_symbols, coef_expr, variable,
+                                          variable_qs_indices, constr_qs_indices))
+
+        return result
+
+    def expr_to_matrix(self, summands, row_dict):
+        """
+        Queries the knowledge base for each of the given compiled summands and assigns the results to their respective
+        row and column index defined the the row and column dictionaries.
+
+        :param summands: The compiled summands of the expression to be grounded
+        :type summands: list(CompiledSummand)
+        :param row_dict: An OrderedSet containing the row indices for the lp matrix for the given expression
+        :type row_dict: OrderedSet
+        :return: A dictionary mapping the variable classes to sparse matrices of the results returned from the
+                 knowledge base, with the entries of all summands of the same variable class added up.
+        """
+        entries = {}
+
+        for summand in summands:
+            log.debug("\n->summand: %s", str(summand.query))
+
+            variable = summand.variable
+
             variable_class = variable.__class__
             col_dict = self.col_dicts.get(variable_class, OrderedSet())
             self.col_dicts[variable_class] = col_dict
 
+            # summands with an array predicate splitting their query are inserted as a block of the array
+            triplets = self.array_entries(summand, row_dict, col_dict) if self.arrays else None
+            if triplets is not None:
+                if len(triplets):
+                    entries.setdefault(variable_class, []).append(triplets)
+                continue
+
+            answers = self.ask_summand(summand)
+
             # If the query yields no results we don't have to add anything to the matrix
-            if len(answers) == 0:
+            if not isinstance(answers, AnswerTable):
+                if not answers:
+                    continue
+                answers = answer_table(answers, len(summand.query_symbols))
+            count = len(answers.values)
+            if count == 0:
                 continue
 
-            expr_index = len(answers[0]) - 1
-            sparse_data = []
-            for answer in answers:
-                column_record = []
-
-                # use only subsymbols when they occur, otherwise constants
-                qs_iterator = iter(variable_qs_indices)
-                if variable is not None:
-                    for arg in variable.args:
-                        if isinstance(arg, SubSymbol):
-                            column_record.append(answer[qs_iterator.next()])
-                        else:
-                            column_record.append(arg)
-
-                col_dict_index = col_dict.add(tuple(column_record))
-                row_dict_index = row_dict.add(tuple(answer[i] for i in constr_qs_indices))
-
-                sparse_data.append([np.float(answer[expr_index]), row_dict_index, col_dict_index])
-
-            sparse_data = np.array(sparse_data)
-            summand_block = sp.sparse.coo_matrix((sparse_data[:, 0], (sparse_data[:, 1], sparse_data[:, 2]))).todok()
-
-            if variable_class in result:
-                shape = (len(row_dict), len(col_dict))
-                result[variable_class].resize(shape)
-                summand_block.resize(shape)
-                result[variable_class] += summand_block
-            else:
-                result[variable_class] = summand_block
+            # use only subsymbols when they occur, otherwise constants
+            column_keys = []
+            qs_iterator = iter(summand.variable_qs_indices)
+            if variable is not None:
+                for arg in variable.args:
+                    if isinstance(arg, SubSymbol):
+                        column_keys.append(answers.columns[qs_iterator.next()])
+                    else:
+                        column_keys.append(np.full(count, answers.constants.intern(arg), dtype=np.int64))
+            row_keys = [answers.columns[i] for i in summand.constr_qs_indices]
+
+            columns = key_indices(column_keys, count, answers.constants, col_dict)
+            rows = key_indices(row_keys, count, answers.constants, row_dict)
+
+            entries.setdefault(variable_class, []).append(np.column_stack((answers.values, rows, columns)))
+
+        result = {}
+        for variable_class, blocks in entries.items():
+            sparse_data = np.concatenate(blocks)
+            shape = (len(row_dict), len(self.col_dicts[variable_class]))
+            result[variable_class] = sp.sparse.coo_matrix((sparse_data[:, 0], (sparse_data[:, 1], sparse_data[:, 2])),
+                                                          shape=shape)
+            result[variable_class].sum_duplicates()
 
         return result
 
@@ -287,14 +633,161 @@ def coefficient_to_query(expr):
             return [And(*query), expr.func(*query_expr), var_atom]
 
 
+def answer_table(answers, symbol_count):
+    """
+    Converts a list of answer tuples as returned by :func:`.LogKb.ask` into an :class:`.AnswerTable`.
+
+    :param answers: A list of answer tuples, each consisting of the values of the query symbols and the coefficient
+    :param symbol_count: The number of query symbols
+    :return: The :class:`.AnswerTable`
+    """
+    builder = AnswerTableBuilder(symbol_count, True, sympify)
+    builder.extend(answers)
+    return builder.table()
+
+
+def key_indices(key_columns, count, constants, index_set):
+    """
+    Adds the distinct keys given column-wise as constant ids to an OrderedSet of sympy tuples, such that every distinct
+    key is converted to sympy only once.
+
+    :param key_columns: A list of numpy arrays of constant ids, one per entry of the key
+    :param count: The number of keys
+    :param constants: The :class:`.ConstantDictionary` resolving the ids
+    :param index_set: The OrderedSet the keys are added to, e.g. a row or column dictionary
+    :return: A numpy array holding the index of every key in the OrderedSet
+    """
+    if not key_columns:
+        return np.full(count, index_set.add(()), dtype=np.int64)
+
+    unique, inverse = np.unique(np.column_stack(key_columns), axis=0, return_inverse=True)
+    indices = np.array([index_set.add(tuple(constants.value(index) for index in key)) for key in unique],
+                       dtype=np.int64)
+    return indices[inverse]
+
+
+def array_conjuncts(query, arrays):
+    """
+    :param query: The query of a compiled summand
+    :param arrays: A dict mapping the names of the predicates backed by arrays to their :class:`ArrayPredicate`
+    :return: The list of the conjuncts of the query asking for the value of a predicate backed by an array
+    """
+    if not arrays or not isinstance(query, Basic):
+        return []
+    return [conjunct for conjunct in And.make_args(query) if isinstance(conjunct, BooleanPredicate) and
+            conjunct.func.name in arrays and len(conjunct.args) == len(arrays[conjunct.func.name].positions) + 1]
+
+
+def connected_conjuncts(conjuncts):
+    """
+    Groups the conjuncts of a query into the parts not sharing any symbol.
+
+    :param conjuncts: A list of conjuncts
+    :return: A list of tuples (conjuncts, symbols) of every part or an empty list if a conjunct has no symbol
+    """
+    parts = []
+    for conjunct in conjuncts:
+        symbols = conjunct.atoms(SubSymbol)
+        if not symbols:
+            return []
+        connected = [part for part in parts if part[1] & symbols]
+        parts = [part for part in parts if not part[1] & symbols]
+        parts.append(([other for part in connected for other in part[0]] + [conjunct],
+                      symbols.union(*[part[1] for part in connected])))
+    return parts
+
+
+def constant_positions(column, constants, positions):
+    """
+    :param column: A numpy array of constant ids
+    :param constants: The :class:`.ConstantDictionary` resolving the ids
+    :param positions: A dict mapping the constants of an axis of an array to their positions
+    :return: A numpy array of the position of every constant or -1 for constants not on the axis
+    """
+    unique, inverse = np.unique(column, return_inverse=True)
+    found = np.array([positions.get(normalized_constant(constants.value(index)), -1) for index in unique],
+                     dtype=np.int64)
+    return found[inverse]
+
+
+def array_block(array, positions):
+    """
+    :param array: The :class:`ArrayPredicate`
+    :param positions: A numpy array of positions per axis
+    :return: The numpy array of the values of all combinations of the positions, with an axis per argument
+    """
+    if callable(array.values):
+        return np.asarray(array.values(*positions), dtype=float)
+    return array.values[np.ix_(*positions)]
+
+
+def array_values(array, positions):
+    """
+    :param array: The :class:`ArrayPredicate`
+    :param positions: A numpy array of positions per axis, all of the same length
+    :return: The numpy array of the values at the given positions
+    """
+    if not callable(array.values):
+        return array.values[tuple(positions)]
+
+    # a function computes blocks, hence it is called once for the distinct positions of every axis
+    unique = [np.unique(position, return_inverse=True) for position in positions]
+    block = array_block(array, [axis for axis, inverse in unique])
+    return block[tuple(inverse for axis, inverse in unique)]
+
+
+def query_predicate_names(query):
+    """
+    Collects the names of the predicates occurring in a given query
+
+    :param query: The query as a sympy expression
+    :return: A set containing the names of the predicates
+    """
+    if not isinstance(query, Basic):
+        return set()
+    return set(atom.func.name for atom in query.atoms(BooleanPredicate))
+
+
+def predicate_symbols(predicates):
+    """
+    Collects the sub symbols occurring as arguments of the given predicates
+
+    :param predicates: A list of predicates
+    :return: A list of SubSymbols in the order of their first occurrence
+    """
+    return list(OrderedSet(arg for predicate in predicates for arg in predicate.args if isinstance(arg, SubSymbol)))
+
+
+def join_answers(left_rows, left_symbols, right_rows, right_symbols):
+    """
+    Joins two lists of answer tuples on their common symbols
+
+    :param left_rows: The answers of the first query
+    :param left_symbols: The symbols of the first query in the order of the answer tuples
+    :param right_rows: The answers of the second query
+    :param right_symbols: The symbols of the second query in the order of the answer tuples
+    :return: A tuple of the joined answers and their symbols
+    """
+    left_key = [left_symbols.index(symbol) for symbol in right_symbols if symbol in left_symbols]
+    right_key = [i for i, symbol in enumerate(right_symbols) if symbol in left_symbols]
+    right_values = [i for i, symbol in enumerate(right_symbols) if symbol not in left_symbols]
+
+    index = {}
+    for row in right_rows:
+        index.setdefault(tuple(row[i] for i in right_key), []).append(tuple(row[i] for i in right_values))
+
+    rows = [left + right for left in left_rows for right in index.get(tuple(left[i] for i in left_key), ())]
+    return rows, left_symbols + [right_symbols[i] for i in right_values]
+
+
 def variable_name_for_expression(expr):
     """
     Generates a unique identifier for a given expression
 
     :param expr: The expression for which the identifier is generated.
-    :return: A str unique to the given expression (Memory Address)
+    :return: A str unique to the structure of the given expression
     """
-    return 'VAL' + str(id(expr))
+    return 'VAL' + structural_hash(expr)
 
 
 def constraint_str(constraint):
@@ -302,9 +795,26 @@ def constraint_str(constraint):
     Generates a unique identifier for a given constraint
 
     :param constraint: The constraint for which the identifier is generated.
-    :return: A str unique to the given expression (Memory Address)
+    :return: A str unique to the structure of the given constraint
     """
-    return 'CONSTR' + str(id(constraint))
+    return 'CONSTR' + structural_hash(constraint)
+
+
+def structural_hash(expr):
+    """
+    Generates a hash from the structure of a given expression or constraint. Unlike the memory address, the hash is the
+    same for structurally identical expressions and stable across runs and processes.
+
+    :param expr: The expression or constraint to be hashed.
+    :return: A str of hexadecimal digits
+    """
+    if isinstance(expr, ForAll):
+        expr_repr = "ForAll(" + srepr(expr.query_symbols) + ", " + srepr(expr.query) + ", " + srepr(expr.relation) + ")"
+    else:
+        expr_repr = srepr(expr)
+
+    return hashlib.sha1(expr_repr).hexdigest()
+
 
 class Normalizer(ImmutableVisitor):
     """
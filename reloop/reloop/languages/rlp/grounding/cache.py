@@ -0,0 +1,101 @@
+import cPickle as pickle
+import hashlib
+import logging
+import os
+import tempfile
+
+from ordered_set import OrderedSet
+from reloop.languages.rlp.grounding.block import structural_hash
+
+log = logging.getLogger(__name__)
+
+# Bump this whenever the layout of the stored groundings changes
+CACHE_FORMAT_VERSION = 1
+
+
+class GroundingCache(object):
+    """
+    Stores grounded relational linear programs on disk. An entry is keyed by the structural hashes of the objective,
+    the constraints and the lp variables of the model together with the fingerprint of the knowledge base, such that
+    re-running an unchanged model on unchanged data skips the grounding entirely.
+    """
+
+    def __init__(self, directory):
+        """
+        :param directory: The directory the grounded matrices are stored in. It is created if it does not exist.
+        :type directory: str
+        """
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, rlpProblem, compiled, fingerprint):
+        """
+        Computes the key of a grounding.
+
+        :param rlpProblem: The model to be grounded
+        :param compiled: The compiled model as returned by :func:`.BlockGrounder.compile`
+        :param fingerprint: The fingerprint of the data in the knowledge base, see :func:`.LogKb.fingerprint`
+        :return: A str of hexadecimal digits
+        """
+        sha = hashlib.sha1()
+        sha.update(str(CACHE_FORMAT_VERSION))
+        sha.update(str(rlpProblem.sense))
+        for reloop_variable in rlpProblem.reloop_variables:
+            sha.update(predicate_key(reloop_variable))
+        sha.update(structural_hash(rlpProblem.objective))
+        for constraint in compiled.constraints:
+            sha.update(constraint.name)
+        sha.update(fingerprint)
+        return sha.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".grounding")
+
+    def load(self, key, rlpProblem):
+        """
+        Loads a grounding from the cache.
+
+        :param key: The key of the grounding, see :func:`key`
+        :param rlpProblem: The model the grounding belongs to. Its lp variables are used to rebuild the variable map.
+        :return: The tuple (lp, col_dicts) as returned by :func:`.BlockGrounder.ground` or None if the key is unknown.
+        """
+        path = self.path(key)
+        if not os.path.isfile(path):
+            return None
+
+        with open(path, "rb") as cache_file:
+            entry = pickle.load(cache_file)
+
+        col_dicts = {}
+        for reloop_variable in rlpProblem.reloop_variables:
+            col_dicts[reloop_variable] = OrderedSet(entry["col_dicts"][predicate_key(reloop_variable)])
+
+        return entry["lp"], col_dicts
+
+    def store(self, key, lp, col_dicts):
+        """
+        Stores a grounding in the cache. The file is written to a temporary location first and moved afterwards, such
+        that concurrent processes never read a partially written entry.
+
+        :param key: The key of the grounding, see :func:`key`
+        :param lp: The tuple of matrices (c, g, h, a, b)
+        :param col_dicts: The column dictionaries of the lp variables
+        """
+        entry = {"lp": lp,
+                 "col_dicts": dict((predicate_key(predicate), list(columns))
+                                   for predicate, columns in col_dicts.items() if predicate is not None.__class__)}
+
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, "wb") as cache_file:
+            pickle.dump(entry, cache_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, self.path(key))
+        log.debug("Stored grounding %s in the cache.", key)
+
+
+def predicate_key(predicate):
+    """
+    :param predicate: A predicate type
+    :return: A str identifying the predicate by name and arity
+    """
+    return predicate.name + "/" + str(predicate.arity)
@@ -1,4 +1,16 @@
 import abc
+import numpy as np
+import scipy.sparse
+from collections import namedtuple
+
+OBJECTIVE = "objective"
+EQUALITY = "equality"
+INEQUALITY = "inequality"
+
+# A block of rows of a grounded lp. kind is one of OBJECTIVE, EQUALITY and INEQUALITY. factors maps every lp variable
+# class to a sparse matrix, whose columns are numbered per lp variable class in the order of the variable map of the
+# grounder. The rows of the block read factors * x <= rhs for inequalities and factors * x = rhs for equalities.
+GroundBlock = namedtuple('GroundBlock', 'name kind factors rhs')
 
 
 class Grounder(object):
@@ -20,5 +32,174 @@ class Grounder(object):
         """
         raise NotImplementedError("")
 
+    def ground_blocks(self, rlpProblem):
+        """
+        Grounds a relational linear program block by block. Grounding strategies that are able to produce the lp
+        incrementally override this, such that the caller can consume every block as soon as it is grounded, e.g. with
+        an :class:`LpAssembler`. The default grounds the whole problem and splits the result into blocks.
+
+        :param rlpProblem: The problem to be grounded
+        :return: A generator of :class:`GroundBlock`, the objective first. After it is exhausted,
+                 :func:`variable_map` returns the variable map of the grounding.
+        """
+        (c, g, h, a, b), self._variable_map = self.ground(rlpProblem)
+
+        offsets = [0]
+        for reloop_variable in rlpProblem.reloop_variables:
+            offsets.append(offsets[-1] + len(self._variable_map.get(reloop_variable, ())))
+
+        def split(matrix):
+            matrix = scipy.sparse.csc_matrix(matrix)
+            return dict((reloop_variable, matrix[:, offsets[i]:offsets[i + 1]])
+                        for i, reloop_variable in enumerate(rlpProblem.reloop_variables))
+
+        yield GroundBlock(OBJECTIVE, OBJECTIVE, split(rlpProblem.sense * np.asarray(c).T), np.zeros(1))
+        if a is not None:
+            yield GroundBlock(EQUALITY, EQUALITY, split(a), np.asarray(b).ravel())
+        if g is not None:
+            yield GroundBlock(INEQUALITY, INEQUALITY, split(g), np.asarray(h).ravel())
+
+    def variable_map(self):
+        """
+        :return: The variable map of the last grounding of :func:`ground_blocks`, which maps every lp variable class
+                 to the ordered arguments of its columns
+        """
+        return self._variable_map
+
+    def compile(self, rlpProblem):
+        """
+        Translates the objective and the constraints of a relational linear program into an intermediate
+        representation, which is cached by the :class:`RlpProblem` and passed back to the grounder on every call of
+        :func:`ground`. Grounding strategies that do not need such a preprocessing step do not have to override this.
+
+        :param rlpProblem: The problem to be compiled
+        :return: The intermediate representation of the problem or None
+        """
+        return None
+
+    def invalidate(self, *predicate_names):
+        """
+        Notifies the grounder that the facts of the given predicates have changed in the knowledge base. Grounding
+        strategies that keep intermediate results between calls of :func:`ground` discard the results depending on
+        these predicates. Grounding strategies that always ground from scratch do not have to override this.
+
+        :param predicate_names: The names of the changed predicates
+        """
+        pass
+
     def ask(self, query):
         return self.logkb.ask(query.atoms(), query)
+
+
+class LpAssembler(object):
+    """
+    Assembles the matrices of a grounded lp from the blocks yielded by :func:`Grounder.ground_blocks`. The entries of
+    every block are copied into flat arrays as soon as the block arrives, such that the block itself can be discarded
+    and the grounded lp is held in memory only once. The matrices are built from these arrays without further copies.
+    """
+
+    def __init__(self, rlpProblem):
+        """
+        :param rlpProblem: The problem, whose lp variables determine the order of the columns
+        """
+        self.sense = rlpProblem.sense
+        self.reloop_variables = list(rlpProblem.reloop_variables)
+        self.variable_indices = dict((reloop_variable, index) for index, reloop_variable in
+                                     enumerate(self.reloop_variables))
+        self.entries = dict((kind, BlockEntries()) for kind in (OBJECTIVE, EQUALITY, INEQUALITY))
+        self.rhs = dict((kind, GrowingArray(np.float64)) for kind in (EQUALITY, INEQUALITY))
+        self.block_counts = dict((kind, 0) for kind in (OBJECTIVE, EQUALITY, INEQUALITY))
+
+    def add(self, block):
+        """
+        Appends the rows of a block to the lp.
+
+        :param block: A :class:`GroundBlock`
+        """
+        entries = self.entries[block.kind]
+        row_offset = 0 if block.kind == OBJECTIVE else self.rhs[block.kind].size
+
+        for reloop_variable, matrix in block.factors.items():
+            entries.add(row_offset, self.variable_indices[reloop_variable], matrix.tocoo())
+
+        if block.kind != OBJECTIVE:
+            self.rhs[block.kind].extend(block.rhs)
+        self.block_counts[block.kind] += 1
+
+    def matrices(self, variable_map):
+        """
+        :param variable_map: The variable map of the grounding, see :func:`Grounder.variable_map`
+        :return: The tuple (c, g, h, a, b) as returned by :func:`Grounder.ground`. The matrices of the kinds no block
+                 was added for are None.
+        """
+        offsets = np.cumsum([0] + [len(variable_map.get(reloop_variable, ())) for reloop_variable in
+                                   self.reloop_variables])
+        column_count = int(offsets[-1])
+
+        rows, columns, data = self.entries[OBJECTIVE].resolve(offsets)
+        c = scipy.sparse.coo_matrix((self.sense * data, (columns, np.zeros_like(rows))), shape=(column_count, 1))
+
+        lp = [c.todense()]
+        for kind in (INEQUALITY, EQUALITY):
+            if self.block_counts[kind] == 0:
+                lp += [None, None]
+                continue
+
+            rhs = self.rhs[kind].view()
+            rows, columns, data = self.entries[kind].resolve(offsets)
+            # adding zero turns negative zeros into plain zeros
+            lp += [scipy.sparse.coo_matrix((data, (rows, columns)), shape=(len(rhs), column_count)),
+                   np.matrix(rhs + 0.0).T]
+
+        return tuple(lp)
+
+
+class BlockEntries(object):
+    """
+    The non-zero entries of a kind of rows, stored as flat arrays of rows, lp variable classes, columns per lp
+    variable class and values.
+    """
+
+    def __init__(self):
+        self.rows = GrowingArray(np.int32)
+        self.variables = GrowingArray(np.int16)
+        self.columns = GrowingArray(np.int32)
+        self.data = GrowingArray(np.float64)
+
+    def add(self, row_offset, variable_index, matrix):
+        nonzero = matrix.data != 0
+        self.rows.extend(matrix.row[nonzero] + row_offset)
+        self.variables.extend(np.repeat(np.int16(variable_index), np.count_nonzero(nonzero)))
+        self.columns.extend(matrix.col[nonzero])
+        self.data.extend(matrix.data[nonzero])
+
+    def resolve(self, offsets):
+        """
+        :param offsets: The column of the first lp variable of every lp variable class
+        :return: The arrays (rows, columns, values)
+        """
+        columns = self.columns.view() + offsets[self.variables.view()].astype(np.int32)
+        return self.rows.view(), columns, self.data.view()
+
+
+class GrowingArray(object):
+    """
+    A one dimensional numpy array, whose capacity is doubled whenever it is exceeded.
+    """
+
+    def __init__(self, dtype, capacity=1024):
+        self.array = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        size = self.size + len(values)
+        if size > len(self.array):
+            array = np.empty(max(size, 2 * len(self.array)), dtype=self.array.dtype)
+            array[:self.size] = self.array[:self.size]
+            self.array = array
+
+        self.array[self.size:size] = values
+        self.size = size
+
+    def view(self):
+        return self.array[:self.size]
@@ -1,12 +1,14 @@
 from grounder import Grounder
 from reloop.languages.rlp import *
-from sympy.core.relational import Rel, Ge, Le, Eq
-from sympy.core import expand, Add, Mul, Pow, Expr, Float
+from reloop.languages.rlp.grounding.block import Normalizer
+from sympy.core.relational import Rel, Ge, Eq
+from sympy.core import Add, Mul, Dummy
 from sympy.logic.boolalg import *
+from sympy import lambdify
+from collections import OrderedDict
 import scipy.sparse
 import numpy
 from ordered_set import OrderedSet
-from reloop.languages.rlp.visitor import *
 
 class RecursiveGrounder(Grounder):
     """
@@ -17,343 +19,411 @@ class RecursiveGrounder(Grounder):
         self.logkb = logkb
 
     def ground(self, rlpProblem):
+        """
+        Grounds the rlp constraint by constraint. The objective and the relation of every constraint are compiled once
+        into an :class:`AffineTemplate`, which is then evaluated for every answer of the constraint query and yields the
+        numeric row of the lp directly.
+
+        :param rlpProblem: The instance of the given rlp
+        :return: The tuple (lp, lp variables)
+        """
         self.lpmodel = LpProblem(rlpProblem.sense)
-        self.add_objective_to_lp(self.ground_expression(rlpProblem.objective))
+        self.predicate_values = {}
+
+        row, constant = next(self.evaluate_template(AffineTemplate(rlpProblem.objective, ()), [{}]))
+        self.lpmodel.add_affine_objective([(key, factor) for key, factor in row.items() if factor != 0])
 
         for constraint in rlpProblem.constraints:
             if isinstance(constraint, Rel):
-                lhs = constraint.lhs - constraint.rhs
-                ground_result = constraint.__class__(expand(self.ground_expression(lhs)), 0.0)
-                self.add_constraint_to_lp(ground_result)
+                relation = constraint
+                query_symbols = ()
+                answers = [()]
             else:
-                # maybe pre-ground here?
-                # result = self.ground_expression(constraint.relation, bound=constraint.query_symbols)
-                result = constraint.ground(self.logkb)
-                for expr in result:
-                    ground = self.ground_expression(expr)
-                    ground_result = ground.__class__(expand(self.ground_expression(ground.lhs)), ground.rhs)
-                    self.add_constraint_to_lp(ground_result)
+                relation = constraint.relation
+                query_symbols = tuple(constraint.query_symbols)
+                answers = self.logkb.ask(constraint.query_symbols, constraint.query) or []
 
-        return self.lpmodel.get_scipy_matrices(rlpProblem), self.lpmodel.lp_variables
+            template = AffineTemplate(relation.lhs - relation.rhs, query_symbols)
+            bindings = [bind(query_symbols, answer) for answer in answers]
 
-    def ground_expression(self, expr):
+            # answers grounding the relation to the same row yield the row only once
+            rows = set()
+            for row, constant in self.evaluate_template(template, bindings):
+                factors = tuple((key, factor) for key, factor in row.items() if factor != 0)
+                if (factors, constant) not in rows:
+                    rows.add((factors, constant))
+                    self.add_row_to_lp(relation, factors, constant)
 
-        expression_grounder = ExpressionGrounder(expr, self.logkb)
-        return expression_grounder.result
+        return self.lpmodel.get_scipy_matrices(rlpProblem), self.lpmodel.lp_variables
 
-    def add_constraint_to_lp(self, constraint):
+    def evaluate_template(self, template, bindings):
         """
-        Adds a grounded constraint to the LP
+        Evaluates a template for every binding. The terms of all bindings are expanded first, such that the values of
+        the numeric predicates they contain are looked up with one query per predicate, see :func:`fetch_predicate_values`.
+        The sums of the template are likewise grounded for all bindings at once, see :func:`AffineTemplate.expand`.
 
-        :param constraint: The grounded constraint.
+        :param template: The :class:`AffineTemplate`
+        :param bindings: A list of dicts mapping the bound symbols of the template to their values
+        :return: A generator of tuples (row, constant), where row maps (lp variable class, arguments) to factors
         """
-        # log.debug("Add constraint: " + str(constraint))
-        # + "\n" + srepr(constraint)
-
-        if self.is_valid_constraint(constraint):
-            lhs = constraint.lhs
-            b = constraint.rhs
-            if constraint.lhs.func is Add:
-                for s in constraint.lhs.args:
-                    if s.is_Atom:
-                        lhs -= s
-                        b -= s
-
-            # TODO handle Lt and Gt
-            if constraint.func is Ge:
-                sense = 1
-            elif constraint.func is Eq:
-                sense = 0
-            elif constraint.func is Le:
-                sense = -1
-            self.lpmodel += (lhs, b, sense)
-
-    def add_objective_to_lp(self, objective):
+        expanded = template.expand(self, bindings)
+        self.fetch_predicate_values(lookup for terms in expanded for term, binding in terms
+                                    for lookup in term.lookups(binding))
+
+        for terms in expanded:
+            row = OrderedDict()
+            constant = 0.0
+            for term, binding in terms:
+                constant += term.evaluate(self, binding, row)
+            yield row, constant
+
+    def add_row_to_lp(self, relation, factors, constant):
         """
-        Adds a grounded objective to the LP
+        Adds a grounded constraint in the form sum(factors) + constant ~ 0 to the LP, where ~ is the relation of the
+        constraint.
 
-        :param objective: A grounded expression (the objective)
+        :param relation: The relation of the constraint
+        :param factors: A list of tuples ((lp variable class, arguments), factor)
+        :param constant: The constant part of the grounded left hand side
         """
-        # log.debug("Add objective: " + str(objective))
-        # + "\n" + srepr(objective)
-        if self.is_valid_constraint(objective):
-            expr = objective
-            if objective.func is Add:
-                for s in objective.args:
-                    if s.is_Atom:
-                        expr -= s
+        if not factors:
+            if not relation.__class__(constant, 0):
+                raise ValueError("A constraint was grounded to False. You defined a constraint that can't be satisfied")
+            return
+
+        if isinstance(relation, Ge):
+            sense = 1
+        elif isinstance(relation, Eq):
+            sense = 0
+        else:
+            sense = -1
+        self.lpmodel.add_affine_constraint(factors, -constant, sense)
 
-            self.lpmodel += expr
+    def predicate_value(self, predicate_class, args):
+        """
+        Looks up the value of a numeric predicate in the logkb. Values are cached for the current grounding and
+        usually fetched in bulk beforehand, see :func:`fetch_predicate_values`.
 
-    def is_valid_constraint(self, constraint):
-        if isinstance(constraint, BooleanTrue):
-            return False
+        :param predicate_class: The type of the numeric predicate
+        :param args: The ground arguments of the predicate
+        :return: The value as float
+        """
+        key = (predicate_class.name, args)
+        if key not in self.predicate_values:
+            self.fetch_predicate_values([(predicate_class, args)])
 
-        if isinstance(constraint, BooleanFalse):
-            raise ValueError("A constraint was grounded to False. You defined a constraint that can't be satisfied")
+        return self.predicate_values[key]
 
-        return True
+    def fetch_predicate_values(self, lookups):
+        """
+        Looks up the values of many numeric predicates in the logkb, with one call of :func:`.LogKb.ask_predicates` per
+        predicate, and caches them for :func:`predicate_value`.
+
+        :param lookups: An iterable of tuples (type of the numeric predicate, ground arguments)
+        """
+        pending = OrderedDict()
+        for predicate_class, args in lookups:
+            if (predicate_class.name, args) not in self.predicate_values:
+                pending.setdefault(predicate_class.name, (predicate_class, OrderedSet()))[1].add(args)
+
+        for name, (predicate_class, args_list) in pending.items():
+            answers = self.logkb.ask_predicates(predicate_class, list(args_list))
+            for args in args_list:
+                self.predicate_values[(name, args)] = single_value(answers.get(args))
 
 
 class LpProblem():
     def __init__(self, sense, **options):
         self.sense = sense
-        self._index = 0
-        self._objective = ()
+        self._objective = Triplets()
         self._constraints = {}
-        self._constraints[-1] = []
-        self._constraints[1] = []
-        self._constraints[0] = []
+        self._constraints[-1] = Triplets()
+        self._constraints[1] = Triplets()
+        self._constraints[0] = Triplets()
         self._result = None
         self._lp_variables = {}
 
-    def __iadd__(self, other):
-        """
-        Adds a constraint or objective to the lp.
-
-        :param other: Constraint: Tuple of (lhs, b, sense), where lhs is an expression, b an atom (like an integer)
-        and sense either -1, 0 or 1; Objective: An object of type :class:`sympy.core.Expr`
-        :return: self
-        """
-        if isinstance(other, tuple):
-            self.add_constraint(other)
-        elif isinstance(other, Expr):
-            self.add_objective(other)
-        else:
-            raise ValueError("Tuple (Objective) or Expr (Constraint) was expected.")
-
-        return self
-
     @property
     def lp_variables(self):
         return self._lp_variables
 
-    def add_lp_variable(self, predicate):
-        if predicate.__class__ not in self._lp_variables:
-            self._lp_variables[predicate.__class__] = OrderedSet()
+    def lp_variable_index(self, varclass, args):
+        if varclass not in self._lp_variables:
+            self._lp_variables[varclass] = OrderedSet()
 
-        return self._lp_variables[predicate.__class__].add(predicate.args)
+        return self._lp_variables[varclass].add(args)
 
     @property
     def lp_variable_count(self):
         return sum([len(predicate) for key, predicate in self._lp_variables.items()])
 
     def get_scipy_matrices(self, rlpProblem):
+        """
+        Builds the matrices of the lp from the triplets collected so far. Every matrix is built with a single call to
+        :class:`scipy.sparse.coo_matrix`.
 
+        :param rlpProblem: The rlp, whose order of reloop variables determines the order of the columns
+        :return: The tuple (c, g, h, a, b)
+        """
         poscounts = {}
         i = 0
 
         for varclass in rlpProblem.reloop_variables:
             if varclass in self._lp_variables:
-                # print "asdf"
-                # print varclass
-                # print i
                 poscounts[varclass] = i
                 i += len(self._lp_variables[varclass])
 
-        ineq_constraint_count = len(self._constraints[1]) + len(self._constraints[-1])
-        eq_constraint_count = len(self._constraints[0])
-
-        a = scipy.sparse.dok_matrix((eq_constraint_count, self.lp_variable_count))
-        b = scipy.sparse.dok_matrix((eq_constraint_count, 1))
-
-        g = scipy.sparse.dok_matrix((ineq_constraint_count, self.lp_variable_count))
-        h = scipy.sparse.dok_matrix((ineq_constraint_count, 1))
-
-        c = scipy.sparse.dok_matrix((self.lp_variable_count, 1))
-
-        i = 0
-        for constraint in self._constraints[0]:
-            for varclass, order, factor in constraint[0]:
-                a[i, poscounts[varclass] + order] = factor
-            b[i] = constraint[1]
-            i += 1
-
-        i = 0
-        for constraint in self._constraints[-1]:
-            for varclass, order, factor in constraint[0]:
-                g[i, poscounts[varclass] + order] = factor
-            h[i] = constraint[1]
-            i += 1
+        column_count = self.lp_variable_count
+        upper, lower, equalities = self._constraints[-1], self._constraints[1], self._constraints[0]
 
-        for constraint in self._constraints[1]:
-            for varclass, order, factor in constraint[0]:
-                g[i, poscounts[varclass] + order] = -factor
-            h[i] = -constraint[1]
-            i += 1
+        rows, columns, factors = equalities.entries(poscounts)
+        a = scipy.sparse.coo_matrix((factors, (rows, columns)), shape=(len(equalities), column_count))
+        b = numpy.matrix(equalities.rhs, dtype=float).reshape(len(equalities), 1)
 
-        for variable in self._objective:
-            c[poscounts[variable[0]] + variable[1]] = variable[2]
+        upper_rows, upper_columns, upper_factors = upper.entries(poscounts)
+        lower_rows, lower_columns, lower_factors = lower.entries(poscounts)
+        rows = numpy.concatenate((upper_rows, lower_rows + len(upper)))
+        columns = numpy.concatenate((upper_columns, lower_columns))
+        factors = numpy.concatenate((upper_factors, -lower_factors))
+        g = scipy.sparse.coo_matrix((factors, (rows, columns)), shape=(len(upper) + len(lower), column_count))
+        h = numpy.matrix(numpy.concatenate((numpy.array(upper.rhs, dtype=float),
+                                            -numpy.array(lower.rhs, dtype=float)))).reshape(len(upper) + len(lower), 1)
 
-        c = self.sense * c
+        # adding zero turns the negative zeros of negated right hand sides into plain zeros
+        b += 0.0
+        h += 0.0
 
-        return c.todense(), g.tocoo(), h.todense(), a.tocoo(), b.todense()
+        rows, columns, factors = self._objective.entries(poscounts)
+        c = scipy.sparse.coo_matrix((self.sense * factors, (columns, rows)), shape=(column_count, 1))
 
-    def lp_variable(self):
-        curr_index = self._index
-        self._index += 1
-        return curr_index
+        return c.todense(), g, h, a, b
 
-    def add_constraint(self, constraint_tuple):
-        lhs, b, sense = constraint_tuple
-        variable_factors = self.get_affine(lhs)
-        self._constraints[sense].append((variable_factors, b))
+    def add_affine_constraint(self, factors, b, sense):
+        """
+        Adds a constraint given by the factors of its lp variables.
 
-    def add_objective(self, expr):
-        self._objective = self.get_affine(expr)
+        :param factors: A list of tuples ((lp variable class, arguments), factor). The factors of an lp variable
+                        occurring more than once are added up.
+        :param b: The right hand side
+        :param sense: 1 for a lower bound (>=), 0 for an equality and -1 for an upper bound (<=)
+        """
+        self._constraints[sense].append(self.variable_factors(factors), b)
 
-    def get_affine(self, expr):
-        # TODO: predicates should be called atoms here!
-        predicates, factors = get_predicates_factors(expr)
-        length = len(predicates)
-        factor_vector = numpy.zeros(length)
+    def add_affine_objective(self, factors):
+        """
+        Sets the objective given by the factors of its lp variables.
 
-        contained_lp_variables = []
-        used_lp_variables = []
-        lp_variable_orders = []
+        :param factors: A list of tuples ((lp variable class, arguments), factor), see :func:`add_affine_constraint`
+        """
+        self._objective = Triplets()
+        self._objective.append(self.variable_factors(factors), 0)
 
-        for j in range(length):
-            lp_variable = self.add_lp_variable(predicates[j])
+    def variable_factors(self, factors):
+        """
+        :param factors: A list of tuples ((lp variable class, arguments), factor)
+        :return: A list of tuples (lp variable class, order, factor), in which every lp variable occurs only once
+        """
+        variable_factors = OrderedDict()
+        for (varclass, args), factor in factors:
+            key = (varclass, self.lp_variable_index(varclass, args))
+            variable_factors[key] = variable_factors.get(key, 0.0) + factor
 
-            if predicates[j] in used_lp_variables:
-                factor_vector[used_lp_variables.index(predicates[j])] += factors[j]
-            else:
-                contained_lp_variables.append(predicates[j])
-                used_lp_variables.append(predicates[j])
-                lp_variable_orders.append(lp_variable)
-                factor_vector[used_lp_variables.index(predicates[j])] = factors[used_lp_variables.index(predicates[j])]
-        return [(contained_lp_variables[i].__class__, lp_variable_orders[i], factor_vector[i]) for i in
-                range(len(contained_lp_variables))]
-
-
-def get_predicates_factors(expr):
-    pred_names = []
-    factors = []
-
-    if expr.func is Add:
-        for s in expr.args:
-            p, f = get_predicates_factors(s)
-            pred_names += p
-            factors += f
-
-    elif expr.func is Mul:
-        if expr.args[0].is_Atom:
-            if isinstance(expr.args[1], RlpPredicate):
-                value = expr.args[0]
-                pred = expr.args[1]
-            else:
-                raise NotImplementedError()
+        return [(varclass, order, factor) for (varclass, order), factor in variable_factors.items()]
 
-        elif isinstance(expr.args[0], RlpPredicate):
-            if expr.args[1].is_Atom:
-                value = expr.args[1]
-                pred = expr.args[0]
-            elif isinstance(expr.args[1], RlpPredicate):
-                raise ValueError("Found non-linear constraint!")
-            else:
-                raise NotImplementedError()
+class Triplets(object):
+    """
+    Stores the rows of a sparse matrix as flat lists of (row, lp variable class, order, factor) triplets together with
+    the right hand side of every row. The columns are resolved when the matrices are built, because the offset of a
+    lp variable class is only known after all lp variables have been added.
+    """
 
-        else:
-            raise NotImplementedError()
+    def __init__(self):
+        self.rows = []
+        self.classes = []
+        self.orders = []
+        self.factors = []
+        self.rhs = []
 
-        return [pred], [float(value), ]
+    def __len__(self):
+        return len(self.rhs)
 
-    elif isinstance(expr, RlpPredicate):
-        return [expr], [float(1), ]
+    def append(self, variable_factors, b):
+        """
+        Appends a row.
 
-    elif expr.func is Pow:
-        raise ValueError("Found non-linear constraint!")
-    elif isinstance(expr, Number):
-        return pred_names, factors
-    else:
-        raise NotImplementedError("Cannot get predicates for: " + str(expr) + str(expr.func))
+        :param variable_factors: A list of tuples (lp variable class, order, factor)
+        :param b: The right hand side of the row
+        """
+        row = len(self.rhs)
+        for varclass, order, factor in variable_factors:
+            self.rows.append(row)
+            self.classes.append(varclass)
+            self.orders.append(order)
+            self.factors.append(factor)
+        self.rhs.append(b)
+
+    def entries(self, poscounts):
+        """
+        :param poscounts: A dict mapping every lp variable class to the column of its first lp variable
+        :return: The arrays (rows, columns, factors) of the non-zero entries
+        """
+        rows = numpy.array(self.rows, dtype=int)
+        columns = numpy.array([poscounts[varclass] for varclass in self.classes], dtype=int) + \
+            numpy.array(self.orders, dtype=int)
+        factors = numpy.array(self.factors, dtype=float)
 
-    return pred_names, factors
+        nonzero = factors != 0
+        return rows[nonzero], columns[nonzero], factors[nonzero]
 
 
-class ExpressionGrounder(ImmutableVisitor):
+class AffineTemplate(object):
     """
-    Grounds a sympy expression into a set of lp variables and the grounded expression for the recursive grounder
+    An expression compiled once for a tuple of bound symbols. Evaluating it for values of the bound symbols yields the
+    factors of the lp variables and the constant part of the expression as numbers, without building a sympy expression
+    for every answer.
     """
 
-    def __init__(self, expr, logkb):
-        self.logkb = logkb
-        self.lp_variables = set([])
-
-        expanded_expr = expand(expr)
-        self._result = self.visit(expanded_expr)
+    def __init__(self, expr, bound_symbols):
+        """
+        :param expr: The expression, linear in the lp variables
+        :param bound_symbols: The tuple of symbols whose values are given on evaluation
+        """
+        self.terms = []
+        self.sums = []
+
+        for term in Add.make_args(Normalizer(expr).result):
+            if isinstance(term, RlpSum):
+                query_symbols = tuple(term.query_symbols)
+                template = AffineTemplate(term.expression, bound_symbols + query_symbols)
+                self.sums.append((term, query_symbols, template))
+            elif term.has(RlpSum):
+                raise NotImplementedError("Cannot ground: " + str(term))
+            else:
+                self.terms.append(AffineTerm(term, bound_symbols))
 
-    def visit(self, expr):
+    def expand(self, grounder, bindings):
         """
-        Recursively visits the syntax tree nodes for the given expression and executes a method based on the current properties of the node in the tree.
+        Expands the expression into its terms for many bindings. RlpSums are grounded by querying the logkb of the
+        grounder once per sum for all bindings, see :func:`.LogKb.ask_bound`.
 
-        :param expr: The Sympy expression the visitor visits.
-        :type expr: Sympy Add|Mul|RlpSum|Pow
-        :return: The ground expression
+        :param grounder: The :class:`RecursiveGrounder`
+        :param bindings: A list of dicts mapping the bound symbols to their values
+        :return: A list holding for every binding a list of tuples (:class:`AffineTerm`, binding), whose evaluations
+                 add up to the expression
         """
-        if expr.func in [Mul, Add, Pow]:
-            return expr.func(*map(lambda a: self.visit(a), expr.args))
+        expanded = [[(term, binding) for term in self.terms] for binding in bindings]
 
-        if expr.func is RlpSum:
-            result = self.visit_rlpsum(expr)
-            return self.visit(result)
+        for rlpsum, query_symbols, template in self.sums:
+            outer_bindings = [dict((symbol, value) for symbol, value in binding.items() if symbol not in query_symbols)
+                              for binding in bindings]
+            inner_bindings = []
+            owners = []
+            answers = grounder.logkb.ask_bound(rlpsum.query_symbols, rlpsum.query, outer_bindings)
+            for owner, (outer_binding, sum_answers) in enumerate(zip(outer_bindings, answers)):
+                for answer in sum_answers:
+                    inner_binding = dict(outer_binding)
+                    inner_binding.update(bind(query_symbols, answer))
+                    inner_bindings.append(inner_binding)
+                    owners.append(owner)
 
-        if isinstance(expr, NumericPredicate) and not expr.is_reloop_variable:
-            return self.visit_numeric_predicate(expr)
+            for owner, terms in zip(owners, template.expand(grounder, inner_bindings)):
+                expanded[owner] += terms
 
-        if expr.func is BooleanPredicate:
-            # TODO Evaluate to 0 or 1? Did Martin say: that would be cool?
-            raise ValueError("RlpBooleanPredicate is invalid here!")
+        return expanded
+
+
+class AffineTerm(object):
+    """
+    A summand of an :class:`AffineTemplate`: a coefficient, possibly multiplied by a single lp variable. The coefficient
+    is compiled into a function of the values of the numeric predicates and the bound symbols it contains.
+    """
 
-        return expr
+    def __init__(self, term, bound_symbols):
+        if term.atoms(BooleanPredicate):
+            raise ValueError("RlpBooleanPredicate is invalid here!")
 
-    def visit_rlpsum(self, rlpsum):
+        variables = [atom for atom in term.atoms(NumericPredicate) if atom.is_reloop_variable]
+        if len(variables) > 1:
+            raise ValueError("Found non-linear constraint!")
+
+        coefficient = term
+        self.variable = None
+        if variables:
+            variable = variables[0]
+            factors = Mul.make_args(term)
+            coefficient = Mul(*[factor for factor in factors if factor != variable])
+            if factors.count(variable) != 1 or coefficient.has(variable):
+                raise ValueError("Found non-linear constraint!")
+            self.variable = (variable.func, variable.args)
+
+        self.predicates = []
+        dummies = []
+        for predicate in coefficient.atoms(NumericPredicate):
+            dummy = Dummy()
+            coefficient = coefficient.xreplace({predicate: dummy})
+            self.predicates.append((predicate.func, predicate.args))
+            dummies.append(dummy)
+
+        self.symbols = [symbol for symbol in bound_symbols if symbol in coefficient.free_symbols]
+        free_symbols = set(arg for predicate in [self.variable] + self.predicates if predicate is not None
+                           for arg in predicate[1] if isinstance(arg, SubSymbol))
+        free_symbols |= coefficient.free_symbols - set(dummies)
+        if not free_symbols.issubset(bound_symbols):
+            raise ValueError("Found free symbols while grounding: " + str(term))
+
+        self.function = lambdify(dummies + self.symbols, coefficient, "math")
+
+    def lookups(self, binding):
         """
-        Visitor Method, which is called in case the current node of the syntax tree is an instance of a rlpsum
+        :param binding: A dict mapping the bound symbols to their values
+        :return: A list of tuples (type of the numeric predicate, ground arguments) of the values the term depends on
+        """
+        return [(predicate, tuple(binding.get(arg, arg) for arg in args)) for predicate, args in self.predicates]
 
-        :param rlpsum: The current node, which is an instance of a rlpsum
-        :type rlpsum: RLPSum
-        :return:
+    def evaluate(self, grounder, binding, row):
         """
-        answers = self.logkb.ask(rlpsum.query_symbols, rlpsum.query)
-        result = Float(0.0)
-        for answer in answers:
-            expression_eval_subs = rlpsum.expression
-            for index, symbol in enumerate(rlpsum.query_symbols):
-                subanswer = answer[index]
+        Evaluates the term for a binding of the bound symbols.
 
-                expression_eval_subs = expression_eval_subs.subs(symbol, subanswer)
-                # expression_eval_subs = expression_eval_subs.subs(symbol, answer[index])
-            result += expression_eval_subs
+        :param grounder: The :class:`RecursiveGrounder`, which provides the values of the numeric predicates
+        :param binding: A dict mapping the bound symbols to their values
+        :param row: A dict mapping (lp variable class, arguments) to factors, to which the factor of the term is added
+        :return: The value of the term if it contains no lp variable, 0 otherwise
+        """
+        values = [grounder.predicate_value(predicate, args) for predicate, args in self.lookups(binding)]
+        values += [float(binding[symbol]) for symbol in self.symbols]
+        coefficient = self.function(*values)
 
-        return result
+        if self.variable is None:
+            return coefficient
 
-    def visit_numeric_predicate(self, pred):
-        """
-        Visitor Method, which is called in case the current node of the syntrax tree for a given expression is a numeric predicate
+        variable, args = self.variable
+        key = (variable, tuple(binding.get(arg, arg) for arg in args))
+        row[key] = row.get(key, 0.0) + coefficient
+        return 0.0
 
-        :param pred: The numeric predicate to be processed
-        :type pred: Numeric Predicate
-        :return:
-        """
-        args = pred.args
-        if len(args) > pred.arity:
-            raise Exception("Too many arguments.")
 
-        if len(args) < pred.arity:
-            raise Exception("Not enough arguments")
+def single_value(answers):
+    """
+    :param answers: The answers of the logkb for a ground numeric predicate
+    :return: The value of the predicate as float
+    """
+    if not answers:
+        raise ValueError('Predicate is not defined or no result!')
 
-        for argument in args:
-            if isinstance(argument, SubSymbol):
-                raise ValueError("Found free symbols while grounding: " + str(pred))
+    if len(answers) != 1:
+        raise ValueError("The LogKb gives multiple results. Oh!")
 
-        answers = self.logkb.ask_predicate(pred)
-        if answers is None:
-            raise ValueError('Predicate is not defined or no result!')
+    return float(answers[0][0])
 
-        if len(answers) != 1:
-            raise ValueError("The LogKb gives multiple results. Oh!")
 
-        result = answers.pop()
+def bind(query_symbols, answer):
+    """
+    Maps query symbols to the values of an answer of the logkb
 
-        return float(result[0])
+    :param query_symbols: The tuple of query symbols
+    :param answer: The answer tuple
+    :return: A dict mapping the symbols to their values
+    """
+    # this ensures that pydatalog strings do not get parsed by sympy
+    return dict((symbol, Symbol(value) if isinstance(value, basestring) else value)
+                for symbol, value in zip(query_symbols, answer))
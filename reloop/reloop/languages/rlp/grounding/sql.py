@@ -0,0 +1,227 @@
+from block import BlockGrounder
+from grounder import GroundBlock, OBJECTIVE, EQUALITY, INEQUALITY
+from reloop.languages.rlp import *
+from reloop.languages.rlp.logkb import SQLKb
+from reloop.languages.rlp.sql_renderer import from_logical_query, render_constant
+from sympy import simplify
+from sympy.logic.boolalg import BooleanTrue
+from collections import OrderedDict
+from ordered_set import OrderedSet
+import scipy.sparse
+import numpy as np
+import logging
+
+log = logging.getLogger(__name__)
+
+TABLE_PREFIX = "reloop_"
+
+
+class SQLGrounder(BlockGrounder):
+    """
+    Grounds a rlp inside the database of a :class:`.SQLKb`. The answers of every compiled summand are stored in a
+    temporary table, the rows and columns of the lp are numbered with DENSE_RANK() and only the (row, column, value)
+    triplets of the lp are transferred, in chunks. The joins and the indexing thus run in the database and the
+    grounder merely loads arrays.
+    """
+
+    def __init__(self, logkb, cache=None, chunk_size=10000):
+        """
+        :param logkb: The knowledge base, an instance of :class:`.SQLKb`
+        :param cache: An optional :class:`.GroundingCache`, see :class:`.BlockGrounder`
+        :param chunk_size: The number of triplets fetched from the database at once
+        """
+        assert isinstance(logkb, SQLKb), "The SQLGrounder needs a SQL knowledge base"
+        super(SQLGrounder, self).__init__(logkb, cache)
+        self.chunk_size = chunk_size
+
+    def ground_blocks(self, rlpProblem):
+        """
+        Grounds the rlp block by block, see :func:`.Grounder.ground_blocks`. All summands are evaluated by the database
+        before the first block is yielded, because the columns of an lp variable class depend on all of them.
+
+        :param rlpProblem: The instance of the given rlp
+        :return: A generator of :class:`.GroundBlock`
+        """
+        assert not self.arrays, "The SQLGrounder grounds inside the database and cannot look up array predicates"
+        self.col_dicts = {}
+        compiled = rlpProblem.compile()
+
+        expressions = [(OBJECTIVE, OBJECTIVE, compiled.objective)]
+        expressions += [(constraint.name, EQUALITY if constraint.is_equality else INEQUALITY, constraint.summands)
+                        for constraint in compiled.constraints]
+
+        tables = []
+        try:
+            summand_tables = []
+            for index, (name, kind, summands) in enumerate(expressions):
+                summand_tables.append([])
+                for summand in summands:
+                    table = TABLE_PREFIX + "summand_" + str(len(tables))
+                    self.logkb.execute("CREATE TEMPORARY TABLE " + table + " AS " + self.summand_sql(summand))
+                    tables.append(table)
+                    summand_tables[-1].append((table, summand))
+
+            # the columns of an lp variable class are numbered over the summands of all expressions
+            variables = OrderedDict()
+            for table, summand in [entry for entries in summand_tables for entry in entries]:
+                if summand.variable is not None:
+                    variables.setdefault(summand.variable.__class__, []).append((table, len(summand.variable.args)))
+
+            column_tables = {}
+            for index, (variable_class, variable_tables) in enumerate(variables.items()):
+                table = TABLE_PREFIX + "columns_" + str(index)
+                self.logkb.execute("CREATE TEMPORARY TABLE " + table + " AS " + columns_sql(variable_tables))
+                tables.append(table)
+                column_tables[variable_class] = (index, table, variable_tables[0][1])
+                self.col_dicts[variable_class] = self.fetch_columns(table, variable_tables[0][1])
+
+            variable_classes = variables.keys()
+            for (name, kind, summands), expression_tables in zip(expressions, summand_tables):
+                log.debug("\nGrounding: \n %s", name)
+                yield self.fetch_block(name, kind, expression_tables, column_tables, variable_classes)
+        except Exception:
+            # a failed statement aborts the transaction, which would reject the drops below
+            self.logkb.discard_transaction()
+            raise
+        finally:
+            for table in tables:
+                self.logkb.execute("DROP TABLE IF EXISTS " + table)
+
+    def summand_sql(self, summand):
+        """
+        Renders the query of a summand, which selects the row keys r0, r1, ..., the column keys k0, k1, ... and the
+        value v of every answer of the summand.
+
+        :param summand: The compiled summand
+        :type summand: CompiledSummand
+        :return: The query as str
+        """
+        query_symbols = tuple(summand.query_symbols)
+        query = simplify(summand.query)
+
+        if isinstance(query, BooleanTrue):
+            # a single number, e.g. the rhs of a non-forall-quantified constraint
+            return "SELECT " + render_constant(summand.coef_expr) + " AS v"
+
+        answer_columns = ["q" + str(index) for index in range(len(query_symbols))] + ["v"]
+        answer_sql = from_logical_query(query_symbols, query, summand.coef_expr, self.logkb.cursor,
+                                        self.logkb.column_names, self.logkb.optimize_queries, self.logkb.unique_keys)
+
+        selectors = ["s.q" + str(index) + " AS r" + str(position)
+                     for position, index in enumerate(summand.constr_qs_indices)]
+        if summand.variable is not None:
+            qs_iterator = iter(summand.variable_qs_indices)
+            for position, arg in enumerate(summand.variable.args):
+                value = "s.q" + str(qs_iterator.next()) if isinstance(arg, SubSymbol) else render_constant(arg)
+                selectors.append(value + " AS k" + str(position))
+        selectors.append("s.v AS v")
+
+        return "WITH s(" + ", ".join(answer_columns) + ") AS (" + answer_sql + ") SELECT " + ", ".join(selectors) + \
+               " FROM s"
+
+    def fetch_columns(self, table, arity):
+        """
+        :param table: The table of the columns of an lp variable class, see :func:`columns_sql`
+        :param arity: The arity of the lp variable class
+        :return: An OrderedSet of the arguments of the columns in the order of their numbers
+        """
+        keys = ", ".join(["k" + str(index) for index in range(arity)] or ["col"])
+        columns = OrderedSet()
+        for rows in self.logkb.fetch_chunks("SELECT " + keys + " FROM " + table + " ORDER BY col", self.chunk_size):
+            for row in self.logkb.transform_answer(rows):
+                columns.add(tuple(row) if arity else ())
+        return columns
+
+    def fetch_block(self, name, kind, expression_tables, column_tables, variable_classes):
+        """
+        Fetches the triplets of an expression and builds its block.
+
+        :param name: The name of the expression
+        :param kind: The kind of the block, see :class:`.GroundBlock`
+        :param expression_tables: A list of tuples (table, summand) of the summands of the expression
+        :param column_tables: A dict mapping the lp variable classes to tuples (index, table, arity) of their columns
+        :param variable_classes: The list of lp variable classes, in the order of their indices
+        :return: The :class:`.GroundBlock`
+        """
+        row_count = len(expression_tables[0][1].constr_qs_indices) if expression_tables else 0
+        rows, variables, columns, values = [], [], [], []
+
+        if expression_tables:
+            query = triplets_sql(expression_tables, column_tables, row_count)
+            for chunk in self.logkb.fetch_chunks(query, self.chunk_size):
+                chunk = np.array(chunk, dtype=float)
+                rows.append(chunk[:, 0].astype(int))
+                variables.append(chunk[:, 1].astype(int))
+                columns.append(chunk[:, 2].astype(int))
+                values.append(chunk[:, 3])
+
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=int)
+        variables = np.concatenate(variables) if variables else np.zeros(0, dtype=int)
+        columns = np.concatenate(columns) if columns else np.zeros(0, dtype=int)
+        values = np.concatenate(values) if values else np.zeros(0)
+
+        row_count = int(rows.max()) + 1 if len(rows) else 0
+        if kind == OBJECTIVE:
+            row_count = 1
+
+        factors = {}
+        for index, variable_class in enumerate(variable_classes):
+            selected = variables == index
+            if np.any(selected):
+                shape = (row_count, len(self.col_dicts[variable_class]))
+                factors[variable_class] = scipy.sparse.coo_matrix((values[selected], (rows[selected],
+                                                                                      columns[selected])), shape=shape)
+
+        # at some point we had lhs = lhs - rhs, so now we have to put b back on the rhs
+        rhs = np.zeros(row_count)
+        constants = variables == -1
+        np.add.at(rhs, rows[constants], -values[constants])
+
+        return GroundBlock(name, kind, factors, rhs)
+
+
+def columns_sql(variable_tables):
+    """
+    Renders the query numbering the columns of an lp variable class in the order of their arguments.
+
+    :param variable_tables: A list of tuples (table, arity) of the summand tables containing the lp variable class
+    :return: The query as str, which selects the arguments k0, k1, ... and the number col of every column
+    """
+    arity = variable_tables[0][1]
+    if arity == 0:
+        union = " UNION ".join(["SELECT 0 AS col FROM " + table for table, arity in variable_tables])
+        return "SELECT DISTINCT col FROM (" + union + ") AS u"
+
+    keys = ", ".join(["k" + str(index) for index in range(arity)])
+    union = " UNION ".join(["SELECT " + keys + " FROM " + table for table, arity in variable_tables])
+    return "SELECT " + keys + ", DENSE_RANK() OVER (ORDER BY " + keys + ") - 1 AS col FROM (" + union + ") AS u"
+
+
+def triplets_sql(expression_tables, column_tables, row_arity):
+    """
+    Renders the query of the (row, lp variable class, column, value) triplets of an expression. The rows are numbered
+    in the order of their keys and the values of equal triplets are added up. Constants have the lp variable class -1.
+
+    :param expression_tables: A list of tuples (table, summand) of the summands of the expression
+    :param column_tables: A dict mapping the lp variable classes to tuples (index, table, arity) of their columns
+    :param row_arity: The number of row keys
+    :return: The query as str
+    """
+    row_keys = ["r" + str(index) for index in range(row_arity)]
+
+    parts = []
+    for table, summand in expression_tables:
+        selectors = ["t." + key for key in row_keys]
+        if summand.variable is None:
+            parts.append("SELECT " + ", ".join(selectors + ["-1 AS variable", "0 AS col", "t.v AS v"]) +
+                         " FROM " + table + " AS t")
+            continue
+
+        index, column_table, arity = column_tables[summand.variable.__class__]
+        conditions = ["t.k" + str(position) + " = c.k" + str(position) for position in range(arity)] or ["1 = 1"]
+        parts.append("SELECT " + ", ".join(selectors + [str(index) + " AS variable", "c.col AS col", "t.v AS v"]) +
+                     " FROM " + table + " AS t JOIN " + column_table + " AS c ON " + " AND ".join(conditions))
+
+    row = "DENSE_RANK() OVER (ORDER BY " + ", ".join(row_keys) + ") - 1" if row_keys else "0"
+    return "WITH u AS (" + " UNION ALL ".join(parts) + ") SELECT " + row + " AS row, variable, col, SUM(v) FROM u " + \
+           "GROUP BY " + ", ".join(row_keys + ["variable", "col"])
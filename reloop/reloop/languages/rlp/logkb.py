@@ -2,12 +2,23 @@
 from sympy import simplify
 from sympy.logic.boolalg import *
 from ordered_set import OrderedSet
+from collections import namedtuple, OrderedDict
 
+import numpy as np
 import logging
 import abc
+import hashlib
+import itertools
+import csv
+import threading
+import time
+from cStringIO import StringIO
 
 from reloop.languages.rlp import *
 from reloop.languages.rlp.sql_renderer import *
+from reloop.languages.rlp.columnar import evaluate, distinct, combined_keys, join_indices
+from reloop.languages.rlp.planner import QueryPlanner, PredicateStatistics
+from reloop.languages.rlp.materialization import Materialization, unique_rows, difference, intersection
 
 
 # Try to import at least one knowledge base to guarantee the functionality of Reloop
@@ -19,13 +30,20 @@ except ImportError:
 
 try:
     import psycopg2
+    import psycopg2.pool
     psycopg2_available = True
 except ImportError:
     psycopg2_available = False
 
 try:
-    import problog.tasks.probability as problog_task
-    from problog.engine import Term
+    import sqlite3
+    sqlite_available = True
+except ImportError:
+    sqlite_available = False
+
+try:
+    from problog.engine import DefaultEngine, Term
+    from problog.program import PrologString
     problog_available = True
 except ImportError:
     problog_available = False
@@ -36,11 +54,14 @@ try:
 except ImportError:
     prolog_available = False
 
-assert psycopg2_available or pydatalog_available or prolog_available or problog_available, \
+assert psycopg2_available or sqlite_available or pydatalog_available or prolog_available or problog_available, \
     'Import Error : Please install any one of our interface Knowledgebases to proceed. ' \
-    'Currently available are PostgreSQL and Pydatalog.'
+    'Currently available are PostgreSQL, SQLite and Pydatalog.'
 log = logging.getLogger(__name__)
 
+# the Prolog operators comparing the values of arithmetic expressions
+PROLOG_COMPARISONS = {"<": "<", "<=": "=<", ">": ">", ">=": ">=", "==": "=:=", "!=": "=\\="}
+
 
 class LogKb:
     """
@@ -50,9 +71,11 @@ class LogKb:
     This class does not provide the implementation itself but rather the framework for implementing one's own
     knowledgebase if desired.
 
-    We provide four working implementations of logkbs available to the user :
+    We provide six working implementations of logkbs available to the user :
         * PyDataLog
         * PostgreSQL
+        * SQLite
+        * NumPy arrays held in memory
         * SWI-Prolog
         * Prolog as part of Problog
 
@@ -94,6 +117,94 @@ class LogKb:
         """
         raise NotImplementedError()
 
+    def ask_predicates(self, predicate_class, args_list):
+        """
+        Queries the logical knowledge base for the values of many ground instances of the same predicate at once.
+        Knowledge bases override this to resolve all instances with a single query, the default asks for every
+        instance separately.
+
+        For Example : cost, [('a','b'), ('a','c')]
+        returns {('a','b'): [(50,)], ('a','c'): [(100,)]}
+
+        :param predicate_class: The type of the predicate
+        :param args_list: A list of argument tuples, which contain only constants
+        :return: A dict mapping the argument tuples to the values as returned by :func:`ask_predicate`. Argument tuples \
+                 without a value are left out.
+        """
+        answers = {}
+        for args in args_list:
+            result = self.ask_predicate(predicate_class(*args))
+            if result:
+                answers[args] = result
+        return answers
+
+    def ask_bound(self, query_symbols, logical_query, bindings):
+        """
+        Answers a query once for each of many bindings of some of its symbols, e.g. the query of a sum for every answer
+        of the query of its constraint. Bindings, which agree on the symbols occurring in the query, are answered once.
+        Knowledge bases override this to resolve all bindings with a single query, the default asks for every binding
+        separately.
+
+        For Example : [Y], edge(X, Y), [{X: 'a'}, {X: 'b'}, {X: 'a'}]
+        returns [[('b',), ('c',)], [('d',)], [('b',), ('c',)]]
+
+        :param query_symbols: see :func:`ask`
+        :param logical_query: see :func:`ask`
+        :param bindings: A list of dicts mapping symbols to constants
+        :return: A list holding the list of answers of the query for every binding
+        """
+        symbols, rows, indices = bound_rows(logical_query, bindings)
+        answers = [self.ask(query_symbols, logical_query.xreplace(dict(zip(symbols, row)))) or [] for row in rows]
+        return [answers[index] for index in indices]
+
+    def ask_raw(self, query_symbols, logical_query, coeff_expr=None):
+        """
+        Answers a query like :func:`ask`, but returns the answer tuples as given by the knowledge base, i.e. without
+        converting them to sympy. Knowledge bases override this, the default returns the answers of :func:`ask`.
+
+        :param query_symbols: see :func:`ask`
+        :param logical_query: see :func:`ask`
+        :param coeff_expr: The coefficient expression evaluated for every answer or None
+        :return: A list of answer tuples
+        """
+        return self.ask(query_symbols, logical_query, coeff_expr)
+
+    def ask_table(self, query_symbols, logical_query, coeff_expr=None):
+        """
+        Answers a query like :func:`ask`, but returns the answers column-wise with constants interned to integer ids,
+        see :class:`AnswerTable`. Grounders use this instead of :func:`ask`, which is kept for compatibility.
+
+        :param query_symbols: see :func:`ask`
+        :param logical_query: see :func:`ask`
+        :param coeff_expr: The coefficient expression evaluated for every answer or None
+        :return: An :class:`AnswerTable`
+        """
+        builder = AnswerTableBuilder(len(query_symbols), coeff_expr is not None, self.type_converter)
+        builder.extend(self.ask_raw(query_symbols, logical_query, coeff_expr))
+        return builder.table()
+
+    def fingerprint(self):
+        """
+        Computes a fingerprint of the data held by the knowledge base, which changes whenever facts or rules change.
+        Grounders use it to decide whether a cached grounding is still valid. Knowledge bases that cannot provide a
+        fingerprint return None, which disables caching.
+
+        :return: A str or None
+        """
+        return None
+
+    def statistics(self, predicate_name, arity):
+        """
+        Describes the facts of a predicate for the :class:`.QueryPlanner`, which orders the conjuncts of queries for
+        knowledge bases evaluating them from left to right. Knowledge bases that cannot provide statistics return
+        None, as do derived predicates.
+
+        :param predicate_name: The name of the predicate
+        :param arity: The arity of the predicate
+        :return: The :class:`.PredicateStatistics` of the predicate or None
+        """
+        return None
+
     @classmethod
     def transform_answer(self, answers):
         """
@@ -124,12 +235,124 @@ class LogKb:
         return sympify(item)
 
 
+# The answers of a query held column-wise. columns holds a numpy array of constant ids for every query symbol, values
+# the numpy array of the coefficients or None and constants the ConstantDictionary resolving the ids.
+AnswerTable = namedtuple('AnswerTable', 'columns values constants')
+
+
+class ConstantDictionary(object):
+    """
+    Interns the constants of answers to integer ids, such that answers are stored in arrays and converted to sympy only
+    once per distinct constant.
+    """
+
+    def __init__(self, converter):
+        """
+        :param converter: The function converting a constant to sympy, see :func:`LogKb.type_converter`
+        """
+        self.converter = converter
+        self.ids = {}
+        self.constants = []
+        self.converted = {}
+
+    def __len__(self):
+        return len(self.constants)
+
+    def intern(self, constant):
+        """
+        :param constant: A constant as returned by the knowledge base or as sympy object
+        :return: The id of the constant
+        """
+        index = self.ids.get(constant)
+        if index is None:
+            index = self.ids[constant] = len(self.constants)
+            self.constants.append(constant)
+        return index
+
+    def value(self, index):
+        """
+        :param index: The id of a constant
+        :return: The constant converted to sympy
+        """
+        result = self.converted.get(index)
+        if result is None:
+            constant = self.constants[index]
+            result = constant if isinstance(constant, Basic) else self.converter(constant)
+            self.converted[index] = result
+        return result
+
+
+class AnswerTableBuilder(object):
+    """
+    Builds an :class:`AnswerTable` from the rows of a query, which are added in chunks.
+    """
+
+    def __init__(self, symbol_count, has_values, converter):
+        """
+        :param symbol_count: The number of query symbols, i.e. the number of leading columns of a row
+        :param has_values: True if the last column of a row is the coefficient
+        :param converter: The function converting a constant to sympy, see :func:`LogKb.type_converter`
+        """
+        self.symbol_count = symbol_count
+        self.has_values = has_values
+        self.constants = ConstantDictionary(converter)
+        self.columns = [[] for _ in range(symbol_count)]
+        self.values = []
+
+    def extend(self, rows):
+        """
+        :param rows: A list of answer tuples
+        """
+        if not rows:
+            return
+        columns = zip(*rows)
+        intern = self.constants.intern
+        for chunks, column in zip(self.columns, columns[:self.symbol_count]):
+            chunks.append(np.fromiter((intern(constant) for constant in column), dtype=np.int64, count=len(rows)))
+        if self.has_values:
+            self.values.append(np.array([coefficient_value(value) for value in columns[-1]]))
+
+    def table(self):
+        """
+        :return: The :class:`AnswerTable` of all rows added
+        """
+        columns = [np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64) for chunks in self.columns]
+        values = None
+        if self.has_values:
+            values = np.concatenate(self.values) if self.values else np.zeros(0)
+        return AnswerTable(columns, values, self.constants)
+
+
 class PyDatalogLogKb(LogKb):
-    def __init__(self):
+    """
+    A Logical Knowledge Base based on the facts and rules loaded into pyDatalog.
+
+    Every distinct shape of a query is compiled once into a persistent helper predicate, whose constants are turned
+    into arguments. Queries of the same shape, e.g. differing only in their constants, thus reuse the loaded rule.
+    pyDatalog evaluates the body of a rule from left to right, hence the conjuncts are ordered by a
+    :class:`.QueryPlanner` first.
+    """
+
+    # the prefix of the names of the helper predicates, which are excluded from the fingerprint
+    helper_prefix = "reloop_helper_"
+
+    def __init__(self, cache_answers=False, plan_queries=True):
+        """
+        :param cache_answers: If True, the answers of every query are kept until the facts or rules of the predicates
+                              the query depends on change. Checking for changes takes time linear in the number of
+                              these facts, which pays off for queries asked repeatedly.
+        :param plan_queries: If True, the conjuncts of every query are ordered by the statistics of their predicates,
+                             otherwise they are evaluated in the order given by sympy
+        """
         assert pydatalog_available, \
             "Import Error: PyDatalog is not installed on your machine. " \
             "To use our PyDatalog interface please install pydatalog"
 
+        self.cache_answers = cache_answers
+        self.answers = {}
+        self.planner = QueryPlanner(self.statistics) if plan_queries else None
+        self.predicate_statistics = {}
+
     def ask(self, query_symbols, logical_query, coeff_expr=None):
         """
         Builds a pyDataLog program from the logical_query and loads it. Then executes the query for the query_symbols.
@@ -140,34 +363,93 @@ class PyDatalogLogKb(LogKb):
         :type:
         :return:
         """
-        helper_len = 0
-        tmp = None
-        if not query_symbols:
+        answers = self.ask_raw(query_symbols, logical_query, coeff_expr)
+        if answers is None:
             return None
-        if coeff_expr is None:
-            helper_len = len(query_symbols)
-            helper_predicate = 'helper(' + ','.join([str(v) for v in query_symbols]) + ')'
-            tmp = helper_predicate + " <= " + self.transform_query(logical_query)
-        else:
-            helper_len = len(query_symbols) + 1
-            syms = OrderedSet(query_symbols)
-            syms.add('COEFF_EXPR')
-            helper_predicate = 'helper(' + ','.join([str(v) for v in syms]) + ')'
-            index_query = self.transform_query(logical_query)
+        return self.transform_answer(answers)
+
+    def ask_raw(self, query_symbols, logical_query, coeff_expr=None):
+        """
+        Executes the query with the helper predicate of its shape, loading the helper predicate on first use, see
+        :func:`ask` and :func:`LogKb.ask_raw`.
+
+        :param query_symbols: The symbols to be queried.
+        :type query_symbols: list(SubSymbol)
+        :param logical_query:
+        :type:
+        :return:
+        """
+        if not query_symbols and coeff_expr is None:
+            return None
+
+        if self.planner is not None:
+            logical_query = self.planner.plan(logical_query)
+
+        constants = []
+        body = self.transform_query(logical_query, constants)
+        variables = [str(v) for v in query_symbols]
+        if coeff_expr is not None:
+            variables.append('COEFF_EXPR')
             coeff_query = "(COEFF_EXPR == " + str(coeff_expr) + ")"
-            if index_query is None:
-                tmp = helper_predicate + " <= " + coeff_query
-            else:
-                tmp = helper_predicate + " <= " + " & ".join([index_query, coeff_query])
-        log.debug("pyDatalog query: " + tmp)
-        pyDatalog.load(tmp)
-        answer = pyDatalog.ask(helper_predicate)
-        pyEngine.Pred.reset_clauses(pyEngine.Pred("helper", helper_len))
+            body = coeff_query if body is None else " & ".join([body, coeff_query])
 
-        if answer is None:
-            return []
+        helper_name = self.helper_predicate(["CONST_" + str(index) for index in range(len(constants))] + variables,
+                                            body)
+        query = helper_name + "(" + ",".join(["\'" + str(constant) + "\'" for constant in constants] + variables) + ")"
+        log.debug("pyDatalog query: " + query)
 
-        return self.transform_answer(answer.answers)
+        signature = None
+        if self.cache_answers:
+            signature = predicate_signature(helper_name + "/" + str(len(constants) + len(variables)))
+            cached = self.answers.get(query)
+            if cached is not None and cached[0] == signature:
+                return cached[1]
+
+        answer = pyDatalog.ask(query)
+        answers = [] if answer is None else answer.answers
+
+        if self.cache_answers:
+            self.answers[query] = (signature, answers)
+        return answers
+
+    def helper_predicate(self, arguments, body):
+        """
+        Loads the rule of a helper predicate unless it is loaded already. The name of the helper predicate is derived
+        from the rule, such that every distinct rule is loaded only once.
+
+        :param arguments: The names of the variables in the head of the rule
+        :param body: The body of the rule in pyDatalog syntax
+        :return: The name of the helper predicate
+        """
+        rule = "(" + ",".join(arguments) + ") <= " + body
+        name = self.helper_prefix + hashlib.sha1(rule).hexdigest()[:16]
+
+        # pyDatalog.clear() removes the rule again
+        predicate = pyEngine.Logic.tl.logic.Db.get(name + "/" + str(len(arguments)))
+        if predicate is None or not predicate.clauses:
+            log.debug("pyDatalog rule: " + name + rule)
+            pyDatalog.load(name + rule)
+        return name
+
+    def assert_facts(self, predicate_name, facts):
+        """
+        Asserts many facts of a predicate at once, without parsing every single fact like pyDatalog.assert_fact.
+
+        For Example : "cost", numpy.array([[1, 2, 50], [1, 3, 100]])
+
+        :param predicate_name: The name of the predicate
+        :param facts: An iterable of fact tuples or a two-dimensional numpy array
+        """
+        if hasattr(facts, "tolist"):
+            facts = facts.tolist()
+
+        predicate = None
+        for fact in facts:
+            if predicate is None:
+                predicate = pyEngine.Pred(predicate_name, len(fact))
+                predicate.prearity = len(fact)
+            literal = pyEngine.Literal(predicate, [pyEngine.Term.of(value) for value in fact])
+            pyEngine.assert_(pyEngine.Clause(literal, []))
 
     def ask_predicate(self, predicate):
         """
@@ -186,59 +468,156 @@ class PyDatalogLogKb(LogKb):
             return None
         return self.transform_answer(answer.answers)
 
+    def ask_predicates(self, predicate_class, args_list):
+        """
+        Queries all facts of the predicate at once and picks the values of the given argument tuples.
+
+        :param predicate_class: see :func:`~logkb.LogKB.ask_predicates`
+        :param args_list: see :func:`~logkb.LogKB.ask_predicates`
+        :return: see :func:`~logkb.LogKB.ask_predicates`
+        """
+        variables = ["A" + str(index) for index in range(predicate_class.arity)]
+        answer = pyDatalog.ask(predicate_class.name + "(" + ",".join(variables + ["X"]) + ")")
+
+        if answer is None:
+            return {}
+        return select_answers(args_list, answer.answers, self.transform_answer)
+
+    def statistics(self, predicate_name, arity):
+        """
+        Counts the facts of a predicate loaded into pyDatalog, see :func:`LogKb.statistics`. The statistics are kept
+        until the number of facts changes.
+
+        :param predicate_name: see :func:`LogKb.statistics`
+        :param arity: see :func:`LogKb.statistics`
+        :return: see :func:`LogKb.statistics`
+        """
+        predicate = pyEngine.Logic.tl.logic.Db.get(predicate_name + "/" + str(arity))
+        if predicate is None or predicate.clauses:
+            return None
+
+        cached = self.predicate_statistics.get(predicate.id)
+        if cached is None or cached[0] != len(predicate.db):
+            rows = [[term.id for term in clause.head.terms] for clause in predicate.db.values()]
+            cached = (len(predicate.db), fact_statistics(rows, arity))
+            self.predicate_statistics[predicate.id] = cached
+        return cached[1]
+
+    def fingerprint(self):
+        """
+        Hashes the identifiers of all facts and clauses currently loaded into pyDatalog.
+
+        :return: A str of hexadecimal digits
+        """
+        sha = hashlib.sha1()
+        database = pyEngine.Logic.tl.logic.Db
+        for pred_id in sorted(database.keys()):
+            # predicates without any clauses and the helper predicates of :func:`ask` do not hold any data
+            if not database[pred_id].db or pred_id.startswith(self.helper_prefix):
+                continue
+            sha.update(pred_id)
+            for clause_id in sorted(repr(key) for key in database[pred_id].db.keys()):
+                sha.update(clause_id)
+        return sha.hexdigest()
+
     @staticmethod
-    def transform_query(logical_query):
+    def transform_query(logical_query, constants=None):
         """
         Recursively builds the logical_query string from the given logical logical_query,by evaluating
 
         :param logical_query: Type changes depending on the recursive depth and the depth of the expression. \
-                              The logical query, needed for the pyDataLog program string.
-        :type logical_query: Boolean, BooleanPredicate
+                              The logical query, needed for the pyDataLog program string. A list is rendered as the
+                              conjunction of its elements in the given order, see :func:`.QueryPlanner.plan`.
+        :type logical_query: Boolean, BooleanPredicate, list
+        :param constants: An optional list. If given, the constants of the query are appended to it and replaced by
+                          the variables CONST_0, CONST_1, ...
         :return: The complete Body for loading the program into pyDataLog.
         """
+        if isinstance(logical_query, list):
+            return " &".join([PyDatalogLogKb.transform_query(arg, constants) for arg in logical_query])
+
         if logical_query == True:
             return None
 
         if logical_query.func is And:
-            return " &".join([PyDatalogLogKb.transform_query(arg) for arg in logical_query.args])
+            return " &".join([PyDatalogLogKb.transform_query(arg, constants) for arg in logical_query.args])
 
         if logical_query.func is Not:
-            return " ~" + PyDatalogLogKb.transform_query(logical_query.args[0])
+            return " ~" + PyDatalogLogKb.transform_query(logical_query.args[0], constants)
+
+        if isinstance(logical_query, Rel):
+            replacements = {}
+            for constant in logical_query.atoms(Symbol) - logical_query.atoms(SubSymbol):
+                if constants is not None:
+                    replacements[constant] = Symbol("CONST_" + str(len(constants)))
+                    constants.append(constant)
+                else:
+                    replacements[constant] = Symbol("\'" + str(constant) + "\'")
+            sides = [str(side.xreplace(replacements)) for side in logical_query.args]
+            return " (" + sides[0] + " " + logical_query.rel_op + " " + sides[1] + ")"
 
         if isinstance(logical_query, BooleanPredicate):
-            join = ",".join(
-                [str(arg) if isinstance(arg, SubSymbol) else "\'" + str(arg) + "\'" for arg in logical_query.args])
-            return " " + logical_query.name + "(" + join + ")"
+            args = []
+            for arg in logical_query.args:
+                if isinstance(arg, SubSymbol):
+                    args.append(str(arg))
+                elif constants is not None:
+                    args.append("CONST_" + str(len(constants)))
+                    constants.append(arg)
+                else:
+                    args.append("\'" + str(arg) + "\'")
+            return " " + logical_query.name + "(" + ",".join(args) + ")"
 
         raise NotImplementedError
 
 
-class PostgreSQLKb(LogKb):
+class SQLKb(LogKb):
     """
-    A Logical Knowledge Base based on a PostgreSQL database.
+    Interfaces a logical knowledge base based on a SQL database. Every predicate is stored in the table of the same
+    name, whose columns hold the arguments of the predicate followed by the value of the predicate in case of a numeric
+    predicate. Subclasses open the connection and look up the columns of a table.
     """
 
-    def __init__(self, dbname, user, password=None):
-        """
+    # the placeholder for query parameters of the DB-API module of the database
+    placeholder = "%s"
 
-        Opens a connection to the specified database and stores a cursor object for the class to access at runtime.
+    # whether queries are rendered with explicit joins, anti joins and without needless DISTINCT, see SQLRenderer
+    optimize_queries = False
 
-        :param dbname: The name of the Database to connect to
-        :param user: Database User
-        :param password: The password for the given user if applicable
+    # the number of distinct bindings or argument tuples, from which on they are staged into a temporary table and
+    # resolved by a single join, see ask_bound and ask_predicates
+    staging_threshold = 10
+
+    # the number of statements executed so far
+    statements = 0
+
+    @abc.abstractmethod
+    def column_names(self, relation_name):
         """
+        :param relation_name: The name of a table
+        :return: The names of the columns of the table in their order or an empty list if the table does not exist
+        """
+        raise NotImplementedError()
 
-        assert psycopg2_available, \
-            "Import Error : It seems like psycopg2 is currently not installed or available on your machine. " \
-            "To proceed please install psycopg2"
+    def unique_keys(self, relation_name):
+        """
+        :param relation_name: The name of a table
+        :return: A list of tuples of the names of columns, which hold no two equal rows, i.e. the primary key and the
+                 columns of unique indexes. The optimized queries drop DISTINCT if they select such a key of every
+                 table.
+        """
+        return []
 
-        self.connection = psycopg2.connect("dbname=" + str(dbname) + " user=" + str(user) + " password=" + str(password))
-        self.cursor = self.connection.cursor()
-        self.recursive = True
+    def render_query(self, query_symbols, logical_query, coeff_expr):
+        """
+        :return: A tuple of the SQL of a query and the list of its parameters, see :func:`.parameterized_query`
+        """
+        return parameterized_query(query_symbols, logical_query, coeff_expr, self.column_names, self.placeholder,
+                                   self.optimize_queries, self.unique_keys)
 
     def ask(self, query_symbols, logical_query, coeff_expr=None):
         """
-        Builds a PostgreSQL query from a given logical query and its query_symbols
+        Builds a SQL query from a given logical query and its query_symbols
         by implicitly joining over all given predicates.
 
         :param query_symbols: see :func:`~logkb.LogKB.ask`
@@ -252,11 +631,31 @@ class PostgreSQLKb(LogKb):
             # single number here, e.g. the rhs of a non-forall-quantified constraint
             return [[coeff_expr]]
 
-        query = from_logical_query(query_symbols, logical_query, coeff_expr, self.cursor)
-        self.cursor.execute(query)
+        query, parameters = self.render_query(query_symbols, logical_query, coeff_expr)
+        return self.transform_answer(self.query(query, parameters))
 
-        values = self.cursor.fetchall()
-        return self.transform_answer(values)
+    def ask_table(self, query_symbols, logical_query, coeff_expr=None, chunk_size=10000):
+        """
+        Answers a query like :func:`ask`, but fetches the answers in chunks and returns them column-wise, see
+        :class:`AnswerTable`. No sympy object is created for the answers.
+
+        :param query_symbols: see :func:`~logkb.LogKB.ask`
+        :param logical_query: see :func:`~logkb.LogKB.ask`
+        :param coeff_expr: The coefficient expression evaluated for every answer or None
+        :param chunk_size: The number of rows fetched at once
+        :return: An :class:`AnswerTable`
+        """
+        builder = AnswerTableBuilder(len(query_symbols), coeff_expr is not None, self.type_converter)
+        logical_query = simplify(logical_query)
+
+        if isinstance(logical_query, BooleanTrue):
+            builder.extend([[coeff_expr]])
+            return builder.table()
+
+        query, parameters = self.render_query(query_symbols, logical_query, coeff_expr)
+        for rows in self.fetch_chunks(query, chunk_size, parameters):
+            builder.extend(rows)
+        return builder.table()
 
     def ask_predicate(self, predicate):
         """
@@ -270,22 +669,879 @@ class PostgreSQLKb(LogKb):
         :type predicate: BooleanPredicate
         :return: The Value associated with the predicate taken from the database
         """
-        columns = get_column_names(predicate.name)
+        columns = self.column_names(predicate.name)
         if columns:
             query = "SELECT " + str(columns[-1]) + \
                     " FROM " + str(predicate.name.lower()) + \
                     " WHERE " + \
-                    " AND ".join(
-                        [str(columns[index]) + "=" + "'" + str(arg) + "'" for index, arg in enumerate(predicate.args)])
+                    " AND ".join([str(columns[index]) + "=" + self.placeholder for index in range(len(predicate.args))])
+
+            return self.transform_answer(self.query(query, [str(arg) for arg in predicate.args]))
+        else:
+            return None
+
+    def ask_predicates(self, predicate_class, args_list):
+        """
+        Queries the values of all given argument tuples with a single query of the form
+        SELECT x, y, z FROM cost WHERE (x, y) IN (('a', 'b'), ('a', 'c'))
+
+        :param predicate_class: see :func:`~logkb.LogKB.ask_predicates`
+        :param args_list: see :func:`~logkb.LogKB.ask_predicates`
+        :return: see :func:`~logkb.LogKB.ask_predicates`
+        """
+        columns = self.column_names(predicate_class.name)
+        if not columns or not args_list:
+            return {}
+
+        key_columns = columns[:len(args_list[0])]
+        if len(args_list) >= self.staging_threshold and key_columns:
+            # the statement does not depend on the number of argument tuples, as they are staged
+            staged_rows = [tuple(constant_parameter(arg) for arg in args) for args in args_list]
+            table, staged_columns = self.stage_rows([(predicate_class.name, column) for column in key_columns],
+                                                    staged_rows)
+            try:
+                rows = self.query("SELECT " + ", ".join(["p." + column for column in key_columns + [columns[-1]]]) +
+                                  " FROM " + str(predicate_class.name.lower()) + " AS p JOIN " + table + " AS s ON " +
+                                  " AND ".join(["p." + column + " = s." + staged_column
+                                                for column, staged_column in zip(key_columns, staged_columns)]))
+            except Exception:
+                self.discard_transaction()
+                raise
+            finally:
+                self.execute("DROP TABLE IF EXISTS " + table)
+            return select_answers(args_list, rows, self.transform_answer)
+
+        row = "(" + ", ".join([self.placeholder] * len(key_columns)) + ")"
+        query = "SELECT " + ", ".join(key_columns + [columns[-1]]) + \
+                " FROM " + str(predicate_class.name.lower()) + \
+                " WHERE (" + ", ".join(key_columns) + ") IN (" + ", ".join([row] * len(args_list)) + ")"
+
+        rows = self.query(query, [constant_parameter(arg) for args in args_list for arg in args])
+        return select_answers(args_list, rows, self.transform_answer)
+
+    def ask_bound(self, query_symbols, logical_query, bindings):
+        """
+        Answers a query for many bindings, see :func:`LogKb.ask_bound`. If there are at least staging_threshold
+        distinct bindings, they are staged into a temporary table, which is joined with the query, such that a single
+        query answers all of them. Queries with disjunctions and symbols, which no positive predicate binds, are asked
+        for every binding.
+        """
+        symbols, rows, indices = bound_rows(logical_query, bindings)
+        logical_query = simplify(logical_query)
+        predicates = logical_query.args if isinstance(logical_query, And) else (logical_query,)
+        sources = []
+        for symbol in symbols:
+            source = next(((predicate.name, position) for predicate in predicates
+                           if isinstance(predicate, BooleanPredicate) for position, arg in enumerate(predicate.args)
+                           if arg == symbol), None)
+            if source is not None and len(self.column_names(source[0])) > source[1]:
+                sources.append((source[0], self.column_names(source[0])[source[1]]))
+
+        if len(rows) < self.staging_threshold or len(sources) < len(symbols) or not symbols or \
+                logical_query.has(Or):
+            return super(SQLKb, self).ask_bound(query_symbols, logical_query, bindings)
+
+        table, columns = self.stage_rows(sources, [tuple(constant_parameter(value) for value in row) for row in rows])
+        try:
+            # the position of the binding in the staged table is selected first
+            position = SubSymbol("reloop_position")
+            staged = boolean_predicate(table, len(columns))
+            query, parameters = parameterized_query(
+                [position] + list(query_symbols), And(staged(*(symbols + [position])), logical_query), None,
+                lambda name: columns if name == table else self.column_names(name), self.placeholder,
+                self.optimize_queries, self.unique_keys)
+
+            answers = [[] for row in rows]
+            for answer in self.transform_answer(self.query(query, parameters)):
+                answers[int(answer[0])].append(answer[1:])
+        except Exception:
+            self.discard_transaction()
+            raise
+        finally:
+            self.execute("DROP TABLE IF EXISTS " + table)
+        log.debug("%d bindings of %s staged", len(rows), logical_query)
+        return [answers[index] for index in indices]
+
+    def discard_transaction(self):
+        """
+        Rolls back the current transaction after a statement failed. PostgreSQL rejects every further statement of a
+        transaction, in which a statement failed, such that dropping a staged table would raise an error hiding the
+        original one.
+        """
+        self.connection.rollback()
+
+    def stage_rows(self, sources, rows):
+        """
+        Stores rows in a temporary table, whose columns take the types of the given columns. The table has the columns
+        b0, b1, ... holding the rows followed by the column i holding the position of every row.
+
+        :param sources: A list of tuples (table, column) of the columns of the knowledge base, one per entry of a row
+        :param rows: A list of tuples of constants, see :func:`.constant_parameter`
+        :return: A tuple of the name of the temporary table and the list of its columns
+        """
+        table = "reloop_staged_" + str(len(sources))
+        relations = OrderedSet(relation for relation, column in sources)
+        columns = ["b" + str(index) for index in range(len(sources))] + ["i"]
+        selectors = ["r" + str(relations.index(relation)) + "." + column + " AS " + staged_column
+                     for (relation, column), staged_column in zip(sources, columns)]
+
+        # the types of the columns are taken from a query without answers, which works the same in all databases
+        self.execute("CREATE TEMPORARY TABLE " + table + " AS SELECT " + ", ".join(selectors + ["0 AS i"]) +
+                     " FROM " + ", ".join([relation.lower() + " AS r" + str(index)
+                                           for index, relation in enumerate(relations)]) + " WHERE 1 = 0")
+        self.insert_rows(table, [row + (index,) for index, row in enumerate(rows)])
+        return table, columns
+
+    def insert_rows(self, table, rows):
+        """
+        Inserts many rows into a table with a single statement.
+
+        :param table: The name of the table
+        :param rows: A list of tuples of values, one per column of the table
+        """
+        if rows:
+            self.count_statement()
+            self.cursor.executemany("INSERT INTO " + table + " VALUES (" +
+                                    ", ".join([self.placeholder] * len(rows[0])) + ")", rows)
+
+    def query(self, query, parameters=None):
+        """
+        Executes a query and fetches all of its rows.
+
+        :param query: The SQL query
+        :param parameters: The optional parameters of the query
+        :return: The list of rows
+        """
+        self.execute(query, parameters)
+        return self.cursor.fetchall()
+
+    def execute(self, query, parameters=None):
+        """
+        Executes a statement, which does not return rows, e.g. to create a table.
 
+        :param query: The SQL statement
+        :param parameters: The optional parameters of the statement
+        """
+        self.count_statement()
+        if not parameters:
             self.cursor.execute(query)
-            return self.transform_answer(self.cursor.fetchall())
         else:
+            self.cursor.execute(query, parameters)
+
+    def count_statement(self):
+        """
+        Counts an executed statement in statements.
+        """
+        self.statements += 1
+
+    def fetch_chunks(self, query, chunk_size=10000, parameters=None):
+        """
+        Executes a query and fetches its result in chunks, such that the result is never held in memory at once.
+
+        :param query: The SQL query
+        :param chunk_size: The maximum number of rows of a chunk
+        :param parameters: The optional parameters of the query
+        :return: A generator of lists of rows
+        """
+        self.count_statement()
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(query, parameters or ())
+            rows = cursor.fetchmany(chunk_size)
+            while rows:
+                yield rows
+                rows = cursor.fetchmany(chunk_size)
+        finally:
+            cursor.close()
+
+
+class PostgreSQLKb(SQLKb):
+    """
+    A Logical Knowledge Base based on a PostgreSQL database.
+
+    Every thread querying the knowledge base gets its own connection from a pool, such that concurrent grounding workers
+    can query simultaneously. A thread waits for a connection while all of them are taken and returns its connection
+    with :func:`release`. Queries, which are executed repeatedly, are prepared on the server once per connection.
+
+    In tuning mode the knowledge base records the columns its queries look rows up by and the time of every query.
+    :func:`tune` then creates the missing indexes and materializes joins, which recur over several runs, as views.
+    The workload is kept in the table reloop_queries, such that later runs report their speedup. Triggers on the joined
+    tables mark a view stale when their data changes, in whichever connection. A materialized query reads its view
+    only while the view is fresh and evaluates the join instead while it is stale, which the database decides within
+    the same statement, see :func:`view_read`. Stale views are refreshed at the start of a run and by :func:`tune`.
+    """
+
+    # the number of executions over all runs, after which a join without parameters is materialized
+    materialize_after = 2
+
+    def __init__(self, dbname, user, password=None, connections=1, prepare=True, optimize_queries=False, tune=False):
+        """
+
+        Opens a connection to the specified database and stores a cursor object for the class to access at runtime.
+
+        :param dbname: The name of the Database to connect to
+        :param user: Database User
+        :param password: The password for the given user if applicable
+        :param connections: The maximum number of connections, i.e. of threads querying at the same time. Further
+                            threads wait until a connection is released.
+        :param prepare: Whether queries executed repeatedly are prepared on the server
+        :param optimize_queries: Whether queries are rendered in the optimized mode of the :class:`.SQLRenderer`
+        :param tune: Whether the queries are recorded for :func:`tune` and materialized queries read their views
+        """
+
+        assert psycopg2_available, \
+            "Import Error : It seems like psycopg2 is currently not installed or available on your machine. " \
+            "To proceed please install psycopg2"
+
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, connections, "dbname=" + str(dbname) + " user=" + str(
+            user) + " password=" + str(password))
+        self.local = threading.local()
+        # guards the caches, the counters and the tuning records, which all threads share
+        self.lock = threading.RLock()
+        self.available_connections = threading.BoundedSemaphore(connections)
+        self.recursive = True
+        self.prepare = prepare
+        self.cursor_count = 0
+        # the columns and the unique keys of the tables, which are looked up only once
+        self.columns = {}
+        self.keys = {}
+        self.optimize_queries = optimize_queries
+
+        # the workload of this run maps every query to a list [executions, seconds, tables, whether it has parameters],
+        # lookups holds the tuples (table, columns) the queries look rows up by
+        self.tuning = tune
+        self.workload = {}
+        self.lookups = set()
+        # views maps the materialized queries to the queries reading their views, view_queries the other way round
+        self.views = {}
+        self.view_queries = {}
+        if tune:
+            self.execute("SELECT to_regclass(" + self.placeholder + ")", ["reloop_queries"])
+            if self.cursor.fetchone()[0]:
+                self.refresh_views()
+                self.execute("SELECT query, view FROM reloop_queries WHERE view IS NOT NULL")
+                for query, view in self.cursor.fetchall():
+                    self.views[query] = view_read(view, query)
+                    self.view_queries[self.views[query]] = query
+
+    def thread_state(self):
+        """
+        :return: The connection, cursor and prepared statements of the current thread, which takes a connection from
+                 the pool on its first query. The pool raises an error instead of waiting if it is exhausted, hence the
+                 thread waits for one of the connections to be released first.
+        """
+        if not hasattr(self.local, "connection"):
+            self.available_connections.acquire()
+            try:
+                self.local.connection = self.pool.getconn()
+            except Exception:
+                self.available_connections.release()
+                raise
+            self.local.cursor = self.local.connection.cursor()
+            self.local.executed = set()
+            self.local.prepared = {}
+        return self.local
+
+    @property
+    def connection(self):
+        return self.thread_state().connection
+
+    @property
+    def cursor(self):
+        return self.thread_state().cursor
+
+    def release(self):
+        """
+        Returns the connection of the current thread to the pool. Worker threads call this when they are done.
+        """
+        if hasattr(self.local, "connection"):
+            self.local.cursor.close()
+            self.pool.putconn(self.local.connection)
+            del self.local.connection
+            self.available_connections.release()
+
+    def count_statement(self):
+        """
+        Counts an executed statement, see :func:`SQLKb.count_statement`.
+        """
+        with self.lock:
+            self.statements += 1
+
+    def column_names(self, relation_name):
+        """
+        Looks up the columns of a table once, see :func:`SQLKb.column_names`. Tables, which do not exist yet, are looked
+        up again.
+        """
+        with self.lock:
+            columns = self.columns.get(relation_name)
+        if columns is None:
+            columns = get_column_names(relation_name, self.cursor)
+            if columns:
+                with self.lock:
+                    self.columns[relation_name] = columns
+        return columns
+
+    def unique_keys(self, relation_name):
+        """
+        Looks up the primary key and the unique indexes of a table once, see :func:`SQLKb.unique_keys`.
+        """
+        with self.lock:
+            keys = self.keys.get(relation_name)
+        if keys is None:
+            self.cursor.execute("SELECT i.indexrelid, a.attname FROM pg_index i JOIN pg_attribute a ON "
+                                "a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) WHERE i.indisunique AND "
+                                "i.indrelid = to_regclass(" + self.placeholder + ")", [relation_name.lower()])
+            columns = {}
+            for index, column in self.cursor.fetchall():
+                columns.setdefault(index, []).append(column)
+            keys = [tuple(key) for key in columns.values()]
+            with self.lock:
+                self.keys[relation_name] = keys
+        return keys
+
+    def render_query(self, query_symbols, logical_query, coeff_expr):
+        """
+        Renders a query, see :func:`SQLKb.render_query`. In tuning mode the query is recorded and a materialized query
+        reads its view instead, unless the view is stale, see :func:`view_read`.
+        """
+        query, parameters = super(PostgreSQLKb, self).render_query(query_symbols, logical_query, coeff_expr)
+        if not self.tuning:
+            return query, parameters
+
+        lookups = lookup_columns(logical_query, self.column_names)
+        tables = sorted(set(predicate.name.lower() for predicate in logical_query.atoms(BooleanPredicate)))
+        with self.lock:
+            self.lookups.update(lookups)
+            self.workload.setdefault(query, [0, 0.0, tables, bool(parameters)])[0] += 1
+            read = self.views.get(query)
+        if read is None or parameters:
+            return query, parameters
+        return read, parameters
+
+    def refresh_views(self):
+        """
+        Refreshes the stale views and commits.
+        """
+        self.execute("SELECT view FROM reloop_queries WHERE view IS NOT NULL AND stale")
+        for view, in self.cursor.fetchall():
+            log.info("Refreshing the stale view %s", view)
+            # the flag is cleared first, such that writers waiting for its row mark the view stale again after the
+            # commit, and the refresh then sees the data they committed before
+            self.execute("UPDATE reloop_queries SET stale = FALSE WHERE view = " + self.placeholder, [view])
+            self.execute("REFRESH MATERIALIZED VIEW " + view)
+        self.connection.commit()
+
+    def record_time(self, query, seconds):
+        """
+        Adds the time a query took to the workload of this run.
+
+        :param query: The executed SQL query, possibly reading a view
+        :param seconds: The time in seconds
+        """
+        with self.lock:
+            entry = self.workload.get(self.view_queries.get(query, query))
+            if entry is not None:
+                entry[1] += seconds
+
+    def tune(self):
+        """
+        Tunes the database for the queries recorded in tuning mode. The missing indexes on the looked up columns are
+        created, the workload is added to the table reloop_queries and joins without parameters, which were executed at
+        least materialize_after times over all runs, are materialized as views. The speedup of every query over its
+        first run is logged.
+
+        :return: The list of the names of the created indexes and views
+        """
+        # queries of other threads are recorded for the next call
+        with self.lock:
+            workload, lookups = self.workload, self.lookups
+            self.workload, self.lookups = {}, set()
+
+        created = []
+        for table, columns in sorted(lookups):
+            indexes = self.index_columns(table)
+            if indexes is not None and not any(set(index[:len(columns)]) == set(columns) for index in indexes):
+                index = "reloop_" + table + "_" + "_".join(columns)
+                self.execute("CREATE INDEX " + index + " ON " + table + " (" + ", ".join(columns) + ")")
+                created.append(index)
+
+        self.execute("CREATE TABLE IF NOT EXISTS reloop_queries (query TEXT PRIMARY KEY, tables TEXT[], "
+                     "executions INTEGER, first_seconds FLOAT, last_seconds FLOAT, view TEXT, "
+                     "stale BOOLEAN DEFAULT FALSE)")
+        self.execute("CREATE OR REPLACE FUNCTION reloop_mark_stale() RETURNS trigger AS $$ BEGIN "
+                     "UPDATE reloop_queries SET stale = TRUE WHERE TG_TABLE_NAME = ANY(tables); RETURN NULL; "
+                     "END $$ LANGUAGE plpgsql")
+        self.refresh_views()
+
+        first_total, last_total = 0.0, 0.0
+        for query, (executions, seconds, tables, has_parameters) in workload.items():
+            self.execute("SELECT executions, first_seconds, view FROM reloop_queries WHERE query = " +
+                         self.placeholder, [query])
+            row = self.cursor.fetchone()
+            if row is None:
+                self.execute("INSERT INTO reloop_queries (query, tables, executions, first_seconds, last_seconds) "
+                             "VALUES (" + ", ".join([self.placeholder] * 5) + ")",
+                             [query, tables, executions, seconds, seconds])
+                row = (0, seconds, None)
+            else:
+                self.execute("UPDATE reloop_queries SET executions = executions + " + self.placeholder +
+                             ", last_seconds = " + self.placeholder + " WHERE query = " + self.placeholder,
+                             [executions, seconds, query])
+                first_total += row[1]
+                last_total += seconds
+                log.info("%.3fs instead of %.3fs in the first run: %s", seconds, row[1], query)
+
+            if row[2] is None and not has_parameters and len(tables) > 1 and \
+                    row[0] + executions >= self.materialize_after:
+                view = "reloop_view_" + hashlib.md5(query).hexdigest()[:16]
+                self.execute("CREATE MATERIALIZED VIEW " + view + " AS " + query)
+                self.execute("UPDATE reloop_queries SET view = " + self.placeholder + " WHERE query = " +
+                             self.placeholder, [view, query])
+                for table in tables:
+                    self.execute("DROP TRIGGER IF EXISTS reloop_stale ON " + table)
+                    self.execute("CREATE TRIGGER reloop_stale AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON " +
+                                 table + " FOR EACH STATEMENT EXECUTE PROCEDURE reloop_mark_stale()")
+                with self.lock:
+                    self.views[query] = view_read(view, query)
+                    self.view_queries[self.views[query]] = query
+                created.append(view)
+
+        self.connection.commit()
+        if last_total:
+            log.info("The queries of earlier runs took %.3fs instead of %.3fs in their first run, a speedup of %.1f",
+                     last_total, first_total, first_total / last_total)
+        for name in created:
+            log.info("Created %s", name)
+        return created
+
+    def index_columns(self, table):
+        """
+        :param table: The name of a table
+        :return: A list of the lists of the columns of every index of the table in their order or None if the table
+                 does not exist
+        """
+        self.execute("SELECT to_regclass(" + self.placeholder + ")", [table])
+        if self.cursor.fetchone()[0] is None:
+            return None
+
+        self.execute("SELECT i.indexrelid, pg_get_indexdef(i.indexrelid, k + 1, true) FROM pg_index i, "
+                     "generate_series(0, i.indnatts - 1) AS k WHERE i.indrelid = to_regclass(" + self.placeholder +
+                     ") ORDER BY i.indexrelid, k", [table])
+        indexes = OrderedDict()
+        for index, column in self.cursor.fetchall():
+            indexes.setdefault(index, []).append(column)
+        return indexes.values()
+
+    def insert_rows(self, table, rows):
+        """
+        Loads many rows into a table with a single COPY, see :func:`SQLKb.insert_rows`.
+        """
+        if rows:
+            self.count_statement()
+            text = "".join(["\t".join([copy_text(value) for value in row]) + "\n" for row in rows])
+            self.cursor.copy_from(StringIO(text), table)
+
+    def query(self, query, parameters=None):
+        """
+        Executes a query and fetches all of its rows, see :func:`SQLKb.query`. A query is prepared the second time it
+        is executed and runs as prepared statement from then on.
+        """
+        state = self.thread_state()
+        statement = state.prepared.get(query)
+        if statement is None and self.prepare and query in state.executed:
+            statement = "reloop_statement_" + str(len(state.prepared))
+            state.cursor.execute("PREPARE " + statement + " AS " + numbered_placeholders(query, self.placeholder))
+            state.prepared[query] = statement
+        elif statement is None:
+            state.executed.add(query)
+
+        start = time.time()
+        if statement is None:
+            self.execute(query, parameters)
+        elif parameters:
+            self.execute("EXECUTE " + statement + " (" + ", ".join([self.placeholder] * len(parameters)) + ")",
+                         parameters)
+        else:
+            self.execute("EXECUTE " + statement)
+        rows = state.cursor.fetchall()
+        log.debug("%.6fs for %d rows of %s", time.time() - start, len(rows), statement or query)
+        self.record_time(query, time.time() - start)
+        return rows
+
+    def fetch_chunks(self, query, chunk_size=10000, parameters=None):
+        """
+        Fetches the result of a query in chunks with a server-side cursor, see :func:`SQLKb.fetch_chunks`
+        """
+        with self.lock:
+            self.cursor_count += 1
+            name = "reloop_cursor_" + str(self.cursor_count)
+        self.count_statement()
+        cursor = self.connection.cursor(name=name)
+        cursor.itersize = chunk_size
+        try:
+            start = time.time()
+            if parameters:
+                cursor.execute(query, parameters)
+            else:
+                cursor.execute(query)
+            rows = cursor.fetchmany(chunk_size)
+            self.record_time(query, time.time() - start)
+            while rows:
+                yield rows
+                start = time.time()
+                rows = cursor.fetchmany(chunk_size)
+                self.record_time(query, time.time() - start)
+        finally:
+            cursor.close()
+
+
+class SQLiteKb(SQLKb):
+    """
+    A Logical Knowledge Base based on an embedded SQLite database, which is held in memory or stored in a file. It does
+    not need a database server.
+    """
+
+    placeholder = "?"
+
+    def __init__(self, database=":memory:", optimize_queries=False):
+        """
+        Opens a connection to the database.
+
+        :param database: The path of the database file or ":memory:" for a database held in memory
+        :param optimize_queries: Whether queries are rendered in the optimized mode of the :class:`.SQLRenderer`
+        """
+        assert sqlite_available, \
+            "Import Error : It seems like sqlite3 is currently not available in your Python installation. " \
+            "To proceed please install a Python with sqlite3 support"
+
+        self.connection = sqlite3.connect(database)
+        self.cursor = self.connection.cursor()
+        self.optimize_queries = optimize_queries
+
+    def column_names(self, relation_name):
+        self.cursor.execute("PRAGMA table_info(" + relation_name + ")")
+        return [str(row[1]) for row in self.cursor.fetchall()]
+
+    def unique_keys(self, relation_name):
+        """
+        Looks up the unique indexes of a table, which include the primary key, see :func:`SQLKb.unique_keys`.
+        """
+        self.cursor.execute("PRAGMA table_info(" + relation_name + ")")
+        # an INTEGER PRIMARY KEY is the rowid of the table and has no index
+        primary_key = [(row[5], str(row[1])) for row in self.cursor.fetchall() if row[5]]
+        keys = [tuple(column for position, column in sorted(primary_key))] if primary_key else []
+
+        self.cursor.execute("PRAGMA index_list(" + relation_name + ")")
+        indexes = [row[1] for row in self.cursor.fetchall() if row[2]]
+        for index in indexes:
+            self.cursor.execute("PRAGMA index_info(" + index + ")")
+            key = tuple(str(row[2]) for row in self.cursor.fetchall())
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    def load_facts(self, relation_name, facts, arity=None, numeric=False):
+        """
+        Loads many facts of a predicate at once. The table of the predicate is created if it does not exist and indexed
+        on the arguments of the predicate, which are the columns the grounding queries join on. The columns have
+        NUMERIC affinity, such that numbers given as strings, e.g. read from a csv file, are stored as numbers.
+
+        For Example : "cost", numpy.array([[1, 2, 50], [1, 3, 100]]), numeric=True
+
+        :param relation_name: The name of the predicate
+        :param facts: An iterable of fact tuples or a two-dimensional numpy array
+        :param arity: The number of arguments of the predicate. Defaults to the length of the first fact, minus one for
+                      numeric predicates. Has to be given if facts is an iterator.
+        :param numeric: True if the last entry of every fact is the value of a numeric predicate
+        """
+        if hasattr(facts, "tolist"):
+            # numpy arrays, whose entries are not understood by the sqlite3 module
+            facts = facts.tolist()
+        if arity is None:
+            facts = list(facts)
+            if not facts:
+                return
+            arity = len(facts[0]) - 1 if numeric else len(facts[0])
+
+        columns = ["x" + str(index) for index in range(arity)] + (["v"] if numeric else [])
+        if not self.column_names(relation_name):
+            self.cursor.execute("CREATE TABLE " + relation_name + " (" +
+                                ", ".join([column + " NUMERIC" for column in columns]) + ")")
+            if arity:
+                self.create_indexes(relation_name, arity)
+
+        self.cursor.executemany("INSERT INTO " + relation_name + " VALUES (" +
+                                ", ".join([self.placeholder] * len(columns)) + ")", facts)
+        self.connection.commit()
+
+    def load_csv(self, relation_name, path, numeric=False, delimiter=","):
+        """
+        Loads the facts of a predicate from a csv file with one fact per line, see :func:`load_facts`.
+
+        :param relation_name: The name of the predicate
+        :param path: The path of the csv file
+        :param numeric: True if the last column holds the value of a numeric predicate
+        :param delimiter: The delimiter of the columns
+        """
+        with open(path, "rb") as csv_file:
+            reader = csv.reader(csv_file, delimiter=delimiter)
+            first = next(reader, None)
+            if first is None:
+                return
+            self.load_facts(relation_name, itertools.chain([first], reader),
+                            len(first) - 1 if numeric else len(first), numeric)
+
+    def create_indexes(self, relation_name, arity):
+        """
+        Indexes the arguments of a predicate, once all together for lookups of ground predicates and once each for
+        joins over single arguments. The first argument is covered by the index over all of them.
+
+        :param relation_name: The name of the predicate
+        :param arity: The number of arguments of the predicate
+        """
+        columns = self.column_names(relation_name)[:arity]
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS " + relation_name + "_args ON " + relation_name +
+                            " (" + ", ".join(columns) + ")")
+        for column in columns[1:]:
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS " + relation_name + "_" + column + " ON " + relation_name +
+                                " (" + column + ")")
+
+
+class NumpyKb(LogKb):
+    """
+    An in-memory Logical Knowledge Base, which holds the facts of every predicate as a two-dimensional numpy array of
+    integer constant ids, one column per argument. Numeric predicates hold their value in the last column. Queries
+    are answered by the vectorized joins and filters of :mod:`.columnar`, which understand the same queries as the SQL
+    knowledge bases, i.e. conjunctions and disjunctions of predicates, negated predicates and relations.
+
+    Predicates derived by rules, see :func:`add_rule`, are materialized into relations as well and maintained when
+    facts are loaded or retracted, see :class:`.Materialization`. Queries thus never evaluate rules.
+    """
+
+    def __init__(self):
+        self.constants = ConstantDictionary(self.type_converter)
+        self.relations = {}
+        self.numbers = np.zeros(0)
+        self.digest = hashlib.sha1()
+        self.materialization = Materialization(self.constant_id, self.constants.intern)
+        # the facts of derived predicates, which are not derived by rules
+        self.facts = {}
+
+    def load_facts(self, relation_name, facts, arity=None):
+        """
+        Adds facts to a relation, duplicate facts are dropped.
+
+        For Example : "cost", numpy.array([[1, 2, 50], [1, 3, 100]])
+
+        :param relation_name: The name of the predicate
+        :param facts: An iterable of fact tuples or a two-dimensional numpy array. The facts of numeric predicates hold
+                      their value last.
+        :param arity: The number of columns of the relation, which is only needed to create a relation without facts
+        """
+        columns = facts.T if isinstance(facts, np.ndarray) else zip(*facts)
+        if len(columns) == 0 or len(columns[0]) == 0:
+            rows = np.zeros((0, arity if arity is not None else len(columns)), dtype=np.int64)
+        else:
+            constant_count = len(self.constants)
+            rows = np.column_stack([self.intern_column(column) for column in columns])
+            self.digest.update(relation_name + repr(self.constants.constants[constant_count:]) + rows.tostring())
+
+        previous = dict(self.relations)
+        store = self.facts if relation_name in self.materialization.heads else self.relations
+        existing = store.get(relation_name)
+        if existing is not None and len(existing):
+            rows = difference(unique_rows(rows), existing)
+            store[relation_name] = np.vstack((existing, rows))
+        else:
+            store[relation_name] = unique_rows(rows)
+
+        if self.materialization.rules and len(rows):
+            self.materialization.update(previous, self.relations, self.facts, {relation_name: rows}, {},
+                                        self.numeric_values())
+
+    def retract_facts(self, relation_name, facts):
+        """
+        Removes facts from a relation. Facts which are not in the relation are ignored.
+
+        :param relation_name: The name of the predicate
+        :param facts: An iterable of fact tuples or a two-dimensional numpy array, see :func:`load_facts`
+        """
+        if hasattr(facts, "tolist"):
+            facts = facts.tolist()
+        ids = [[self.constant_id(value) for value in fact] for fact in facts]
+        rows = np.array([fact for fact in ids if None not in fact], dtype=np.int64)
+
+        previous = dict(self.relations)
+        store = self.facts if relation_name in self.materialization.heads else self.relations
+        existing = store.get(relation_name)
+        if existing is None or not len(rows) or rows.shape[1] != existing.shape[1]:
+            return
+        rows = intersection(unique_rows(rows), existing)
+        store[relation_name] = difference(existing, rows)
+        self.digest.update("retract " + relation_name + rows.tostring())
+
+        if self.materialization.rules and len(rows):
+            self.materialization.update(previous, self.relations, self.facts, {}, {relation_name: rows},
+                                        self.numeric_values())
+
+    def add_rule(self, head, body):
+        """
+        Adds a datalog rule, i.e. a function free rule whose body may hold negated predicates and relations, and
+        derives the relations of all derived predicates again. The facts already loaded for the head stay.
+
+        For Example : reachable(X, Z), reachable(X, Y) & edge(Y, Z)
+
+        :param head: The derived predicate, see :func:`.Materialization.add_rule`
+        :param body: The logical query deriving the head
+        """
+        derived = head.name in self.materialization.heads
+        self.materialization.add_rule(head, body)
+        if not derived:
+            self.facts[head.name] = self.relations.get(head.name, np.zeros((0, len(head.args)), dtype=np.int64))
+        self.digest.update("rule " + str(head) + " <= " + str(body))
+        self.materialization.materialize(self.relations, self.facts, self.numeric_values())
+
+    def intern_column(self, column):
+        """
+        :param column: The values of a column of facts
+        :return: A numpy array of the constant ids of the values
+        """
+        values = np.asarray(column)
+        if values.dtype.kind == "O":
+            values = np.array([normalized_constant(value) for value in values.tolist()], dtype=object)
+        unique, inverse = np.unique(values, return_inverse=True)
+        ids = np.array([self.constants.intern(normalized_constant(value)) for value in unique.tolist()],
+                       dtype=np.int64)
+        return ids[inverse]
+
+    def constant_id(self, constant):
+        """
+        :param constant: A constant of a query
+        :return: The id of the constant or None if no fact holds the constant
+        """
+        return self.constants.ids.get(normalized_constant(constant))
+
+    def numeric_values(self):
+        """
+        :return: A numpy array holding the numeric value of every constant id, nan for constants that are no numbers
+        """
+        if len(self.numbers) < len(self.constants):
+            added = [numeric_value(constant) for constant in self.constants.constants[len(self.numbers):]]
+            self.numbers = np.concatenate((self.numbers, np.array(added, dtype=float)))
+        return self.numbers
+
+    def fingerprint(self):
+        """
+        Hashes the facts in the order they were loaded.
+
+        :return: A str of hexadecimal digits
+        """
+        return self.digest.hexdigest()
+
+    def ask(self, query_symbols, logical_query, coeff_expr=None):
+        """
+        Answers the query with joins of the relations of its predicates, see :func:`.columnar.evaluate`.
+
+        :param query_symbols: The symbols to be queried.
+        :type query_symbols: list(SubSymbol)
+        :param logical_query: The logical query
+        :param coeff_expr: The coefficient expression evaluated for every answer or None
+        :return: A list of tuples of sympy objects
+        """
+        table = self.answer_table(query_symbols, logical_query, coeff_expr)
+        if table is None:
             return None
+        value = self.constants.value
+        rows = [[value(index) for index in column.tolist()] for column in table.columns]
+        if table.values is not None:
+            rows.append([self.type_converter(coefficient) for coefficient in table.values.tolist()])
+        return zip(*rows)
+
+    def ask_raw(self, query_symbols, logical_query, coeff_expr=None):
+        """
+        Answers the query like :func:`ask`, but holds the constants as they were loaded, see :func:`LogKb.ask_raw`.
+        """
+        table = self.answer_table(query_symbols, logical_query, coeff_expr)
+        if table is None:
+            return None
+        constants = self.constants.constants
+        rows = [[constants[index] for index in column.tolist()] for column in table.columns]
+        if table.values is not None:
+            rows.append(table.values.tolist())
+        return zip(*rows)
+
+    def ask_table(self, query_symbols, logical_query, coeff_expr=None):
+        """
+        Answers the query like :func:`ask`, the ids of the constants of the answers are the ids of the knowledge base.
+        See :func:`LogKb.ask_table`.
+        """
+        return self.answer_table(query_symbols, logical_query, coeff_expr) or \
+            AnswerTable([], None if coeff_expr is None else np.zeros(0), self.constants)
+
+    def answer_table(self, query_symbols, logical_query, coeff_expr=None):
+        if not query_symbols and coeff_expr is None:
+            return None
+        columns, values = evaluate(tuple(query_symbols), logical_query, coeff_expr, self.relations, self.constant_id,
+                                   self.numeric_values())
+        return AnswerTable(columns, values, self.constants)
+
+    def ask_predicate(self, predicate):
+        """
+        Looks up the value of a ground numeric predicate.
+
+        :param predicate: The predicate to be queried for
+        :return: A list of tuples holding the values or None if there is no relation of the predicate
+        """
+        answers = self.ask_predicates(predicate.__class__, [predicate.args])
+        if predicate.name not in self.relations:
+            return None
+        return answers.get(predicate.args, [])
+
+    def ask_predicates(self, predicate_class, args_list):
+        """
+        Looks up the values of all given argument tuples with a single join.
+
+        :param predicate_class: see :func:`~logkb.LogKB.ask_predicates`
+        :param args_list: see :func:`~logkb.LogKB.ask_predicates`
+        :return: see :func:`~logkb.LogKB.ask_predicates`
+        """
+        rows = self.relations.get(predicate_class.name)
+        if rows is None or not args_list or rows.shape[1] != len(args_list[0]) + 1:
+            return {}
+
+        ids = [[self.constant_id(arg) for arg in args] for args in args_list]
+        known = [index for index, args in enumerate(ids) if None not in args]
+        if not known:
+            return {}
+        keys = np.array([ids[index] for index in known], dtype=np.int64).reshape(len(known), -1)
+        if keys.shape[1] == 0:
+            left = np.repeat(np.arange(len(known)), len(rows))
+            right = np.tile(np.arange(len(rows)), len(known))
+        else:
+            left, right = join_indices(*combined_keys(list(keys.T), list(rows[:, :-1].T)))
+
+        answers = {}
+        for index, row in zip(left.tolist(), right.tolist()):
+            answers.setdefault(args_list[known[index]], []).append((self.constants.constants[rows[row, -1]],))
+        return dict((args, self.transform_answer(values)) for args, values in answers.items())
 
 
 class PrologKB(LogKb):
-    def __init__(self, prolog):
+    """
+    A Logical Knowledge Base based on a SWI-Prolog object. Every query is compiled into a single findall/3 goal, which
+    collects all solutions in one call instead of one result dict per solution.
+    """
+
+    def __init__(self, prolog, cache_tables=False, plan_queries=True):
+        """
+        :param prolog: The SWI-Prolog object holding the facts and rules
+        :param cache_tables: If True, the first lookup of a numeric predicate fetches all its facts, later lookups are
+                             answered from this table. The tables are not updated when the facts change, clear
+                             :attr:`tables` after asserting or retracting facts.
+        :param plan_queries: If True, the conjuncts of every query are ordered by a :class:`.QueryPlanner`. The
+                             statistics of a predicate are collected on first use and not updated either, clear
+                             :attr:`predicate_statistics` after changing facts substantially.
+        """
 
         assert prolog_available, \
             "Pyswip is not available on your machine or an error has occured while trying to import " \
@@ -294,6 +1550,59 @@ class PrologKB(LogKb):
         assert isinstance(prolog, Prolog)
 
         self.prolog = prolog
+        self.cache_tables = cache_tables
+        self.tables = {}
+        self.planner = QueryPlanner(self.statistics) if plan_queries else None
+        self.predicate_statistics = {}
+
+    def findall(self, template, goal):
+        """
+        Collects the solutions of a goal with a single findall/3 call.
+
+        For Example : ["X", "V"], "edge(a,X), cost(a,X,V)"
+        returns [('b', 50), ('c', 100)]
+
+        :param template: The variables whose bindings are collected
+        :type template: list(str)
+        :param goal: The goal in Prolog syntax
+        :type goal: str
+        :return: A list of tuples holding the bindings of the template
+        """
+        query = "findall([" + ",".join(template) + "], (" + goal + "), ReloopSolutions)"
+        for result in self.prolog.query(query):
+            return [tuple(solution) for solution in result["ReloopSolutions"]]
+        return []
+
+    def predicate_table(self, name, arity):
+        """
+        :param name: The name of a numeric predicate
+        :param arity: The arity of the numeric predicate, i.e. without the value
+        :return: The table of the predicate, a dict mapping the keys of the arguments (see :func:`argument_key`) to the
+                 list of their value tuples
+        """
+        table = self.tables.get((name, arity))
+        if table is None:
+            variables = ["ReloopArg" + str(index) for index in range(arity)] + ["ReloopValue"]
+            table = {}
+            for row in self.findall(variables, name + "(" + ",".join(variables) + ")"):
+                table.setdefault(tuple(argument_key(arg) for arg in row[:-1]), []).append((row[-1],))
+            self.tables[(name, arity)] = table
+        return table
+
+    def statistics(self, predicate_name, arity):
+        """
+        Counts the solutions of a predicate with a single findall/3 goal, see :func:`LogKb.statistics`.
+
+        :param predicate_name: see :func:`LogKb.statistics`
+        :param arity: see :func:`LogKb.statistics`
+        :return: see :func:`LogKb.statistics`
+        """
+        if (predicate_name, arity) not in self.predicate_statistics:
+            variables = ["ReloopArg" + str(index) for index in range(arity)]
+            goal = "current_predicate(" + predicate_name + "/" + str(arity) + "), " + \
+                   predicate_name + "(" + ",".join(variables) + ")"
+            self.predicate_statistics[(predicate_name, arity)] = fact_statistics(self.findall(variables, goal), arity)
+        return self.predicate_statistics[(predicate_name, arity)]
 
     def ask_predicate(self, predicate):
         """
@@ -302,17 +1611,42 @@ class PrologKB(LogKb):
         :param predicate: The predicate to be queried for
         :return: A list of tuples resulting from the query
         """
-        result = list(self.prolog.query(predicate.name + \
-                                        "(" + \
-                                        ",".join([str(arg) for index, arg in enumerate(predicate.args)]) + \
-                                        ",X)"))
+        if self.cache_tables:
+            table = self.predicate_table(predicate.name, len(predicate.args))
+            return self.transform_answer(table.get(tuple(argument_key(arg) for arg in predicate.args), []))
 
-        answer = []
-        for dictionary in result:
-            for key, value in dictionary.items():
-                answer.append((value,))
+        answer = self.findall(["ReloopValue"], predicate.name + "(" +
+                              ",".join([str(arg) for arg in predicate.args] + ["ReloopValue"]) + ")")
         return self.transform_answer(answer)
 
+    def ask_predicates(self, predicate_class, args_list):
+        """
+        Queries the values of all given argument tuples with a single findall/3 goal, which binds the arguments to the
+        members of a list of all argument tuples.
+
+        :param predicate_class: see :func:`~logkb.LogKB.ask_predicates`
+        :param args_list: see :func:`~logkb.LogKB.ask_predicates`
+        :return: see :func:`~logkb.LogKB.ask_predicates`
+        """
+        if not args_list:
+            return {}
+
+        arity = len(args_list[0])
+        if self.cache_tables:
+            table = self.predicate_table(predicate_class.name, arity)
+            answers = {}
+            for args in args_list:
+                values = table.get(tuple(argument_key(arg) for arg in args))
+                if values:
+                    answers[args] = self.transform_answer(values)
+            return answers
+
+        variables = ["ReloopArg" + str(index) for index in range(arity)] + ["ReloopValue"]
+        members = "[" + ",".join(["[" + ",".join([str(arg) for arg in args]) + "]" for args in args_list]) + "]"
+        goal = "member([" + ",".join(variables[:-1]) + "], " + members + "), " + \
+               predicate_class.name + "(" + ",".join(variables) + ")"
+        return select_answers(args_list, self.findall(variables, goal), self.transform_answer)
+
     def ask(self, query_symbols, logical_query):
         """
         Builds a Prolog program from the logical_query and queries for it. Then executes the query for the query_symbols.
@@ -323,20 +1657,33 @@ class PrologKB(LogKb):
         :type logical_query:
         :return: [(a,b),(a,c)]
         """
-        query = ProbLogKB.transform_query(logical_query)
-        prolog_answer = list(self.prolog.query(query))
-        answers = []
-        for dictionary in prolog_answer:
-            assert isinstance(dictionary, dict)
-            res = []
-            for query_symbol in query_symbols:
-                res.append(dictionary.get(str(query_symbol)))
-            answers.append(tuple(res))
-        return self.transform_answer(answers)
+        return self.transform_answer(self.ask_raw(query_symbols, logical_query))
+
+    def ask_raw(self, query_symbols, logical_query, coeff_expr=None):
+        """
+        Queries the SWI-Prolog object, see :func:`ask` and :func:`LogKb.ask_raw`. Coefficient expressions are not
+        supported.
+        """
+        if coeff_expr is not None:
+            raise NotImplementedError("The PrologKB does not evaluate coefficient expressions")
+
+        if self.planner is not None:
+            logical_query = self.planner.plan(logical_query)
+        return self.findall([str(query_symbol) for query_symbol in query_symbols],
+                            ProbLogKB.transform_query(logical_query))
 
 
 class ProbLogKB(LogKb):
-    def __init__(self, file_path):
+    """
+    A Logical Knowledge Base based on a ProbLog program. The program is parsed and prepared once by the ProbLog
+    engine, every query is evaluated against the prepared database.
+    """
+
+    def __init__(self, file_path, plan_queries=True):
+        """
+        :param file_path: The path of the ProbLog program
+        :param plan_queries: If True, the conjuncts of every query are ordered by a :class:`.QueryPlanner`
+        """
         assert problog_available, \
             "Import Error : It seems like Problog is currently not installed " \
             "or available on your machine. " \
@@ -345,25 +1692,55 @@ class ProbLogKB(LogKb):
         self.knowledge = file.read()
         file.close()
 
-    def execute(self, query):
+        self.engine = DefaultEngine()
+        self.database = self.engine.prepare(PrologString(self.knowledge))
+        self.planner = QueryPlanner(self.statistics) if plan_queries else None
+        self.predicate_statistics = {}
+
+    def fingerprint(self):
         """
-        Executes a given query by directly calling the execute methode of the problog probability task
+        Hashes the program the knowledge base was loaded from.
 
-        :param query: A Prolog query to be evaluated by the prolog interface
-        :type query: str
-        :return: A dictionary of answers for the given query returned by problog
+        :return: A str of hexadecimal digits
         """
-        problog_prog = self.knowledge + "\n".join(query)
-        import StringIO
-        import sys
+        return hashlib.sha1(self.knowledge).hexdigest()
 
-        s = StringIO.StringIO(problog_prog)
-        sys.stdin = s
+    def execute(self, queries, rules=()):
+        """
+        Evaluates a batch of queries against the prepared database of the program.
 
-        result = problog_task.execute(filename="-")[1]
-        sys.stdin = sys.__stdin__
+        :param queries: The ProbLog queries, e.g. "cost(a,b,X)"
+        :type queries: list(str)
+        :param rules: Additional ProbLog clauses, e.g. helper rules, which are only visible to these queries
+        :type rules: list(str)
+        :return: A list holding the answers of every query, each a list of tuples of the arguments of the answer
+        """
+        database = self.database
+        if rules:
+            # a layer on top of the prepared database, which leaves the database itself untouched
+            database = self.database.extend()
+            for clause in PrologString("\n".join(rules)):
+                database += clause
 
-        return result
+        return [[tuple(answer) for answer in self.engine.query(database, query)]
+                for query in PrologString("\n".join([query + "." for query in queries]))]
+
+    def statistics(self, predicate_name, arity):
+        """
+        Counts the answers of a predicate in the prepared database, see :func:`LogKb.statistics`. The program does not
+        change, hence the statistics are collected only once.
+
+        :param predicate_name: see :func:`LogKb.statistics`
+        :param arity: see :func:`LogKb.statistics`
+        :return: see :func:`LogKb.statistics`
+        """
+        if (predicate_name, arity) not in self.predicate_statistics:
+            statistics = None
+            if self.database.find(Term(predicate_name, *[None] * arity)) is not None:
+                answers = self.engine.query(self.database, Term(predicate_name, *[None] * arity))
+                statistics = fact_statistics(answers, arity)
+            self.predicate_statistics[(predicate_name, arity)] = statistics
+        return self.predicate_statistics[(predicate_name, arity)]
 
     def ask(self, query_symbols, logical_query, coeff_expr=None):
         """
@@ -374,33 +1751,31 @@ class ProbLogKB(LogKb):
         :param coeff_expr: The coefficient expression for the given query
         :return: A list of tuples containg the answers for the query symbols
         """
+        return self.transform_answer(self.ask_raw(query_symbols, logical_query, coeff_expr))
+
+    def ask_raw(self, query_symbols, logical_query, coeff_expr=None):
+        """
+        Evaluates the helper rule of the query, see :func:`ask` and :func:`LogKb.ask_raw`. The answers hold problog
+        Terms.
+        """
+        if self.planner is not None:
+            logical_query = self.planner.plan(logical_query)
+
         if coeff_expr is None:
             lhs_rule = 'helper(' + ','.join([str(v) for v in query_symbols]) + ')'
             rule = lhs_rule + ":-" + self.transform_query(logical_query) + "."
-            query = "query(" + lhs_rule + ")."
         else:
             syms = OrderedSet(query_symbols)
             syms.add('COEFF_EXPR')
             lhs_rule = 'helper(' + ','.join([str(v) for v in syms]) + ')'
             index_query = self.transform_query(logical_query)
             coeff_query = "COEFF_EXPR = " + str(coeff_expr) + ""
-            query = "query(" + lhs_rule + ")."
             if index_query is None:
                 rule = lhs_rule + " :- " + coeff_query + "."
             else:
                 rule = lhs_rule + " :- " + " , ".join([index_query, coeff_query]) + "."
 
-        answer = self.execute([rule, query])
-
-        answer_args = []
-        for key in answer.keys():
-            answer_args.append(key.args)
-
-        # Query yields no result
-        if answer.values()[0] == 0.0:
-            return []
-
-        return self.transform_answer(answer_args)
+        return self.execute([lhs_rule], [rule])[0]
 
     def ask_predicate(self, predicate):
         """
@@ -409,21 +1784,30 @@ class ProbLogKB(LogKb):
         :param predicate: The predicate to be queried for
         :return: A list of tuples containing the answers for the query
         """
-        answer = self.execute(["query(" + predicate.name + \
-                               "(" + \
-                               ",".join([str(arg) for index, arg in enumerate(predicate.args)]) + \
-                               ",X))."])
-
-        answer_args = []
-        for key in answer.keys():
-            answer_args.append(key.args)
+        answer = self.execute([predicate.name + "(" + ",".join([str(arg) for arg in predicate.args]) + ",X)"])[0]
 
         # Query yields no result
-        if answer.values()[0] == 0.0:
+        if not answer:
             return []
 
-        result = [(answer_args[0][-1].functor,)]
-        return self.transform_answer(result)
+        return self.transform_answer([(answer[0][-1],)])
+
+    def ask_predicates(self, predicate_class, args_list):
+        """
+        Queries the values of all given argument tuples in a single batch of queries.
+
+        :param predicate_class: see :func:`~logkb.LogKB.ask_predicates`
+        :param args_list: see :func:`~logkb.LogKB.ask_predicates`
+        :return: see :func:`~logkb.LogKB.ask_predicates`
+        """
+        if not args_list:
+            return {}
+
+        answers = self.execute([predicate_class.name + "(" + ",".join([str(arg) for arg in args]) + ",X)"
+                                for args in args_list])
+
+        rows = [row for answer in answers for row in answer]
+        return select_answers(args_list, rows, self.transform_answer)
 
     @classmethod
     def type_converter(self, item):
@@ -441,10 +1825,22 @@ class ProbLogKB(LogKb):
         Recursively builds the logical_query string from the given logical logical_query,by evaluating
 
         :param logical_query: Type changes depending on the recursive depth and the depth of the expression. \
-        The logical query, needed for the pyDataLog program string.
-        :type logical_query: Boolean, BooleanPredicate
+        The logical query, needed for the pyDataLog program string. A list is rendered as the conjunction of its
+        elements in the given order, see :func:`.QueryPlanner.plan`.
+        :type logical_query: Boolean, BooleanPredicate, list
         :return: The complete Body for loading the program into pyDataLog.
         """
+        if isinstance(logical_query, list):
+            return ", ".join([ProbLogKB.transform_query(arg) for arg in logical_query])
+        if isinstance(logical_query, Rel):
+            # atoms are compared by identity, everything else arithmetically
+            lhs, rhs = logical_query.args
+            if logical_query.rel_op in ("==", "!=") and lhs.is_Atom and rhs.is_Atom and not \
+                    (lhs.is_Number or rhs.is_Number):
+                operator = "==" if logical_query.rel_op == "==" else "\\=="
+            else:
+                operator = PROLOG_COMPARISONS[logical_query.rel_op]
+            return " " + str(lhs) + " " + operator + " " + str(rhs)
         if logical_query.func is And:
             return ", ".join([ProbLogKB.transform_query(arg) for arg in logical_query.args])
         if logical_query.func is Not:
@@ -453,3 +1849,201 @@ class ProbLogKB(LogKb):
             join = ",".join([str(arg) if isinstance(arg, SubSymbol) else str(arg) for arg in logical_query.args])
             return " " + logical_query.name + "(" + join + ")"
         raise NotImplementedError
+
+
+def fact_statistics(rows, arity):
+    """
+    :param rows: An iterable of the argument tuples of the facts of a predicate
+    :param arity: The arity of the predicate
+    :return: The :class:`.PredicateStatistics` of the facts
+    """
+    columns = [set() for index in range(arity)]
+    cardinality = 0
+    for row in rows:
+        cardinality += 1
+        for column, arg in zip(columns, row):
+            column.add(arg)
+    return PredicateStatistics(cardinality, [len(column) for column in columns])
+
+
+def numbered_placeholders(query, placeholder):
+    """
+    Replaces the placeholders of a query by the numbered placeholders $1, $2, ... of a PostgreSQL prepared statement.
+
+    :param query: The query
+    :param placeholder: The placeholder of the query
+    :return: The query with numbered placeholders
+    """
+    parts = query.split(placeholder)
+    return parts[0] + "".join(["$" + str(index + 1) + part for index, part in enumerate(parts[1:])])
+
+
+def view_read(view, query):
+    """
+    Renders the read of a materialized query, which selects the rows of its view while the view is fresh and evaluates
+    the query itself while the view is stale. The flag is read in the same statement and snapshot as the rows, hence
+    a change committed by any connection is seen without a further round trip, and the database skips the branch,
+    which is not taken.
+
+    :param view: The name of the view
+    :param query: The materialized query
+    :return: The query reading the view
+    """
+    stale = "COALESCE((SELECT stale FROM reloop_queries WHERE view = '" + view + "'), TRUE)"
+    return "SELECT * FROM " + view + " WHERE NOT " + stale + " UNION ALL SELECT * FROM (" + query + ") AS q WHERE " + \
+           stale
+
+
+def select_answers(args_list, rows, transform_answer):
+    """
+    Picks the values of the given argument tuples from the rows of a bulk query.
+
+    :param args_list: The argument tuples asked for
+    :param rows: The rows of the bulk query, which hold the arguments followed by the value
+    :param transform_answer: The function transforming the values for sympy, see :func:`LogKb.transform_answer`
+    :return: see :func:`LogKb.ask_predicates`
+    """
+    keys = dict((tuple(argument_key(arg) for arg in args), args) for args in args_list)
+
+    answers = {}
+    for row in rows:
+        args = keys.get(tuple(argument_key(arg) for arg in row[:-1]))
+        if args is not None:
+            answers.setdefault(args, []).append((row[-1],))
+
+    return dict((args, transform_answer(values)) for args, values in answers.items())
+
+
+def bound_rows(logical_query, bindings):
+    """
+    Reduces bindings to the symbols occurring in a query, see :func:`LogKb.ask_bound`.
+
+    :param logical_query: The logical query
+    :param bindings: A list of dicts mapping symbols to constants
+    :return: A tuple of the list of the bound symbols of the query, the OrderedSet of the distinct tuples of their
+             values and the list of the position of the values of every binding in this set
+    """
+    query_symbols = logical_query.atoms(SubSymbol) if isinstance(logical_query, Basic) else set()
+    symbols = sorted(set(symbol for binding in bindings for symbol in binding).intersection(query_symbols), key=str)
+    rows = OrderedSet()
+    indices = [rows.add(tuple(binding[symbol] for symbol in symbols)) for binding in bindings]
+    return symbols, rows, indices
+
+
+def lookup_columns(logical_query, column_names):
+    """
+    Collects the columns a query looks rows up by, i.e. the arguments of its predicates, which are constants or symbols
+    occurring in another conjunct of their clause.
+
+    :param logical_query: The logical query
+    :param column_names: A function mapping a table name to the list of its column names
+    :return: A set of tuples (table, columns)
+    """
+    lookups = set()
+    for clause in (logical_query.args if isinstance(logical_query, Or) else (logical_query,)):
+        conjuncts = clause.args if isinstance(clause, And) else (clause,)
+        for index, conjunct in enumerate(conjuncts):
+            predicate = conjunct.args[0] if isinstance(conjunct, Not) else conjunct
+            if not isinstance(predicate, BooleanPredicate):
+                continue
+
+            others = set(symbol for other in conjuncts[:index] + conjuncts[index + 1:]
+                         for symbol in other.atoms(SubSymbol))
+            columns = column_names(predicate.name)
+            looked_up = tuple(columns[position] for position, arg in enumerate(predicate.args[:len(columns)])
+                              if not isinstance(arg, SubSymbol) or arg in others)
+            if looked_up:
+                lookups.add((predicate.name.lower(), looked_up))
+    return lookups
+
+
+def copy_text(value):
+    """
+    :param value: A constant passed as parameter of a query, see :func:`.constant_parameter`
+    :return: The constant as field of the text format of the COPY statement of PostgreSQL
+    """
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def normalized_constant(constant):
+    """
+    :param constant: A constant of a fact or of a query, e.g. a str, an int or a sympy object
+    :return: The constant as str, int or float, such that equal constants are equal independent of their
+             representation
+    """
+    if isinstance(constant, np.generic):
+        constant = constant.item()
+    if isinstance(constant, Basic):
+        if constant.is_Integer:
+            return int(constant)
+        if constant.is_Number:
+            return float(constant)
+        return str(constant)
+    return constant
+
+
+def numeric_value(constant):
+    """
+    :param constant: A constant
+    :return: The constant as float or nan if it is no number
+    """
+    if isinstance(constant, (int, long, float)) or (isinstance(constant, Basic) and constant.is_Number):
+        return float(constant)
+    return float('nan')
+
+
+def predicate_signature(pred_id):
+    """
+    Computes a signature of the clauses of a pyDatalog predicate and of all predicates its rules depend on, which
+    changes whenever one of their facts or rules changes.
+
+    :param pred_id: The id of the predicate, i.e. its name and arity, e.g. "edge/2"
+    :return: A tuple, which is equal for unchanged clauses
+    """
+    database = pyEngine.Logic.tl.logic.Db
+    signature = []
+    visited = set()
+    pending = [pred_id]
+    while pending:
+        pred_id = pending.pop()
+        if pred_id in visited:
+            continue
+        visited.add(pred_id)
+
+        predicate = database.get(pred_id)
+        if predicate is None:
+            continue
+        # the clauses are held in an OrderedDict, whose keys are collected faster by the underlying dict
+        signature.append((pred_id, len(predicate.db), hash(frozenset(dict.keys(predicate.db)))))
+        for clause in predicate.clauses.values():
+            for literal in clause.body:
+                pending.append(literal.pred.id)
+                if getattr(literal.pred, "base_pred", None) is not None:
+                    pending.append(literal.pred.base_pred.id)
+
+    return tuple(sorted(signature))
+
+
+def coefficient_value(value):
+    """
+    :param value: A coefficient as returned by a knowledge base, e.g. a number, a sympy Number or a problog Term
+    :return: The coefficient as float, nan if it is missing
+    """
+    if value is None:
+        return np.nan
+    if problog_available and isinstance(value, Term):
+        value = value.functor if len(value.args) == 0 else value.value
+    return float(value)
+
+
+def argument_key(arg):
+    """
+    :param arg: An argument of a predicate as given by sympy or by a knowledge base
+    :return: A value which is equal for equal constants, independent of their representation
+    """
+    if problog_available and isinstance(arg, Term):
+        arg = arg.functor if len(arg.args) == 0 else arg.value
+    try:
+        return float(arg)
+    except (TypeError, ValueError):
+        return str(arg)
@@ -0,0 +1,295 @@
+from collections import namedtuple
+from rlp import *
+from columnar import Clause, distinct, combined_keys
+from sympy.logic.boolalg import *
+from sympy.core import *
+import numpy as np
+
+# A rule deriving the head, a predicate, from the body, a conjunction of predicates, negated predicates and relations.
+# symbols holds the distinct symbols of the head.
+Rule = namedtuple('Rule', 'head body symbols')
+
+
+class Materialization(object):
+    """
+    Maintains the relations of predicates derived by datalog rules, i.e. function free rules with stratified negation
+    and relations, on top of relations stored as integer-encoded column arrays, see :mod:`.columnar`.
+
+    The rules are split into strata, such that negated predicates are derived completely by lower strata. Every stratum
+    is derived by semi-naive evaluation: Each step only joins the facts derived by the previous step with the other
+    relations. When facts change, the derived relations are maintained incrementally: Insertions are propagated the
+    same way, deletions by delete and rederive (DRed), which first deletes every fact derived from a deleted fact and
+    then derives those facts again, which have a remaining derivation. Strata negating a changed predicate are derived
+    again from scratch.
+    """
+
+    def __init__(self, constant_id, intern):
+        """
+        :param constant_id: A function mapping a constant to its id or to None if it does not occur in any fact
+        :param intern: A function mapping a constant to its id, which adds unknown constants
+        """
+        self.constant_id = constant_id
+        self.intern = intern
+        self.rules = []
+        self.strata = []
+        self.heads = {}
+
+    def add_rule(self, head, body):
+        """
+        Adds a rule and stratifies the rules again. The relations are not derived, see :func:`materialize`.
+
+        For Example : reachable(X, Z), reachable(X, Y) & edge(Y, Z)
+
+        :param head: The derived predicate, whose arguments are symbols or constants
+        :param body: The logical query deriving the head. Disjunctions are split into several rules.
+        """
+        if not isinstance(head, BooleanPredicate) or not head.args:
+            raise ValueError("The head " + str(head) + " of a rule has to be a predicate with arguments")
+        if self.heads.get(head.name, len(head.args)) != len(head.args):
+            raise ValueError("The head " + str(head) + " does not match the arity of the rules of " + head.name)
+
+        body = sympify(body)
+        rules = list(self.rules)
+        for clause in (body.args if isinstance(body, Or) else (body,)):
+            symbols = []
+            for arg in head.args:
+                if isinstance(arg, SubSymbol) and arg not in symbols:
+                    symbols.append(arg)
+                elif not isinstance(arg, SubSymbol):
+                    self.intern(arg)
+            positive = Clause(clause, {}, self.constant_id, None).positive
+            unbound = [symbol for symbol in symbols if not any(symbol in predicate.args for predicate in positive)]
+            if unbound:
+                raise ValueError("The symbols " + str(unbound) + " of the head " + str(head) +
+                                 " do not occur in a positive predicate of the body")
+            rules.append(Rule(head, clause, tuple(symbols)))
+
+        self.strata = stratify(rules)
+        self.rules = rules
+        self.heads[head.name] = len(head.args)
+
+    def materialize(self, relations, facts, numbers):
+        """
+        Derives the relations of all derived predicates from scratch.
+
+        :param relations: A dict mapping the names of the relations to two-dimensional numpy arrays of constant ids,
+                          which holds the derived relations afterwards
+        :param facts: A dict mapping the names of derived predicates to their facts, which are not derived by rules
+        :param numbers: A numpy array holding the numeric value of every constant id, see :func:`.columnar.evaluate`
+        """
+        for stratum in self.strata:
+            self.recompute(stratum, relations, facts, numbers)
+
+    def update(self, previous, relations, facts, inserted, deleted, numbers):
+        """
+        Maintains the derived relations after facts were inserted or deleted.
+
+        :param previous: A dict holding the relations before the change, which is left untouched
+        :param relations: The dict of the relations, whose relations of predicates without rules already hold the
+                          change. The derived relations are updated.
+        :param facts: The dict of the facts of derived predicates, see :func:`materialize`, which already hold the
+                      change
+        :param inserted: A dict mapping the names of relations to the rows inserted
+        :param deleted: A dict mapping the names of relations to the rows deleted
+        :param numbers: see :func:`materialize`
+        """
+        # the net changes of the relations of base predicates and of the strata derived so far
+        changed_inserted = dict((name, rows) for name, rows in inserted.items() if name not in self.heads and len(rows))
+        changed_deleted = dict((name, rows) for name, rows in deleted.items() if name not in self.heads and len(rows))
+
+        for stratum in self.strata:
+            heads = set(rule.head.name for rule in stratum)
+            negated = set(predicate.name for rule in stratum
+                          for predicate in Clause(rule.body, {}, self.constant_id, None).negative)
+            if negated.intersection(changed_inserted) or negated.intersection(changed_deleted):
+                self.recompute(stratum, relations, facts, numbers)
+            else:
+                seeds = dict((name, rows) for name, rows in deleted.items() if name in heads)
+                overdeleted = self.overdelete(stratum, previous, changed_deleted, seeds, numbers)
+                for name, rows in overdeleted.items():
+                    relations[name] = difference(relations[name], difference(rows, facts.get(name)))
+
+                derived = dict((name, [rows]) for name, rows in inserted.items() if name in heads)
+                for rule in stratum:
+                    if rule.head.name in overdeleted:
+                        derived.setdefault(rule.head.name, []).append(self.rederive(rule, relations, numbers,
+                                                                                    overdeleted[rule.head.name]))
+                deltas = self.insert(relations, derived)
+                deltas.update(changed_inserted)
+                self.saturate(stratum, relations, numbers, deltas)
+
+            for name in heads:
+                rows = difference(relations[name], previous.get(name))
+                if len(rows):
+                    changed_inserted[name] = rows
+                rows = difference(previous.get(name, relations[name]), relations[name])
+                if len(rows):
+                    changed_deleted[name] = rows
+
+    def recompute(self, stratum, relations, facts, numbers):
+        """
+        Derives the relations of a stratum from scratch, starting from the facts of its predicates.
+        """
+        for rule in stratum:
+            relations[rule.head.name] = facts.get(rule.head.name, np.zeros((0, len(rule.head.args)), dtype=np.int64))
+
+        derived = {}
+        for rule in stratum:
+            clause = Clause(rule.body, relations, self.constant_id, numbers)
+            derived.setdefault(rule.head.name, []).append(self.head_rows(rule, clause))
+        self.saturate(stratum, relations, numbers, self.insert(relations, derived))
+
+    def saturate(self, stratum, relations, numbers, deltas):
+        """
+        Derives the facts of a stratum following from new facts by semi-naive evaluation, i.e. every step evaluates
+        the rules once for every occurrence of a predicate with new facts, reading only the new facts there.
+
+        :param stratum: The list of the rules of the stratum
+        :param relations: The dict of the relations, which already hold the new facts
+        :param numbers: see :func:`materialize`
+        :param deltas: A dict mapping the names of relations to their new facts
+        """
+        while deltas:
+            derived = {}
+            for rule in stratum:
+                clause = Clause(rule.body, relations, self.constant_id, numbers)
+                for position, predicate in enumerate(clause.positive):
+                    rows = deltas.get(predicate.name)
+                    if rows is not None and rows.shape[1] == len(predicate.args):
+                        derived.setdefault(rule.head.name, []).append(self.head_rows(rule, clause, {position: rows}))
+            deltas = self.insert(relations, derived)
+
+    def overdelete(self, stratum, previous, deleted, seeds, numbers):
+        """
+        Collects the facts of a stratum which have a derivation using a deleted fact, evaluating the rules on the
+        relations before the change.
+
+        :param stratum: The list of the rules of the stratum
+        :param previous: The dict of the relations before the change
+        :param deleted: A dict mapping the names of the relations of lower strata to their deleted facts
+        :param seeds: A dict mapping the names of the predicates of the stratum to their deleted facts
+        :param numbers: see :func:`materialize`
+        :return: A dict mapping the names of the predicates of the stratum to their overdeleted facts
+        """
+        overdeleted = {}
+        deltas = dict(deleted)
+        for name, rows in seeds.items():
+            overdeleted[name] = intersection(rows, previous.get(name))
+            deltas[name] = overdeleted[name]
+
+        while deltas:
+            derived = {}
+            for rule in stratum:
+                clause = Clause(rule.body, previous, self.constant_id, numbers)
+                for position, predicate in enumerate(clause.positive):
+                    rows = deltas.get(predicate.name)
+                    if rows is not None and len(rows) and rows.shape[1] == len(predicate.args):
+                        derived.setdefault(rule.head.name, []).append(self.head_rows(rule, clause, {position: rows}))
+
+            deltas = {}
+            for name, parts in derived.items():
+                rows = intersection(unique_rows(np.vstack(parts)), previous.get(name))
+                rows = difference(rows, overdeleted.get(name))
+                if len(rows):
+                    overdeleted[name] = np.vstack((overdeleted[name], rows)) if name in overdeleted else rows
+                    deltas[name] = rows
+        return overdeleted
+
+    def rederive(self, rule, relations, numbers, overdeleted):
+        """
+        :param rule: A rule of the stratum
+        :param relations: The dict of the relations without the overdeleted facts
+        :param numbers: see :func:`materialize`
+        :param overdeleted: The overdeleted facts of the head of the rule
+        :return: The overdeleted facts, which the rule derives from the remaining relations
+        """
+        clause = Clause(And(rule.body, rule.head), relations, self.constant_id, numbers)
+        return self.head_rows(rule, clause, {clause.positive.index(rule.head): overdeleted})
+
+    def insert(self, relations, derived):
+        """
+        :param relations: The dict of the relations, to which the new facts are added
+        :param derived: A dict mapping the names of relations to lists of derived rows
+        :return: A dict mapping the names of relations to the derived rows, which are new
+        """
+        deltas = {}
+        for name, parts in derived.items():
+            rows = difference(unique_rows(np.vstack(parts)), relations.get(name))
+            if len(rows):
+                relations[name] = np.vstack((relations[name], rows)) if name in relations else rows
+                deltas[name] = rows
+        return deltas
+
+    def head_rows(self, rule, clause, overrides=None):
+        """
+        :param rule: The rule
+        :param clause: The :class:`.Clause` of the body of the rule
+        :param overrides: see :func:`.Clause.join`
+        :return: A two-dimensional numpy array of the constant ids of the derived facts of the head
+        """
+        columns = clause.answer(rule.symbols, None, overrides)[0]
+        size = len(columns[0]) if columns else 0
+        return np.column_stack([columns[rule.symbols.index(arg)] if isinstance(arg, SubSymbol)
+                                else np.full(size, self.constant_id(arg), dtype=np.int64) for arg in rule.head.args])
+
+
+def stratify(rules):
+    """
+    Assigns every derived predicate to the lowest stratum above the strata of the predicates it negates and not below
+    the strata of the predicates it uses.
+
+    :param rules: The list of :class:`Rule`
+    :return: A list of the lists of the rules of every stratum
+    """
+    levels = dict((rule.head.name, 0) for rule in rules)
+    changed = True
+    while changed:
+        changed = False
+        for rule in rules:
+            clause = Clause(rule.body, {}, None, None)
+            for predicates, step in ((clause.positive, 0), (clause.negative, 1)):
+                for predicate in predicates:
+                    required = levels.get(predicate.name, -1) + step
+                    if levels[rule.head.name] < required:
+                        if required > len(levels):
+                            raise ValueError("The rules of " + rule.head.name + " are not stratified, i.e. it depends "
+                                             "on its own negation")
+                        levels[rule.head.name] = required
+                        changed = True
+
+    return [[rule for rule in rules if levels[rule.head.name] == level]
+            for level in sorted(set(levels.values()))]
+
+
+def unique_rows(rows):
+    """
+    :param rows: A two-dimensional numpy array
+    :return: The distinct rows in their order of first occurrence
+    """
+    if len(rows) < 2:
+        return rows
+    return np.column_stack(distinct(list(rows.T), None)[0])
+
+
+def difference(rows, other):
+    """
+    :param rows: A two-dimensional numpy array of constant ids
+    :param other: A two-dimensional numpy array of constant ids with as many columns or None
+    :return: The rows which do not occur in other
+    """
+    if other is None or not len(other) or not len(rows):
+        return rows
+    left_keys, right_keys = combined_keys(list(rows.T), list(other.T))
+    return rows[np.in1d(left_keys, right_keys, invert=True)]
+
+
+def intersection(rows, other):
+    """
+    :param rows: A two-dimensional numpy array of constant ids
+    :param other: A two-dimensional numpy array of constant ids with as many columns or None
+    :return: The rows which occur in other
+    """
+    if other is None or not len(other) or not len(rows):
+        return rows[:0]
+    left_keys, right_keys = combined_keys(list(rows.T), list(other.T))
+    return rows[np.in1d(left_keys, right_keys)]
@@ -0,0 +1,103 @@
+from collections import namedtuple
+from rlp import *
+from sympy.logic.boolalg import *
+from sympy.core import *
+
+# The statistics of the facts of a predicate. cardinality holds the number of facts, distinct the number of distinct
+# constants of every argument.
+PredicateStatistics = namedtuple('PredicateStatistics', 'cardinality distinct')
+
+# the number of facts assumed for predicates without statistics, e.g. predicates derived by rules
+DEFAULT_CARDINALITY = 1000
+
+
+class QueryPlanner(object):
+    """
+    Orders the conjuncts of a logical query for knowledge bases, which evaluate a conjunction from left to right. The
+    positive predicates are ordered greedily, such that every step adds the predicate with the fewest expected answers
+    given the symbols bound so far. This avoids cross products before a selective predicate is applied. Negated
+    predicates and relations follow as soon as all their symbols are bound, the ones that never are come last.
+    """
+
+    def __init__(self, statistics):
+        """
+        :param statistics: A function mapping a predicate name and arity to the :class:`PredicateStatistics` of the
+                           predicate or to None if they are unknown, see :func:`.LogKb.statistics`
+        """
+        self.statistics = statistics
+
+    def plan(self, logical_query):
+        """
+        :param logical_query: The logical query
+        :return: The list of the conjuncts of the query in the order of their evaluation or the query itself if it is
+                 no conjunction
+        """
+        if not isinstance(logical_query, And):
+            return logical_query
+
+        positive = [arg for arg in logical_query.args if isinstance(arg, BooleanPredicate)]
+        filters = [arg for arg in logical_query.args if not isinstance(arg, BooleanPredicate)]
+        positive_symbols = set(arg for predicate in positive for arg in predicate.args if isinstance(arg, SubSymbol))
+
+        statistics = dict((predicate, self.statistics(predicate.name, len(predicate.args))) for predicate in positive)
+        known = [entry.cardinality for entry in statistics.values() if entry is not None]
+        default_cardinality = max(known) if known else DEFAULT_CARDINALITY
+
+        bound = set()
+        plan = []
+        filters = self.place_filters(filters, bound, positive_symbols, plan)
+        while positive:
+            predicate = min(positive, key=lambda candidate: expected_answers(candidate, statistics[candidate],
+                                                                              default_cardinality, bound))
+            positive.remove(predicate)
+            plan.append(predicate)
+            bound.update(arg for arg in predicate.args if isinstance(arg, SubSymbol))
+            filters = self.place_filters(filters, bound, positive_symbols, plan)
+
+        return plan + filters
+
+    @staticmethod
+    def place_filters(filters, bound, positive_symbols, plan):
+        """
+        Appends the filters whose symbols are bound to the plan.
+
+        :param filters: The negated predicates and relations not placed yet
+        :param bound: The set of the symbols bound so far
+        :param positive_symbols: The set of the symbols bound by any positive predicate
+        :param plan: The list of the conjuncts placed so far
+        :return: The list of the filters, which are not placed yet
+        """
+        remaining = []
+        for condition in filters:
+            if bound.issuperset(positive_symbols.intersection(condition.atoms(SubSymbol))):
+                plan.append(condition)
+            else:
+                remaining.append(condition)
+        return remaining
+
+
+def expected_answers(predicate, statistics, default_cardinality, bound):
+    """
+    Estimates the number of answers of a predicate for a single binding of the bound symbols, assuming that the
+    constants of every argument are uniformly distributed and independent.
+
+    :param predicate: The predicate
+    :param statistics: The :class:`PredicateStatistics` of the predicate or None
+    :param default_cardinality: The number of facts assumed if there are no statistics
+    :param bound: The set of the symbols bound so far
+    :return: The expected number of answers as float
+    """
+    arity = len(predicate.args)
+    if statistics is None:
+        cardinality = float(default_cardinality)
+        distinct = [cardinality ** (1.0 / arity)] * arity if arity else []
+    else:
+        cardinality = float(statistics.cardinality)
+        distinct = statistics.distinct
+
+    seen = set()
+    for arg, count in zip(predicate.args, distinct):
+        if not isinstance(arg, SubSymbol) or arg in bound or arg in seen:
+            cardinality /= max(count, 1)
+        seen.add(arg)
+    return cardinality
@@ -5,6 +5,7 @@ from sympy.logic.boolalg import *
 from infix import or_infix
 import logging
 from ordered_set import OrderedSet
+import numpy as np
 
 log = logging.getLogger(__name__)
 
@@ -31,6 +32,10 @@ class RlpProblem():
         self._reloop_variables = OrderedSet([])
         self._constraints = []
         self.objective = None
+        self.solution = None
+        self._compiled = None
+        self._compiled_from = None
+        self._objective_vector = None
 
     def add_reloop_variable(self, *predicates):
         """
@@ -41,6 +46,7 @@ class RlpProblem():
         for predicate in predicates:
             self._reloop_variables |= {predicate}
             predicate.is_reloop_variable = True
+        self._compiled = None
 
     @property
     def reloop_variables(self):
@@ -50,6 +56,22 @@ class RlpProblem():
     def constraints(self):
         return self._constraints
 
+    def compile(self):
+        """
+        Passes the model to the grounder to be translated into its intermediate representation. The result is cached
+        until the model changes, hence repeated calls of :func:`solve` skip the symbolic preprocessing. The cache is
+        keyed on the grounder, the objective and the constraints it was compiled from, such that assigning them
+        directly or changing the list of constraints compiles the model again.
+
+        :return: The intermediate representation of the grounder
+        """
+        compiled_from = [self.grounder, self.objective] + list(self._constraints)
+        if self._compiled is None or len(compiled_from) != len(self._compiled_from) or \
+                any(current is not compiled for current, compiled in zip(compiled_from, self._compiled_from)):
+            self._compiled = self.grounder.compile(self)
+            self._compiled_from = compiled_from
+        return self._compiled
+
     def __iadd__(self, rhs):
         """
         Adds the objective or a constraint to the model.
@@ -61,8 +83,10 @@ class RlpProblem():
 
         if is_valid_relation(rhs) | isinstance(rhs, ForAll):
             self._constraints += [rhs]
+            self._compiled = None
         elif isinstance(rhs, Expr):
             self.objective = rhs
+            self._compiled = None
         elif(isinstance(rhs, types.GeneratorType)):
             for item in rhs:
                 self += item
@@ -72,23 +96,43 @@ class RlpProblem():
 
         return self
 
-    def solve(self, **kwargs):
+    def solve(self, warm_start=None, **kwargs):
         """
         Grounds and solves the logical programm.
+
+        :param warm_start: An optional solution of a related problem as returned by :func:`get_solution`, which is
+                           passed to the lp solver as starting point. Lp variables missing in it start at 0.
         """
         lp, varmap = self.grounder.ground(self)
         self.varmap = varmap
+
+        if warm_start is not None:
+            kwargs["start"] = [warm_start.get(reloop_variable(*args), 0.0)
+                               for reloop_variable in self._reloop_variables for args in varmap[reloop_variable]]
+
+        self._objective_vector = lp[0]
         self.solution = self.lpsolver.solve(*lp, **kwargs)
 
     def status(self):
         """
-        Passes the call to self.lpmodel
+        Passes the call to self.lpsolver
 
         :return: The solution status of the LP.
 
         """
-        pass
-        # return self.lpmodel.status()
+        return self.lpsolver.status()
+
+    def get_objective_value(self):
+        """
+        :return: The value of the objective for the solution of the LP or None if there is no solution
+        """
+        if self.solution is None:
+            return None
+
+        # the grounded objective is always minimized, see :func:`.BlockGrounder.ground`
+        value = np.dot(np.asarray(self._objective_vector, dtype=float).ravel(),
+                       np.asarray(self.solution, dtype=float).ravel())
+        return self.sense * float(value)
 
     def get_solution(self):
         """
@@ -169,14 +213,11 @@ class ForAll(Query):
         result = set([])
         if answers is not None:
             lhs = self.relation.lhs - self.relation.rhs
-            for answer in answers:
-                expression_eval_subs = lhs
-                for index, symbol in enumerate(self.query_symbols):
-                    # this ensures that pydatalog strings do not get parsed by sympy
-                    subanswer = answer[index] if not isinstance(answer[index], basestring) \
-                        else Symbol(answer[index])
-                    expression_eval_subs = expression_eval_subs.subs(symbol, subanswer)
-                result |= {self.relation.__class__(expression_eval_subs, 0.0)}
+            query_symbols = tuple(self.query_symbols)
+            # this ensures that pydatalog strings do not get parsed by sympy
+            result = set(self.relation.__class__(lhs.xreplace(dict(
+                (symbol, Symbol(value) if isinstance(value, basestring) else value)
+                for symbol, value in zip(query_symbols, answer))), 0.0) for answer in answers)
 
         self.result = result
         self.grounded = True
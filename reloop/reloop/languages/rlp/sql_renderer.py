@@ -7,27 +7,69 @@ ALIAS_PREFIX = "a"
 
 ColDesc = namedtuple('ColumnDescription', 'tbl_alias col_index')
 
-def from_logical_query(query_symbols, logical_query, coeff_expr, cursor):
+def from_logical_query(query_symbols, logical_query, coeff_expr, cursor, column_names=None, optimize=False,
+                       unique_keys=None):
     sel = tuple(query_symbols)
     if coeff_expr is not None:
         sel += (coeff_expr,)
-    renderer = SQLRenderer(sel, cursor)
+    renderer = SQLRenderer(sel, cursor, column_names, optimize=optimize, unique_keys=unique_keys)
     renderer.visit(logical_query)
     return renderer.to_sql()
 
 
+def parameterized_query(query_symbols, logical_query, coeff_expr, column_names, placeholder, optimize=False,
+                        unique_keys=None):
+    """
+    Renders a logical query like :func:`from_logical_query`, but passes the constants as parameters of the query
+    instead of interpolating them. Queries of the same shape thus have the same SQL and can be prepared once.
+
+    :param column_names: A function mapping a table name to the list of its column names
+    :param placeholder: The placeholder for parameters of the DB-API module, e.g. "%s"
+    :param optimize: see :class:`SQLRenderer`
+    :param unique_keys: see :class:`SQLRenderer`
+    :return: A tuple of the query as str and the list of its parameters
+    """
+    sel = tuple(query_symbols)
+    if coeff_expr is not None:
+        sel += (coeff_expr,)
+    renderer = SQLRenderer(sel, None, column_names, placeholder, optimize, unique_keys)
+    renderer.visit(logical_query)
+    return renderer.to_sql(), renderer.parameters
+
+
 class SQLRenderer(object):
     """
     We assume queries of the form And(pred1, Not(pred2), Not(pred3), ...,) OR And(pred4, Not(pred5), pred6, ...,) OR ...
 
     (c1 AND c2 AND c3) OR (c1 AND c2 AND c3)
+
+    By default every clause is rendered as SELECT DISTINCT over comma joins with correlated NOT EXISTS subqueries and
+    the clauses are combined with UNION. The optimized mode renders explicit joins instead, see
+    :func:`Clause.to_joined_sql`, drops DISTINCT from clauses whose answers are unique anyway and combines clauses
+    with UNION ALL if no two of them share an answer.
     """
 
-    def __init__(self, selector, cursor):
+    def __init__(self, selector, cursor, column_names=None, placeholder=None, optimize=False, unique_keys=None):
+        """
+        :param selector: The query symbols and the coefficient expression to be selected
+        :param cursor: The cursor used to look up the columns of the tables
+        :param column_names: An optional function mapping a table name to the list of its column names. Defaults to
+                             :func:`get_column_names`.
+        :param placeholder: An optional placeholder for parameters. If given, constants are rendered as placeholders
+                            and collected in self.parameters.
+        :param optimize: Whether the query is rendered in the optimized mode
+        :param unique_keys: An optional function mapping a table name to a list of tuples of the names of columns,
+                            which hold no two equal rows, e.g. the primary key. Without it DISTINCT is always kept.
+        """
         self.selector = selector
         self.cursor = cursor
+        self.column_names = column_names or (lambda relation_name: get_column_names(relation_name, cursor))
+        self.placeholder = placeholder
+        self.optimize = optimize
+        self.unique_keys = unique_keys
+        self.parameters = []
         self.result = ""
-        self.current_clause = Clause(self.selector)
+        self.current_clause = Clause(self.selector, placeholder)
         self.clauses = []
         self.predicate_column_names = {}
 
@@ -53,7 +95,7 @@ class SQLRenderer(object):
         for clause in query.args:
             self.visit(clause)
             self.clauses.append(self.current_clause)
-            self.current_clause = Clause(self.selector)
+            self.current_clause = Clause(self.selector, self.placeholder)
 
     def visit_and(self, query):
         for condition in query.args:
@@ -67,7 +109,7 @@ class SQLRenderer(object):
     def visit_boolean_predicate(self, query):
         rel_key = query.name
         if not self.predicate_column_names.has_key(rel_key):
-            self.predicate_column_names[rel_key] = get_column_names(rel_key, self.cursor)
+            self.predicate_column_names[rel_key] = self.column_names(rel_key)
 
         if self.in_negation:
             self.current_clause.add_negative_predicate(query)
@@ -78,13 +120,51 @@ class SQLRenderer(object):
         self.current_clause.add_relation(query)
 
     def to_sql(self):
-        return " UNION ".join([clause.to_sql(self.predicate_column_names) for clause in self.clauses + [self.current_clause]])
+        # visit_or collects the clauses of a disjunction itself
+        clauses = self.clauses or [self.current_clause]
+        if not self.optimize:
+            sql = " UNION ".join([clause.to_sql(self.predicate_column_names) for clause in clauses])
+        elif all(first.excludes(second, self.selected_symbols())
+                 for index, first in enumerate(clauses) for second in clauses[index + 1:]):
+            sql = " UNION ALL ".join([clause.to_joined_sql(self.predicate_column_names, not self.is_unique(clause))
+                                      for clause in clauses])
+        else:
+            # UNION removes duplicates anyway
+            sql = " UNION ".join([clause.to_joined_sql(self.predicate_column_names, False) for clause in clauses])
+        self.parameters = [parameter for clause in clauses for parameter in clause.parameters]
+        return sql
+
+    def selected_symbols(self):
+        return set(sel for sel in self.selector if isinstance(sel, SubSymbol))
+
+    def is_unique(self, clause):
+        """
+        A clause selects every answer only once, if every row of every joined table is determined by the selected
+        symbols and the constants, i.e. if they bind a unique key of every table.
+
+        :param clause: The clause
+        :return: True if the answers of the clause are unique without DISTINCT
+        """
+        if self.unique_keys is None or not clause.positive:
+            return False
+
+        selected = self.selected_symbols()
+        for predicate in clause.positive:
+            columns = self.predicate_column_names[predicate.name]
+            determined = set(columns[index] for index, arg in enumerate(predicate.args)
+                             if not isinstance(arg, SubSymbol) or arg in selected)
+            if not any(determined.issuperset(key) for key in self.unique_keys(predicate.name)):
+                return False
+        return True
 
 
 class Clause(object):
 
-    def __init__(self, selector):
+    def __init__(self, selector, placeholder=None):
         self.selector = selector
+        self.placeholder = placeholder
+        # the parameters of the placeholders in the order of their occurrence
+        self.parameters = []
         self.alias_id = 0
         # {SubSymbol: [(tbl_alias, col)]}
         self.colum_of_symbols = {}
@@ -97,6 +177,10 @@ class Clause(object):
         # anti joins
         self.not_exists = []
 
+        # the positive predicates in the order of self.from_
+        self.positive = []
+        # [(tbl, tbl_alias)] of the anti joins of :func:`to_joined_sql`
+        self.anti_join_from = []
 
     def next_alias(self):
         self.alias_id += 1
@@ -105,6 +189,7 @@ class Clause(object):
     def add_positive_predicate(self, predicate):
         alias = self.next_alias()
         self.from_.append((predicate.name, alias))
+        self.positive.append(predicate)
 
         for index, arg in enumerate(predicate.args):
             col = ColDesc(alias, index)
@@ -125,6 +210,7 @@ class Clause(object):
 
     def to_sql(self, predicate_columns):
         self.predicate_columns = predicate_columns
+        self.parameters = []
 
         sql = "SELECT DISTINCT "
         sql += ", ".join(self.render_selectors())
@@ -143,6 +229,116 @@ class Clause(object):
         sql += ' AND '.join(conditions)
         return sql
 
+    def to_joined_sql(self, predicate_columns, distinct):
+        """
+        Renders the clause with explicit joins. Every join carries the conditions, which become decidable with it, the
+        constant conditions of a predicate filter its table in a subquery and negated predicates are rendered as anti
+        joins, i.e. LEFT JOIN ... WHERE ... IS NULL.
+
+        :param predicate_columns: A dict mapping the table names to the lists of their column names
+        :param distinct: Whether duplicate answers are removed
+        :return: The query as str
+        """
+        self.predicate_columns = predicate_columns
+        self.parameters = []
+        self.anti_join_from = []
+
+        sql = "SELECT " + ("DISTINCT " if distinct else "") + ", ".join(self.render_selectors())
+
+        # the conditions of the first table, which are rendered as WHERE clause
+        where = []
+        bound = {}
+        relations = list(self.rel_cond)
+        for position, (predicate, (name, alias)) in enumerate(zip(self.positive, self.from_)):
+            source = self.render_source(predicate, name, alias)
+
+            conditions = []
+            for index, arg in enumerate(predicate.args):
+                if isinstance(arg, SubSymbol):
+                    if arg in bound:
+                        conditions.append((bound[arg], ColDesc(alias, index), Eq))
+                    else:
+                        bound[arg] = ColDesc(alias, index)
+            for rel in [rel for rel in relations if all(symbol in bound for symbol in rel.atoms(SubSymbol))]:
+                relations.remove(rel)
+                conditions.append(self.relation_sides(rel))
+
+            if position == 0:
+                sql += " FROM " + source
+                where += conditions
+            elif conditions:
+                sql += " JOIN " + source + " ON " + " AND ".join(self.render_conditions(conditions))
+            else:
+                sql += " CROSS JOIN " + source
+
+        null_checks = []
+        for predicate in self.not_exists:
+            alias = self.next_alias()
+            self.anti_join_from.append((predicate.name, alias))
+            conditions = [(ColDesc(alias, index), self.colum_of_symbols[arg][0] if isinstance(arg, SubSymbol) else arg,
+                           Eq) for index, arg in enumerate(predicate.args)
+                          if not isinstance(arg, SubSymbol) or arg in self.colum_of_symbols]
+            sql += " LEFT JOIN " + predicate.name + " AS " + alias + " ON " + \
+                   (" AND ".join(self.render_conditions(conditions)) or "1 = 1")
+            null_checks.append(self.render_cond_side(ColDesc(alias, 0)) + " IS NULL")
+
+        conditions = self.render_conditions(where + [self.relation_sides(rel) for rel in relations]) + null_checks
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql
+
+    def render_source(self, predicate, name, alias):
+        """
+        :return: The table of the predicate, filtered by the constants of the predicate in a subquery
+        """
+        constants = [(index, arg) for index, arg in enumerate(predicate.args) if not isinstance(arg, SubSymbol)]
+        if not constants:
+            return name + " AS " + alias
+
+        columns = self.predicate_columns[name]
+        filters = [name + "." + columns[index] + " = " + self.render_cond_side(arg) for index, arg in constants]
+        return "(SELECT * FROM " + name + " WHERE " + " AND ".join(filters) + ") AS " + alias
+
+    def relation_sides(self, rel):
+        """
+        :return: A tuple (lhs, rhs, relation class) of a relation, whose symbols are replaced by their columns
+        """
+        lhs = self.colum_of_symbols[rel.lhs][0] if isinstance(rel.lhs, SubSymbol) else rel.lhs
+        rhs = self.colum_of_symbols[rel.rhs][0] if isinstance(rel.rhs, SubSymbol) else rel.rhs
+        return lhs, rhs, rel.func
+
+    def render_conditions(self, conditions):
+        return [self.render_relation(lhs, rhs, rel_class) for lhs, rhs, rel_class in conditions]
+
+    def excludes(self, other, selected):
+        """
+        Decides whether two clauses are disjoint, i.e. whether they never select the same answer. This holds if one
+        clause requires a predicate the other one negates or a relation the other one contradicts, both on the
+        selected symbols and constants only.
+
+        :param other: The other clause
+        :param selected: The set of the selected symbols
+        :return: True if the clauses are provably disjoint
+        """
+        def determined(args):
+            return all(not isinstance(arg, SubSymbol) or arg in selected for arg in args)
+
+        for first, second in ((self, other), (other, self)):
+            for predicate in first.positive:
+                if predicate in second.not_exists and determined(predicate.args):
+                    return True
+            for rel in first.rel_cond:
+                if not determined(rel.atoms(SubSymbol)):
+                    continue
+                if Not(rel) in second.rel_cond:
+                    return True
+                if rel.func is Eq and isinstance(rel.lhs, SubSymbol) and not rel.rhs.atoms(SubSymbol):
+                    for other_rel in second.rel_cond:
+                        if other_rel.func is Eq and other_rel.lhs == rel.lhs and \
+                                not other_rel.rhs.atoms(SubSymbol) and other_rel.rhs != rel.rhs:
+                            return True
+        return False
+
     def render_selectors(self):
         selectors = []
         for sel in self.selector:
@@ -214,6 +410,8 @@ class Clause(object):
             rel_symbol = ">"
         elif rel_class is Equality:
             rel_symbol = "="
+        elif rel_class is Unequality:
+            rel_symbol = "<>"
         else:
             raise NotImplementedError('Rendering for relation ' + str(rel_class) + ' is not implemented')
 
@@ -225,8 +423,11 @@ class Clause(object):
     def render_cond_side(self, item):
             if isinstance(item, ColDesc):
                 result = item.tbl_alias + "." + self.get_column_name(item.tbl_alias, item.col_index)
+            elif self.placeholder is not None:
+                self.parameters.append(constant_parameter(item))
+                result = self.placeholder
             else:
-                result = str(item)
+                result = render_constant(item)
 
             return result
 
@@ -234,13 +435,41 @@ class Clause(object):
         return self.render_relation(lhs, rhs, Eq)
 
     def get_column_name(self, name, index):
-        for tbl, tbl_alias in self.from_:
+        for tbl, tbl_alias in self.from_ + self.anti_join_from:
             if tbl_alias == name:
                 name = tbl
                 break
 
         return self.predicate_columns[name][index]
 
+def render_constant(value):
+    """
+    Renders a constant as SQL literal. Numbers are rendered as they are, everything else as quoted string.
+
+    :param value: The constant, e.g. a sympy Symbol or Number
+    :return: The SQL literal as str
+    """
+    if isinstance(value, (int, long, float)) or (isinstance(value, Basic) and value.is_Number):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def constant_parameter(value):
+    """
+    Converts a constant into a parameter of a query, see :func:`render_constant`.
+
+    :param value: The constant, e.g. a sympy Symbol or Number
+    :return: An int, float or str
+    """
+    if isinstance(value, (int, long, float)):
+        return value
+    if isinstance(value, Basic) and value.is_Integer:
+        return int(value)
+    if isinstance(value, Basic) and value.is_Number:
+        return float(value)
+    return str(value)
+
+
 def get_column_names(relation_name, cursor):
         """
         Gets the name of the columns for a given table.
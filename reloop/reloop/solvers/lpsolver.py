@@ -12,6 +12,9 @@ log = logging.getLogger(__name__)
 LpMinimize = 1
 LpMaximize = -1
 
+# the slacks of a warm start are moved at least this far into the interior of the feasible region
+WARM_START_MARGIN = 1.0
+
 
 class LpSolver():
     """
@@ -22,6 +25,7 @@ class LpSolver():
     _solver_options = {}
     _lifted_options = {}
     _lifted = False
+    _dense = False
 
     @abc.abstractmethod
     def solve(c, g, h, a, b, **kwargs):
@@ -38,6 +42,27 @@ class LpSolver():
         """
         raise NotImplementedError()
 
+    def solve_batch(self, lps, warm_start=False, **kwargs):
+        """
+        Solves a sequence of structurally identical lps, e.g. the lps of one rlp grounded for changing data, one after
+        another.
+
+        :param lps: An iterable of tuples (c, g, h, a, b). It is consumed lazily, hence the lps may be grounded on demand.
+        :param warm_start: If True, the solution of each lp is passed as starting point to the solver for the next one.
+        :param kwargs: Passed to :func:`solve`
+        :return: A generator of the solutions of the lps
+        """
+        start = None
+        for lp in lps:
+            if start is not None:
+                solution = self.solve(*lp, start=start, **kwargs)
+            else:
+                solution = self.solve(*lp, **kwargs)
+
+            if warm_start:
+                start = solution
+            yield solution
+
     def setopts(self, opts):
         # init defaults and provided options
         for k, v in opts.items():
@@ -49,10 +74,14 @@ class LpSolver():
         if "lifted" in opts:
             self._lifted = opts["lifted"]
 
+        if "dense" in opts:
+            self._dense = opts["dense"]
+
     def reset(self):
 
         # clears the options
         self._lifted = False
+        self._dense = False
         self._lifted_options = {}
         self._solver_options = {}
 
@@ -92,6 +121,8 @@ class CvxoptSolver(LpSolver):
 
             :Keyword Arguments:
                 * lifted = False: enables or disables lifting via equitable partitions.
+                * dense = False: passes the constraint matrices as dense instead of sparse matrices to cvxopt, which is
+                  considerably faster for small lps whose constraint matrices have a large share of non-zero entries.
                 * anything prefixed with \\lifted\\_ is passed to reloop.utils.saucy.liftAbc
                 * anything prefixed with \\solver\\_ is passed to cvxopt.solvers.lp
         """
@@ -108,12 +139,21 @@ class CvxoptSolver(LpSolver):
         if kwargs:
             self.setopts(kwargs)
 
-    def solve(self, c, g, h, a, b, **kwargs):
+    def solve(self, c, g, h, a, b, start=None, **kwargs):
+        """
+        Solves the lp min c'x s.t. gx <= h, ax = b.
+
+        :param start: An optional starting point x for the interior point method, e.g. the solution of a similar lp.
+                      It is ignored if the lp is lifted.
+        :return: The solution of the LP
+        """
 
         if kwargs:
             self.setopts(kwargs)
         log.debug("entering solve() with arguments: \n" + ", ".join([str(u) + "=" + str(v) for u, v in kwargs.items()]))
 
+        solver_options = dict(self._solver_options)
+
         if self._lifted:
             # TODO: refactor lifting code to reflect that g,h are now used for a,b and vice-versa
             # TODO: refactor lifting code to reflect that g,h are now used for a,b and vice-versa
@@ -122,11 +162,13 @@ class CvxoptSolver(LpSolver):
             # TODO: refactor lifting code to reflect that g,h are now used for a,b and vice-versa
             # TODO: refactor lifting code to reflect that g,h are now used for a,b and vice-versa
             Lg, Lh, Lc, La, Lb, compresstime, Bcc = saucy.liftAbc(g, h, c, G=a, h=b, **self._lifted_options)
-            c, g, h, a, b = get_cvxopt_matrices(Lc, Lg, Lh, La, Lb)
+            c, g, h, a, b = get_cvxopt_matrices(Lc, Lg, Lh, La, Lb, dense=self._dense)
         else:
-            c, g, h, a, b = get_cvxopt_matrices(c, g, h, a, b)
+            c, g, h, a, b = get_cvxopt_matrices(c, g, h, a, b, dense=self._dense)
+            if start is not None and g is not None:
+                solver_options["primalstart"] = get_primal_start(start, g, h)
 
-        self._result = cvxopt.solvers.lp(c, G=g, h=h, A=a, b=b, **self._solver_options)
+        self._result = cvxopt.solvers.lp(c, G=g, h=h, A=a, b=b, **solver_options)
 
         try:
             xopt = self._result["x"]
@@ -187,7 +229,13 @@ class PicosSolver(LpSolver):
 
         self.setopts(kwargs)
 
-    def solve(self, c, g, h, a, b, **kwargs):
+    def solve(self, c, g, h, a, b, start=None, **kwargs):
+        """
+        Solves the lp min c'x s.t. gx <= h, ax = b.
+
+        :param start: Ignored, PICOS does not accept a starting point.
+        :return: The solution of the LP
+        """
         if kwargs:
             self.setopts(kwargs)
         log.debug("entering solve() with settings: \n" + ", ".join(
@@ -234,12 +282,44 @@ class PicosSolver(LpSolver):
         return self._result.status
 
 
-def get_cvxopt_matrices(c, g, h, a, b):
-    a = a if a is None else cvxopt.spmatrix(a.data, a.row.tolist(), a.col.tolist(), size=a.shape)
-    g = g if g is None else cvxopt.spmatrix(g.data, g.row.tolist(), g.col.tolist(), size=g.shape)
+def get_cvxopt_matrices(c, g, h, a, b, dense=False):
+    a = a if a is None else get_cvxopt_spmatrix(a)
+    g = g if g is None else get_cvxopt_spmatrix(g)
+
+    if dense:
+        a = a if a is None else cvxopt.matrix(a)
+        g = g if g is None else cvxopt.matrix(g)
 
     b = b if b is None else cvxopt.matrix(b)
     c = cvxopt.matrix(c)
     h = h if h is None else cvxopt.matrix(h)
 
     return c, g, h, a, b
+
+
+def get_cvxopt_spmatrix(matrix):
+    """
+    Converts a sparse matrix into a cvxopt spmatrix. The indices are passed as integer matrices instead of lists, which
+    avoids building a Python object for every entry.
+
+    :param matrix: A scipy sparse matrix
+    :return: The cvxopt spmatrix
+    """
+    matrix = matrix.tocoo()
+    return cvxopt.spmatrix(cvxopt.matrix(matrix.data.astype(float)), cvxopt.matrix(matrix.row.astype(int)),
+                           cvxopt.matrix(matrix.col.astype(int)), size=matrix.shape)
+
+
+def get_primal_start(start, g, h):
+    """
+    Builds the primal starting point for cvxopt from a given x. The slacks of the inequality constraints are moved into
+    the interior of the feasible region, as required by the interior point method.
+
+    :param start: The starting point x
+    :param g: The matrix of the inequality constraints as cvxopt matrix
+    :param h: The right hand side of the inequality constraints as cvxopt matrix
+    :return: A dict with the keys "x" and "s" as expected by cvxopt.solvers.lp
+    """
+    x = cvxopt.matrix(np.array(start, dtype=float).ravel())
+    s = np.maximum(np.array(h - g * x).ravel(), WARM_START_MARGIN)
+    return {"x": x, "s": cvxopt.matrix(s)}
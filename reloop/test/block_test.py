@@ -1,8 +1,23 @@
 import unittest
+import numpy as np
 from reloop.languages.rlp.grounding.block import BlockGrounder
 from reloop.solvers.lpsolver import CvxoptSolver
 
 
+def canonical_lp(lp, varmap, model):
+    # the order of the rows and columns depends on the order of the answers of the knowledge base
+    columns = [(variable.name,) + tuple(str(arg) for arg in args) for variable in model.reloop_variables
+               for args in varmap.get(variable, ())]
+    order = sorted(range(len(columns)), key=columns.__getitem__)
+    c, g, h, a, b = lp
+    result = [sorted(columns), np.asarray(c).ravel()[order].tolist()]
+    for matrix, rhs in ((g, h), (a, b)):
+        if matrix is None:
+            result.append(None)
+        else:
+            result.append(sorted(map(tuple, np.hstack((matrix.toarray()[:, order], np.asarray(rhs))).tolist())))
+    return result
+
 
 class TestBlockGrounder(unittest.TestCase):
     def test_pydatalog(self):
@@ -129,6 +144,287 @@ class TestBlockGrounder(unittest.TestCase):
 
         self.assertEqual(model, 0, "ERROR : Sudoku couldn't be solved")
 
+    def test_compile(self):
+        from reloop.languages.rlp import RlpProblem, LpMaximize, ForAll, RlpSum, sub_symbols, numeric_predicate, \
+            boolean_predicate
+
+        X, Y = sub_symbols('X', 'Y')
+        flow = numeric_predicate("flow", 2)
+        edge = boolean_predicate("edge", 2)
+
+        model = RlpProblem("compile", LpMaximize, BlockGrounder(None), None)
+        model.add_reloop_variable(flow)
+        model += RlpSum([X, Y], edge(X, Y), flow(X, Y))
+        model += ForAll([X, Y], edge(X, Y), flow(X, Y) >= 0)
+
+        compiled = model.compile()
+        self.assertIs(compiled, model.compile(), "The compiled model was not cached")
+        self.assertEqual(len(compiled.objective), 1)
+        self.assertEqual(len(compiled.constraints), 1)
+        self.assertEqual(compiled.objective[0].variable.func, flow)
+
+        model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= 1)
+        self.assertIsNot(compiled, model.compile(), "Adding a constraint did not invalidate the compiled model")
+        self.assertEqual(len(model.compile().constraints), 2)
+
+        # changes made without += are noticed as well
+        model.constraints.pop()
+        self.assertEqual(len(model.compile().constraints), 1)
+        compiled = model.compile()
+        model.objective = RlpSum([X, Y], edge(X, Y), 2 * flow(X, Y))
+        self.assertIsNot(compiled, model.compile(), "Assigning the objective did not invalidate the compiled model")
+        compiled = model.compile()
+        model.grounder = BlockGrounder(None)
+        self.assertIsNot(compiled, model.compile(), "Swapping the grounder did not invalidate the compiled model")
+        self.assertIs(model.compile(), model.compile(), "The compiled model was not cached")
+
+    def test_grounding_cache(self):
+        import os
+        import shutil
+        import tempfile
+        from pyDatalog import pyDatalog
+        from reloop.languages.rlp import RlpProblem, LpMaximize, ForAll, RlpSum, sub_symbols, numeric_predicate, \
+            boolean_predicate
+        from reloop.languages.rlp.logkb import PyDatalogLogKb
+        from reloop.languages.rlp.grounding.cache import GroundingCache
+
+        pyDatalog.assert_fact('cache_edge', 'a', 'b')
+        pyDatalog.assert_fact('cache_edge', 'b', 'c')
+        pyDatalog.assert_fact('cache_cap', 'a', 'b', 5)
+        pyDatalog.assert_fact('cache_cap', 'b', 'c', 3)
+
+        X, Y = sub_symbols('X', 'Y')
+        flow = numeric_predicate("cache_flow", 2)
+        cap = numeric_predicate("cache_cap", 2)
+        edge = boolean_predicate("cache_edge", 2)
+
+        directory = tempfile.mkdtemp()
+        try:
+            grounder = BlockGrounder(PyDatalogLogKb(), cache=GroundingCache(directory))
+            model = RlpProblem("cache", LpMaximize, grounder, None)
+            model.add_reloop_variable(flow)
+            model += RlpSum([X, Y], edge(X, Y), flow(X, Y))
+            model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= cap(X, Y))
+
+            lp, varmap = grounder.ground(model)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+            cached_lp, cached_varmap = grounder.ground(model)
+            self.assertEqual(len(os.listdir(directory)), 1, "An unchanged model was grounded again")
+            self.assertEqual(list(varmap[flow]), list(cached_varmap[flow]))
+            for matrix, cached_matrix in zip(lp, cached_lp):
+                if matrix is None:
+                    self.assertIsNone(cached_matrix)
+                else:
+                    self.assertEqual(abs(matrix - cached_matrix).sum(), 0)
+
+            pyDatalog.assert_fact('cache_cap', 'b', 'c', 4)
+            grounder.ground(model)
+            self.assertEqual(len(os.listdir(directory)), 2, "Changed data did not invalidate the cache")
+        finally:
+            shutil.rmtree(directory)
+
+    def test_incremental(self):
+        from pyDatalog import pyDatalog
+        from reloop.languages.rlp import RlpProblem, LpMinimize, ForAll, RlpSum, sub_symbols, numeric_predicate, \
+            boolean_predicate
+        from reloop.languages.rlp.logkb import PyDatalogLogKb
+
+        pyDatalog.assert_fact('inc_edge', 'a', 'b')
+        pyDatalog.assert_fact('inc_edge', 'b', 'c')
+        pyDatalog.assert_fact('inc_cap', 'a', 'b', 5)
+        pyDatalog.assert_fact('inc_cap', 'b', 'c', 3)
+        pyDatalog.assert_fact('inc_weight', 'a', 'b', 1)
+        pyDatalog.assert_fact('inc_weight', 'b', 'c', 2)
+
+        X, Y = sub_symbols('X', 'Y')
+        flow = numeric_predicate("inc_flow", 2)
+        cap = numeric_predicate("inc_cap", 2)
+        weight = numeric_predicate("inc_weight", 2)
+        edge = boolean_predicate("inc_edge", 2)
+
+        def build(grounder):
+            model = RlpProblem("incremental", LpMinimize, grounder, None)
+            model.add_reloop_variable(flow)
+            model += RlpSum([X, Y], edge(X, Y), weight(X, Y) * flow(X, Y))
+            model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= cap(X, Y))
+            return model
+
+        def objective(grounder, model):
+            lp, varmap = grounder.ground(model)
+            return dict((tuple(str(arg) for arg in args), value) for args, value in zip(varmap[flow], lp[0].flat))
+
+        grounder = BlockGrounder(PyDatalogLogKb(), incremental=True)
+        model = build(grounder)
+        self.assertEqual(objective(grounder, model), {('a', 'b'): 1, ('b', 'c'): 2})
+
+        pyDatalog.retract_fact('inc_weight', 'b', 'c', 2)
+        pyDatalog.assert_fact('inc_weight', 'b', 'c', 7)
+        self.assertEqual(objective(grounder, model)[('b', 'c')], 2, "Kept answers were not reused")
+
+        grounder.invalidate('inc_weight')
+        self.assertEqual(objective(grounder, model), {('a', 'b'): 1, ('b', 'c'): 7})
+
+        pyDatalog.retract_fact('inc_weight', 'a', 'b', 1)
+        pyDatalog.assert_fact('inc_weight', 'a', 'b', 4)
+        grounder.invalidate('inc_weight')
+        self.assertEqual(objective(grounder, model), {('a', 'b'): 4, ('b', 'c'): 7})
+
+        lp, varmap = grounder.ground(model)
+        full_grounder = BlockGrounder(PyDatalogLogKb())
+        full_model = build(full_grounder)
+        full_lp, full_varmap = full_grounder.ground(full_model)
+        self.assertEqual(canonical_lp(lp, varmap, model), canonical_lp(full_lp, full_varmap, full_model))
+
+    def test_ground_blocks(self):
+        from pyDatalog import pyDatalog
+        from reloop.languages.rlp import RlpProblem, LpMaximize, ForAll, RlpSum, eq, sub_symbols, numeric_predicate, \
+            boolean_predicate
+        from reloop.languages.rlp.grounding import LpAssembler, OBJECTIVE, EQUALITY, INEQUALITY
+        from reloop.languages.rlp.grounding.recursive import RecursiveGrounder
+        from reloop.languages.rlp.logkb import PyDatalogLogKb
+
+        pyDatalog.assert_fact('gb_edge', 'a', 'b')
+        pyDatalog.assert_fact('gb_edge', 'b', 'c')
+        pyDatalog.assert_fact('gb_edge', 'a', 'c')
+        pyDatalog.assert_fact('gb_inner', 'b')
+        pyDatalog.assert_fact('gb_cap', 'a', 'b', 4)
+        pyDatalog.assert_fact('gb_cap', 'b', 'c', 3)
+        pyDatalog.assert_fact('gb_cap', 'a', 'c', 2)
+
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        flow = numeric_predicate("gb_flow", 2)
+        used = numeric_predicate("gb_used", 1)
+        cap = numeric_predicate("gb_cap", 2)
+        edge = boolean_predicate("gb_edge", 2)
+        inner = boolean_predicate("gb_inner", 1)
+
+        def build(grounder):
+            model = RlpProblem("blocks", LpMaximize, grounder, None)
+            model.add_reloop_variable(flow, used)
+            model += RlpSum([X, Y], edge(X, Y), flow(X, Y)) - RlpSum([X], inner(X), used(X))
+            model += ForAll([Z], inner(Z), RlpSum([X], edge(X, Z), flow(X, Z)) |eq| RlpSum([Y], edge(Z, Y), flow(Z, Y)))
+            model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= cap(X, Y))
+            model += ForAll([X], inner(X), used(X) >= 1)
+            return model
+
+        grounder = BlockGrounder(PyDatalogLogKb())
+        model = build(grounder)
+        blocks = list(grounder.ground_blocks(model))
+        self.assertEqual([block.kind for block in blocks], [OBJECTIVE, EQUALITY, INEQUALITY, INEQUALITY])
+        self.assertEqual([len(block.rhs) for block in blocks[1:]], [1, 3, 1])
+
+        assembler = LpAssembler(model)
+        for block in blocks:
+            assembler.add(block)
+        lp = assembler.matrices(grounder.variable_map())
+
+        full_lp, full_varmap = BlockGrounder(PyDatalogLogKb()).ground(model)
+        self.assertEqual(canonical_lp(lp, grounder.variable_map(), model), canonical_lp(full_lp, full_varmap, model))
+
+        # the default implementation splits the lp grounded by :func:`ground`
+        recursive_grounder = RecursiveGrounder(PyDatalogLogKb())
+        recursive_model = build(recursive_grounder)
+        assembler = LpAssembler(recursive_model)
+        for block in recursive_grounder.ground_blocks(recursive_model):
+            assembler.add(block)
+        lp = assembler.matrices(recursive_grounder.variable_map())
+        self.assertEqual(canonical_lp(lp, recursive_grounder.variable_map(), recursive_model),
+                         canonical_lp(full_lp, full_varmap, model))
+
+    def test_numpy(self):
+        from pyDatalog import pyDatalog
+        from reloop.languages.rlp import RlpProblem, LpMaximize, ForAll, RlpSum, sub_symbols, numeric_predicate, \
+            boolean_predicate
+        from reloop.languages.rlp.logkb import PyDatalogLogKb, NumpyKb
+
+        facts = {"np_node": [('a',), ('b',), ('c',), ('d',)],
+                 "np_edge": [('a', 'b'), ('b', 'c'), ('a', 'c'), ('c', 'd'), ('b', 'd')],
+                 "np_cap": [('a', 'b', 4), ('b', 'c', 3), ('a', 'c', 2), ('c', 'd', 5), ('b', 'd', 1)],
+                 "np_source": [('a',)], "np_target": [('d',)]}
+        logkb = NumpyKb()
+        for name, relation in facts.items():
+            logkb.load_facts(name, relation)
+            for fact in relation:
+                pyDatalog.assert_fact(name, *fact)
+
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        flow = numeric_predicate("np_flow", 2)
+        cap = numeric_predicate("np_cap", 2)
+        node = boolean_predicate("np_node", 1)
+        edge = boolean_predicate("np_edge", 2)
+        source = boolean_predicate("np_source", 1)
+        target = boolean_predicate("np_target", 1)
+
+        def build(grounder):
+            model = RlpProblem("numpy", LpMaximize, grounder, None)
+            model.add_reloop_variable(flow)
+            model += RlpSum([X, Y], source(X) & edge(X, Y), flow(X, Y))
+            inner = node(Z) & ~source(Z) & ~target(Z)
+            model += ForAll([Z], inner, RlpSum([X], edge(X, Z), flow(X, Z)) <= RlpSum([Y], edge(Z, Y), flow(Z, Y)))
+            model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= 0.5 * cap(X, Y) + 1)
+            model += ForAll([X, Y], edge(X, Y), flow(X, Y) >= 0)
+            return model
+
+        grounder = BlockGrounder(logkb)
+        model = build(grounder)
+        lp, varmap = grounder.ground(model)
+
+        datalog_grounder = BlockGrounder(PyDatalogLogKb())
+        datalog_model = build(datalog_grounder)
+        datalog_lp, datalog_varmap = datalog_grounder.ground(datalog_model)
+        self.assertEqual(canonical_lp(lp, varmap, model), canonical_lp(datalog_lp, datalog_varmap, datalog_model))
+
+    def test_array_predicate(self):
+        from reloop.languages.rlp import RlpProblem, LpMinimize, ForAll, RlpSum, sub_symbols, numeric_predicate, \
+            boolean_predicate
+        from reloop.languages.rlp.logkb import NumpyKb
+
+        random = np.random.RandomState(0)
+        papers = ["p" + str(index) for index in range(12)]
+        labels = random.choice([-1, 1], len(papers))
+        kernel_values = random.rand(len(papers), len(papers))
+        kernel_values[kernel_values < 0.3] = 0
+
+        def knowledge_base(with_kernel):
+            logkb = NumpyKb()
+            logkb.load_facts("ap_paper", [(paper, paper) for paper in papers])
+            logkb.load_facts("ap_label", [(paper, int(label)) for paper, label in zip(papers, labels)])
+            if with_kernel:
+                logkb.load_facts("ap_kernel", [(papers[i], papers[j], kernel_values[i, j])
+                                               for i, j in zip(*np.nonzero(kernel_values))])
+            return logkb
+
+        I, Z, X, J = sub_symbols('I', 'Z', 'X', 'J')
+        weight = numeric_predicate("ap_weight", 1)
+        slack = numeric_predicate("ap_slack", 1)
+        b = numeric_predicate("ap_b", 0)
+        label = numeric_predicate("ap_label", 1)
+        kernel = numeric_predicate("ap_kernel", 2)
+        paper = boolean_predicate("ap_paper", 2)
+
+        def build(grounder):
+            model = RlpProblem("lp-svm", LpMinimize, grounder, None)
+            model.add_reloop_variable(weight, slack, b)
+            model += RlpSum([I, Z], paper(I, Z), slack(I))
+            # the kernel summand is inserted as a block, the bound on the slack is looked up answer by answer
+            model += ForAll([I, Z], paper(I, Z), label(I) * (RlpSum([X, J], paper(X, J),
+                                                                    weight(X) * label(X) * kernel(Z, J)) + b()) +
+                            slack(I) >= 1)
+            model += ForAll([I, Z], paper(I, Z), slack(I) >= kernel(I, Z) - 1)
+            return model
+
+        grounder = BlockGrounder(knowledge_base(True))
+        model = build(grounder)
+        lp, varmap = grounder.ground(model)
+
+        for values in (kernel_values, lambda rows, columns: kernel_values[np.ix_(rows, columns)]):
+            array_grounder = BlockGrounder(knowledge_base(False))
+            array_grounder.add_array_predicate(kernel, values, papers, papers)
+            array_model = build(array_grounder)
+            array_lp, array_varmap = array_grounder.ground(array_model)
+            self.assertEqual(canonical_lp(array_lp, array_varmap, array_model), canonical_lp(lp, varmap, model))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
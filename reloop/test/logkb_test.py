@@ -54,6 +54,119 @@ class PyDataLogKBNotExistingPredicateTestCase(PyDatalogLogKBTest):
         self.assertEqual(None, none_result, "The result should have been None but was " + str(none_result))
         print("...OK")
 
+class PyDataLogKBAskPredicatesTestCase(PyDatalogLogKBTest):
+    def runTest(self):
+        from sympy import Symbol
+        print("Testing PyDatalog bulk predicate lookups...")
+        a, b, c = Symbol('a'), Symbol('b'), Symbol('c')
+        answers = self.logkb.ask_predicates(self.predicate, [(a,), (b,), (c,)])
+        self.assertEqual({(a,): [(self.float_test_data,)], (b,): [(self.integer_test_data,)]}, answers,
+                         "The bulk lookup returned " + str(answers))
+        print("...OK")
+
+
+class PyDataLogKBAskTableTestCase(PyDatalogLogKBTest):
+    def runTest(self):
+        from sympy import Symbol
+        from reloop.languages.rlp import SubSymbol, VariableSubSymbol, boolean_predicate
+        print("Testing PyDatalog answer tables...")
+        X, V = SubSymbol('X'), VariableSubSymbol('V')
+        value = boolean_predicate("test_predicate", 2)
+        table = self.logkb.ask_table([X], value(X, V), 2 * V)
+
+        answers = sorted(zip([table.constants.value(index) for index in table.columns[0]], table.values), key=str)
+        self.assertEqual([(Symbol('a'), 2 * self.float_test_data), (Symbol('b'), 2.0 * self.integer_test_data)],
+                         answers, "The answer table held " + str(answers))
+        print("...OK")
+
+
+class PyDataLogKBAssertFactsTestCase(PyDatalogLogKBTest):
+    def runTest(self):
+        import numpy as np
+        from sympy import symbols
+        from pyDatalog import pyEngine
+        from reloop.languages.rlp import SubSymbol, boolean_predicate
+        from reloop.languages.rlp.logkb import PyDatalogLogKb
+        print("Testing PyDatalog bulk assertion and persistent helper predicates...")
+        X, Y = SubSymbol('X'), SubSymbol('Y')
+        a, b, c, d = symbols('a b c d')
+        edge = boolean_predicate("test_edge", 2)
+        logkb = PyDatalogLogKb(cache_answers=True)
+        logkb.assert_facts("test_edge", np.array([['a', 'b'], ['a', 'c'], ['b', 'c']]))
+
+        self.assertEqual([(b,), (c,)], sorted(logkb.ask([Y], edge('a', Y)), key=str))
+        self.assertEqual([(c,)], logkb.ask([Y], edge('b', Y)))
+        helpers = [pred_id for pred_id in pyEngine.Logic.tl.logic.Db if pred_id.startswith(logkb.helper_prefix)]
+        self.assertEqual(1, len(helpers), "Queries of the same shape loaded the helpers " + str(helpers))
+
+        logkb.assert_facts("test_edge", [('b', 'd')])
+        self.assertEqual([(c,), (d,)], sorted(logkb.ask([Y], edge('b', Y)), key=str))
+        self.assertEqual(4, len(logkb.ask([X, Y], edge(X, Y))))
+        print("...OK")
+
+
+class QueryPlannerTestCase(unittest.TestCase):
+    def runTest(self):
+        from reloop.languages.rlp import SubSymbol, boolean_predicate
+        from reloop.languages.rlp.planner import QueryPlanner, PredicateStatistics
+        print("Testing the order of planned conjuncts...")
+        I, J, U = SubSymbol('I'), SubSymbol('J'), SubSymbol('U')
+        num = boolean_predicate("num", 1)
+        boxind = boolean_predicate("boxind", 1)
+        blocked = boolean_predicate("blocked", 2)
+        statistics = {("num", 1): PredicateStatistics(81, [81]), ("boxind", 1): PredicateStatistics(9, [9]),
+                      ("blocked", 2): PredicateStatistics(10, [5, 5])}
+        planner = QueryPlanner(lambda name, arity: statistics.get((name, arity)))
+
+        query = num(I) & num(J) & boxind(U) & ~blocked(I, J) & (I > 9 * U - 9) & (I <= 9 * U)
+        plan = planner.plan(query)
+        self.assertEqual([boxind(U), num(I)], plan[:2])
+        self.assertEqual(set([I > 9 * U - 9, I <= 9 * U]), set(plan[2:4]))
+        self.assertEqual([num(J), ~blocked(I, J)], plan[4:])
+        self.assertEqual(num(I), planner.plan(num(I)))
+        print("...OK")
+
+
+class PyDataLogKBRelationsTestCase(PyDatalogLogKBTest):
+    def runTest(self):
+        from sympy import Integer, Eq
+        from reloop.languages.rlp import SubSymbol, boolean_predicate
+        from reloop.languages.rlp.logkb import PyDatalogLogKb
+        print("Testing PyDatalog queries with relations...")
+        I, J, U = SubSymbol('I'), SubSymbol('J'), SubSymbol('U')
+        num = boolean_predicate("test_num", 1)
+        boxind = boolean_predicate("test_boxind", 1)
+        PyDatalogLogKb().assert_facts("test_num", [(i,) for i in range(1, 10)])
+        PyDatalogLogKb().assert_facts("test_boxind", [(u,) for u in range(1, 4)])
+
+        self.assertEqual(9, PyDatalogLogKb().statistics("test_num", 1).cardinality)
+        query = num(I) & num(J) & boxind(U) & (I > 3 * U - 3) & (I <= 3 * U) & Eq(J, I + 1)
+        expected = [(Integer(i), Integer(i + 1), Integer((i - 1) / 3 + 1)) for i in range(1, 9)]
+        for plan_queries in (True, False):
+            answers = PyDatalogLogKb(plan_queries=plan_queries).ask([I, J, U], query)
+            self.assertEqual(expected, sorted(answers))
+        print("...OK")
+
+
+class ProbLogKBTestCase(unittest.TestCase):
+    def runTest(self):
+        from sympy import symbols
+        from reloop.languages.rlp import SubSymbol, boolean_predicate, numeric_predicate
+        from reloop.languages.rlp.logkb import ProbLogKB
+        print("Testing ProbLog queries against the prepared program...")
+        logkb = ProbLogKB("../examples/RLP/maxflow_prolog.pl")
+        cost = numeric_predicate("cost", 2)
+        edge = boolean_predicate("edge", 2)
+        Y = SubSymbol('Y')
+        a, b, c = symbols('a b c')
+
+        self.assertEqual([(50,)], logkb.ask_predicate(cost(a, b)))
+        self.assertEqual([], logkb.ask_predicate(cost(a, a)))
+        self.assertEqual({(a, b): [(50,)], (a, c): [(100,)]}, logkb.ask_predicates(cost, [(a, b), (a, c), (b, a)]))
+        self.assertEqual([(b,), (c,)], sorted(logkb.ask([Y], edge(a, Y)), key=str))
+        print("...OK")
+
+
 class PostgreSQLLogKBTest(unittest.TestCase):
     def setUp(self):
         import random
@@ -132,6 +245,498 @@ class PostgreSQLNotExistingTableTestCase(PostgreSQLLogKBTest):
         no_arg_no_pred_result = self.logkb.ask_predicate(predicate)
         self.assertEqual(None, no_arg_no_pred_result, "Result was expected to be None but was " + str(no_arg_no_pred_result) + " instead.")
 
+class PostgreSQLKBAskPredicatesTestCase(PostgreSQLLogKBTest):
+    def runTest(self):
+        from reloop.languages.rlp.rlp import Symbol
+        self.predicate.name = "unittest_int"
+        a, c = Symbol('a'), Symbol('c')
+        answers = self.logkb.ask_predicates(self.predicate, [(a,), (c,)])
+        self.assertEqual({(a,): [(self.integer_test_data,)]}, answers, "The bulk lookup returned " + str(answers))
+
+
+class PostgreSQLKBTuningTestCase(PostgreSQLLogKBTest):
+    def runTest(self):
+        from reloop.languages.rlp.logkb import PostgreSQLKb
+        from reloop.languages.rlp.rlp import sub_symbols, boolean_predicate
+
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        query = boolean_predicate("unittest_int", 2)(X, Y) & boolean_predicate("unittest_float", 2)(X, Z)
+        logkb = PostgreSQLKb("reloop", "reloop", "reloop", tune=True)
+        views = []
+        try:
+            logkb.ask([X], query)
+            self.assertEqual(["reloop_unittest_float_x", "reloop_unittest_int_x"], sorted(logkb.tune()))
+            logkb.ask([X], query)
+            views = logkb.tune()
+            self.assertEqual(1, len(views), "The join was not materialized")
+
+            self.assertIn(views[0], logkb.render_query([X], query, None)[0])
+            self.assertEqual(['a', 'b'], sorted(str(answer[0]) for answer in logkb.ask([X], query)))
+            self.logkb.cursor.execute("INSERT INTO unittest_int VALUES ('c', 1)")
+            self.logkb.cursor.execute("INSERT INTO unittest_float VALUES ('c', 1.0)")
+            self.logkb.connection.commit()
+            self.assertEqual(['a', 'b', 'c'], sorted(str(answer[0]) for answer in logkb.ask([X], query)))
+        finally:
+            for view in views:
+                logkb.cursor.execute("DROP MATERIALIZED VIEW IF EXISTS " + view)
+                logkb.cursor.execute("DELETE FROM reloop_queries WHERE view = %s", [view])
+            logkb.connection.commit()
+            logkb.connection.close()
+
+
+class PostgreSQLLookupColumnsTestCase(unittest.TestCase):
+    def runTest(self):
+        from sympy import Or
+        from reloop.languages.rlp.logkb import lookup_columns
+        from reloop.languages.rlp.rlp import Symbol, sub_symbols, boolean_predicate
+
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        edge = boolean_predicate("Edge", 2)
+        node = boolean_predicate("node", 1)
+        columns = {"Edge": ["x", "y"], "node": ["x"]}.get
+        lookups = lookup_columns(Or(edge(X, Y) & ~node(Y), edge(Symbol('a'), Z) & (Z > 1)), columns)
+        self.assertEqual(set([("edge", ("y",)), ("node", ("x",)), ("edge", ("x", "y"))]), lookups)
+
+
+class PostgreSQLNumberedPlaceholdersTestCase(unittest.TestCase):
+    def runTest(self):
+        from reloop.languages.rlp.logkb import numbered_placeholders
+        query = numbered_placeholders("SELECT z FROM cost WHERE x = %s AND y = %s", "%s")
+        self.assertEqual("SELECT z FROM cost WHERE x = $1 AND y = $2", query)
+
+
+class FakeCursor(object):
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, query, parameters=None):
+        self.statements.append((query, parameters))
+
+    def copy_from(self, source, table):
+        self.statements.append(("COPY " + table, source.read()))
+
+    def fetchone(self):
+        return (False,)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self, name=None):
+        return FakeCursor(self.statements)
+
+    def commit(self):
+        pass
+
+
+class FakePool(object):
+    """
+    Like psycopg2.pool.ThreadedConnectionPool, raises an error if more than maxconn connections are taken.
+    """
+    def __init__(self, minconn, maxconn, dsn):
+        self.maxconn = maxconn
+        self.taken = 0
+
+    def getconn(self):
+        assert self.taken < self.maxconn, "connection pool exhausted"
+        self.taken += 1
+        return FakeConnection()
+
+    def putconn(self, connection):
+        self.taken -= 1
+
+
+class PostgreSQLFakePoolTest(unittest.TestCase):
+    def setUp(self):
+        import types
+        from reloop.languages.rlp import logkb
+
+        psycopg2 = types.ModuleType("psycopg2")
+        psycopg2.pool = types.ModuleType("psycopg2.pool")
+        psycopg2.pool.ThreadedConnectionPool = FakePool
+        self.patched = {"psycopg2": psycopg2, "psycopg2_available": True}
+        self.original = dict((name, getattr(logkb, name)) for name in self.patched if hasattr(logkb, name))
+        for name, value in self.patched.items():
+            setattr(logkb, name, value)
+        self.logkb = logkb.PostgreSQLKb("unittest", "unittest")
+
+    def tearDown(self):
+        from reloop.languages.rlp import logkb
+        for name in self.patched:
+            if name in self.original:
+                setattr(logkb, name, self.original[name])
+            else:
+                delattr(logkb, name)
+
+
+class PostgreSQLPreparedStatementsTestCase(PostgreSQLFakePoolTest):
+    def runTest(self):
+        query = "SELECT z FROM cost WHERE x = %s AND y = %s"
+        for _ in range(3):
+            self.logkb.query(query, ["a", "b"])
+
+        self.assertEqual([(query, ["a", "b"]),
+                          ("PREPARE reloop_statement_0 AS SELECT z FROM cost WHERE x = $1 AND y = $2", None),
+                          ("EXECUTE reloop_statement_0 (%s, %s)", ["a", "b"]),
+                          ("EXECUTE reloop_statement_0 (%s, %s)", ["a", "b"])], self.logkb.connection.statements)
+        self.assertEqual(3, self.logkb.statements)
+
+
+class PostgreSQLInsertRowsTestCase(PostgreSQLFakePoolTest):
+    def runTest(self):
+        self.logkb.insert_rows("cost", [("a", 1), ("b", 2)])
+        self.assertEqual([("COPY cost", "a\t1\nb\t2\n")], self.logkb.connection.statements)
+
+
+class PostgreSQLViewReadTestCase(PostgreSQLFakePoolTest):
+    def runTest(self):
+        from reloop.languages.rlp.logkb import view_read
+        from reloop.languages.rlp.rlp import sub_symbols, boolean_predicate
+
+        X, Y = sub_symbols('X', 'Y')
+        query = boolean_predicate("cost", 2)(X, Y)
+        self.logkb.columns["cost"] = ["x", "y"]
+        self.logkb.keys["cost"] = []
+        self.logkb.tuning = True
+        materialized = self.logkb.render_query([X], query, None)[0]
+        self.logkb.views[materialized] = view_read("reloop_view_0", materialized)
+
+        # the staleness is decided by the read itself, no statement is executed beforehand
+        for _ in range(3):
+            self.assertEqual(view_read("reloop_view_0", materialized), self.logkb.render_query([X], query, None)[0])
+        self.assertEqual([], self.logkb.connection.statements)
+
+
+class ViewReadTestCase(unittest.TestCase):
+    def runTest(self):
+        import sqlite3
+        from reloop.languages.rlp.logkb import view_read
+
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE TABLE cost (x TEXT, y TEXT)")
+        connection.execute("CREATE TABLE reloop_view_0 AS SELECT x FROM cost")
+        connection.execute("CREATE TABLE reloop_queries (view TEXT, stale BOOLEAN)")
+        connection.execute("INSERT INTO reloop_queries VALUES ('reloop_view_0', 0)")
+        connection.execute("INSERT INTO cost VALUES ('a', 'b')")
+        read = view_read("reloop_view_0", "SELECT x FROM cost")
+
+        # the fresh view is read, although it misses the row, which would have marked it stale
+        self.assertEqual([], connection.execute(read).fetchall())
+        connection.execute("UPDATE reloop_queries SET stale = 1")
+        self.assertEqual([("a",)], connection.execute(read).fetchall())
+        connection.execute("DELETE FROM reloop_queries")
+        self.assertEqual([("a",)], connection.execute(read).fetchall())
+        connection.close()
+
+
+class PostgreSQLPoolExhaustedTestCase(PostgreSQLFakePoolTest):
+    def runTest(self):
+        import threading
+        self.logkb.query("SELECT 1")
+        # the second thread waits for the only connection instead of failing
+        worker = threading.Thread(target=self.logkb.query, args=("SELECT 2",))
+        worker.start()
+        worker.join(0.2)
+        self.assertTrue(worker.is_alive())
+
+        self.logkb.release()
+        worker.join(5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(1, self.logkb.pool.taken)
+
+
+class SQLiteLogKBTest(unittest.TestCase):
+    def setUp(self):
+        import random
+        from reloop.languages.rlp.logkb import SQLiteKb
+        from reloop.languages.rlp.rlp import numeric_predicate
+
+        self.logkb = SQLiteKb()
+        self.integer_test_data = random.randint(1, 100)
+
+        self.logkb.execute("CREATE TABLE unittest_int (x TEXT, z INTEGER NOT NULL)")
+        self.logkb.execute("INSERT INTO unittest_int VALUES ('a', ?), ('b', ?)", (self.integer_test_data, 0))
+        self.predicate = numeric_predicate("unittest_int", 1)
+
+    def tearDown(self):
+        self.logkb.connection.close()
+
+
+class SQLiteKBIntegerNumericPredicateTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        int_result = self.logkb.ask_predicate(self.predicate('a'))
+        self.assertEqual(self.integer_test_data, int_result[0][0], "The inserted data was " + str(self.integer_test_data) + " but was returned as " + str(int_result) + " by the SQLiteKb.")
+
+
+class SQLiteKBNotExistingTableTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        predicate = self.predicate('a')
+        predicate.name = "not_existing_predicate"
+        none_result = self.logkb.ask_predicate(predicate)
+        self.assertEqual(None, none_result, "Result was expected to be None but was " + str(none_result) + " instead.")
+
+
+class SQLiteKBAskPredicatesTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        from reloop.languages.rlp.rlp import Symbol
+        a, c = Symbol('a'), Symbol('c')
+        answers = self.logkb.ask_predicates(self.predicate, [(a,), (c,)])
+        self.assertEqual({(a,): [(self.integer_test_data,)]}, answers, "The bulk lookup returned " + str(answers))
+
+
+class SQLiteKBLoadFactsTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        import os
+        import tempfile
+        import numpy as np
+        from reloop.languages.rlp.rlp import Symbol, Integer, numeric_predicate
+
+        self.logkb.load_facts("unittest_cost", np.array([[1, 2, 50], [1, 3, 100]]), numeric=True)
+        answers = self.logkb.ask_predicates(numeric_predicate("unittest_cost", 2), [(Integer(1), Integer(3))])
+        self.assertEqual({(Integer(1), Integer(3)): [(100,)]}, answers, "The bulk lookup returned " + str(answers))
+
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as csv_file:
+            csv_file.write("a,b,5\na,c,0.5\n")
+        try:
+            self.logkb.load_csv("unittest_csv", path, numeric=True)
+        finally:
+            os.remove(path)
+        self.assertEqual([(0.5,)], self.logkb.ask_predicate(numeric_predicate("unittest_csv", 2)(Symbol('a'), Symbol('c'))))
+
+        self.logkb.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'unittest_cost'")
+        self.assertEqual(["unittest_cost_args", "unittest_cost_x1"], sorted(row[0] for row in self.logkb.cursor.fetchall()))
+
+
+class SQLiteKBAskTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        from reloop.languages.rlp.rlp import Symbol, Integer, sub_symbols, boolean_predicate
+
+        # constants are passed as parameters of the query, so they need no quoting
+        self.logkb.load_facts("unittest_edge", [("o'a", "b"), ("o'a", "c"), ("b", "c")])
+        self.logkb.load_facts("unittest_blocked", [("c",)])
+        X, Y = sub_symbols('X', 'Y')
+        edge = boolean_predicate("unittest_edge", 2)
+        blocked = boolean_predicate("unittest_blocked", 1)
+
+        answers = self.logkb.ask([Y], edge(Symbol("o'a"), Y) & ~blocked(Y))
+        self.assertEqual([(Symbol('b'),)], answers, "The query returned " + str(answers))
+
+        value = boolean_predicate("unittest_int", 2)
+        answers = self.logkb.ask([X], value(X, Y) & (Y >= Integer(1)))
+        self.assertEqual([(Symbol('a'),)], answers, "The query returned " + str(answers))
+
+
+class SQLiteKBAskTableTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        from reloop.languages.rlp.rlp import Symbol, Float, SubSymbol, VariableSubSymbol, boolean_predicate
+
+        X, Y = SubSymbol('X'), VariableSubSymbol('Y')
+        value = boolean_predicate("unittest_int", 2)
+        table = self.logkb.ask_table([X], value(X, Y), 2 * Y)
+
+        answers = sorted(zip([table.constants.value(index) for index in table.columns[0]], table.values), key=str)
+        self.assertEqual([(Symbol('a'), 2.0 * self.integer_test_data), (Symbol('b'), 0.0)], answers,
+                         "The query returned " + str(answers))
+
+        table = self.logkb.ask_table([], True, Float(3.0))
+        self.assertEqual(([], [3.0]), (table.columns, list(table.values)))
+
+
+class SQLiteKBOptimizedQueriesTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        from sympy import Or
+        from reloop.languages.rlp.logkb import SQLiteKb
+        from reloop.languages.rlp.rlp import Symbol, sub_symbols, boolean_predicate
+
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        edge = boolean_predicate("unittest_edge", 2)
+        node = boolean_predicate("unittest_node", 1)
+        blocked = boolean_predicate("unittest_blocked", 1)
+        queries = [([X], node(X) & ~blocked(X)),
+                   ([X, Z], edge(X, Y) & edge(Y, Z) & ~edge(Y, Y)),
+                   ([Y], node(Y) & edge(Symbol('a'), Y)),
+                   ([X, Y], Or(edge(X, Y) & blocked(Y), edge(X, Y) & ~blocked(Y))),
+                   ([X], Or(edge(X, Y), blocked(X) & node(X))),
+                   ([X, Y], node(X) & node(Y) & edge(X, Y) & (X != Y))]
+
+        optimized = SQLiteKb(optimize_queries=True)
+        for logkb in (self.logkb, optimized):
+            logkb.execute("CREATE TABLE unittest_node (x TEXT PRIMARY KEY)")
+            logkb.cursor.executemany("INSERT INTO unittest_node VALUES (?)", [(name,) for name in "abcde"])
+            logkb.load_facts("unittest_edge", [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e"), ("e", "e")])
+            logkb.load_facts("unittest_blocked", [("c",)])
+
+        for query_symbols, logical_query in queries:
+            expected = sorted(self.logkb.ask(query_symbols, logical_query), key=str)
+            answers = sorted(optimized.ask(query_symbols, logical_query), key=str)
+            self.assertEqual(expected, answers, "The optimized query of " + str(logical_query) + " returned " +
+                             str(answers))
+
+        self.assertEqual([("x",)], optimized.unique_keys("unittest_node"))
+        sql = optimized.render_query([X], node(X) & ~blocked(X), None)[0]
+        self.assertNotIn("DISTINCT", sql)
+        self.assertIn("LEFT JOIN", sql)
+        sql = optimized.render_query(*queries[3] + (None,))[0]
+        self.assertIn("UNION ALL", sql)
+        optimized.connection.close()
+
+
+class SQLiteKBStagingTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        from reloop.languages.rlp.rlp import Symbol, Integer, sub_symbols, boolean_predicate, numeric_predicate
+
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        edge = boolean_predicate("unittest_edge", 2)
+        blocked = boolean_predicate("unittest_blocked", 1)
+        cost = numeric_predicate("unittest_cost", 2)
+        edges = [("n" + str(x), "n" + str(x + step)) for x in range(20) for step in (1, 2)]
+        self.logkb.load_facts("unittest_edge", edges)
+        self.logkb.load_facts("unittest_blocked", [("n3",), ("n8",)])
+        self.logkb.load_facts("unittest_cost", [(x, y, len(y)) for x, y in edges], numeric=True)
+
+        bindings = [{X: Symbol("n" + str(x)), Z: Integer(x)} for x in range(25)] + [{X: Symbol("n1"), Z: Integer(0)}]
+        expected = [sorted(self.logkb.ask([Y], edge(binding[X], Y) & ~blocked(Y)), key=str) for binding in bindings]
+        statements = self.logkb.statements
+        answers = self.logkb.ask_bound([Y], edge(X, Y) & ~blocked(Y), bindings)
+        self.assertEqual(expected, [sorted(answer, key=str) for answer in answers])
+        self.assertEqual(3 + 1, self.logkb.statements - statements, "The bindings were not staged")
+
+        args_list = [tuple(Symbol(arg) for arg in args) for args in edges] + [(Symbol("n0"), Symbol("n0"))]
+        answers = self.logkb.ask_predicates(cost, args_list)
+        self.assertEqual(dict((args, [(len(str(args[1])),)]) for args in args_list[:-1]), answers)
+
+        self.logkb.execute("SELECT name FROM sqlite_temp_master")
+        self.assertEqual([], self.logkb.cursor.fetchall())
+
+
+class SQLiteKBFailedStagingTestCase(SQLiteLogKBTest):
+    def runTest(self):
+        from reloop.languages.rlp.rlp import Symbol
+
+        def failing_query(query, parameters=None):
+            raise ValueError("join failed")
+
+        args_list = [(Symbol(arg),) for arg in "abcdefghijkl"]
+        query = self.logkb.query
+        self.logkb.query = failing_query
+        self.assertRaisesRegexp(ValueError, "join failed", self.logkb.ask_predicates, self.predicate, args_list)
+        self.logkb.query = query
+
+        # the staged table was dropped, such that the next argument tuples can be staged the same way
+        self.logkb.execute("SELECT name FROM sqlite_temp_master")
+        self.assertEqual([], self.logkb.cursor.fetchall())
+        answers = self.logkb.ask_predicates(self.predicate, args_list)
+        self.assertEqual({(Symbol("a"),): [(self.integer_test_data,)], (Symbol("b"),): [(0,)]},
+                         dict((args, values) for args, values in answers.items() if values))
+
+
+class NumpyKBTest(unittest.TestCase):
+    def setUp(self):
+        import numpy as np
+        from reloop.languages.rlp.logkb import NumpyKb
+
+        self.logkb = NumpyKb()
+        self.logkb.load_facts("edge", [("a", "b"), ("a", "c"), ("b", "c"), ("c", "c"), ("a", "b")])
+        self.logkb.load_facts("cost", [("a", "b", 50), ("a", "c", 100), ("b", "c", 40), ("c", "c", 1)])
+        self.logkb.load_facts("blocked", [("c",)])
+        self.logkb.load_facts("num", np.arange(1, 10).reshape(-1, 1))
+
+
+class NumpyKBAskTestCase(NumpyKBTest):
+    def runTest(self):
+        from sympy import Or, Ne, Symbol
+        from reloop.languages.rlp import sub_symbols, boolean_predicate
+        print("Testing NumpyKb queries...")
+        a, b, c = Symbol('a'), Symbol('b'), Symbol('c')
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        edge = boolean_predicate("edge", 2)
+        blocked = boolean_predicate("blocked", 1)
+        num = boolean_predicate("num", 1)
+
+        self.assertEqual([(a, b), (a, c), (b, c), (c, c)], self.logkb.ask([X, Y], edge(X, Y)))
+        self.assertEqual([(c,)], self.logkb.ask([X], edge(X, X)))
+        self.assertEqual([(b,)], self.logkb.ask([Y], edge(a, Y) & ~blocked(Y)))
+        self.assertEqual([(a,), (b,)], self.logkb.ask([X], edge(X, Y) & Ne(X, Y) & blocked(Y)))
+        self.assertEqual([(a, c)], self.logkb.ask([X, Z], edge(X, Y) & edge(Y, Z) & ~edge(Y, Y)))
+        self.assertEqual([(4,)], self.logkb.ask([X], num(X) & num(Y) & (X > 3) & (X * 2 <= Y)))
+        self.assertEqual([(1,), (9,)], sorted(self.logkb.ask([X], Or(num(X) & (X < 2), num(X) & (X > 8)))))
+        self.assertEqual([], self.logkb.ask([X], edge(X, Symbol('z'))))
+        print("...OK")
+
+
+class NumpyKBAskTableTestCase(NumpyKBTest):
+    def runTest(self):
+        from reloop.languages.rlp import SubSymbol, VariableSubSymbol, boolean_predicate, numeric_predicate
+        from sympy import Symbol
+        print("Testing NumpyKb answer tables and predicate lookups...")
+        a, b, c = Symbol('a'), Symbol('b'), Symbol('c')
+        X, V = SubSymbol('X'), VariableSubSymbol('V')
+        cost = boolean_predicate("cost", 3)
+
+        table = self.logkb.ask_table([X], cost(X, c, V), V / 4)
+        self.assertIs(self.logkb.constants, table.constants)
+        answers = zip([table.constants.value(index) for index in table.columns[0]], table.values)
+        self.assertEqual([(a, 25.0), (b, 10.0), (c, 0.25)], answers)
+
+        table = self.logkb.ask_table([], True, 3)
+        self.assertEqual(([], [3.0]), (table.columns, list(table.values)))
+
+        cost = numeric_predicate("cost", 2)
+        self.assertEqual([(100,)], self.logkb.ask_predicate(cost(a, c)))
+        self.assertEqual([], self.logkb.ask_predicate(cost(c, a)))
+        self.assertEqual({(a, b): [(50,)], ('b', 'c'): [(40,)]},
+                         self.logkb.ask_predicates(cost, [(a, b), ('b', 'c'), (a, Symbol('z'))]))
+
+        fingerprint = self.logkb.fingerprint()
+        self.logkb.load_facts("cost", [("c", "a", 10)])
+        self.assertEqual([(10,)], self.logkb.ask_predicate(cost(c, a)))
+        self.assertNotEqual(fingerprint, self.logkb.fingerprint())
+        print("...OK")
+
+
+class NumpyKBRulesTestCase(NumpyKBTest):
+    def runTest(self):
+        from sympy import Symbol
+        from reloop.languages.rlp import sub_symbols, boolean_predicate
+        print("Testing NumpyKb rules and their maintenance...")
+        a, b, c, d = Symbol('a'), Symbol('b'), Symbol('c'), Symbol('d')
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        edge = boolean_predicate("edge", 2)
+        blocked = boolean_predicate("blocked", 1)
+        path = boolean_predicate("path", 2)
+        free = boolean_predicate("free", 1)
+
+        self.logkb.add_rule(path(X, Y), edge(X, Y))
+        self.logkb.add_rule(path(X, Z), path(X, Y) & edge(Y, Z))
+        self.logkb.add_rule(free(Y), path(a, Y) & ~blocked(Y))
+        self.assertEqual([(a, b), (a, c), (b, c), (c, c)], sorted(self.logkb.ask([X, Y], path(X, Y)), key=str))
+        self.assertEqual([(b,)], self.logkb.ask([Y], free(Y)))
+
+        self.logkb.load_facts("edge", [("c", "d")])
+        self.assertEqual([b, c, d], sorted((answer[0] for answer in self.logkb.ask([Y], path(a, Y))), key=str))
+        self.assertEqual([(b,), (d,)], sorted(self.logkb.ask([Y], free(Y)), key=str))
+
+        self.logkb.retract_facts("edge", [("a", "c"), ("z", "a")])
+        self.assertEqual([b, c, d], sorted((answer[0] for answer in self.logkb.ask([Y], path(a, Y))), key=str))
+        self.logkb.retract_facts("edge", [("b", "c")])
+        self.assertEqual([(a, b), (c, c), (c, d)], sorted(self.logkb.ask([X, Y], path(X, Y)), key=str))
+
+        self.logkb.retract_facts("blocked", [("c",)])
+        self.logkb.load_facts("path", [("a", "c")])
+        self.assertEqual([b, c, d], sorted((answer[0] for answer in self.logkb.ask([Y], free(Y))), key=str))
+        self.assertRaises(ValueError, self.logkb.add_rule, blocked(X), path(X, X) & ~free(X))
+        self.assertEqual([(c,)], self.logkb.ask([X], path(X, X)))
+        print("...OK")
+
+
 class PyDatalogAskTestCase(PyDatalogLogKBTest):
     def runTest(self):
         from reloop.languages.rlp.logkb import PyDatalogLogKb
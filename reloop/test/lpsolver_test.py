@@ -0,0 +1,71 @@
+import unittest
+import numpy as np
+import scipy.sparse as sp
+from reloop.solvers.lpsolver import CvxoptSolver
+
+
+def transport_lp(supply):
+    # min x1 + 2 x2 + 3 x3  s.t.  x1 + x2 + x3 = supply,  0 <= x <= 2
+    c = np.matrix([[1.0], [2.0], [3.0]])
+    g = sp.coo_matrix(np.vstack((-np.eye(3), np.eye(3))))
+    h = np.matrix([[0.0]] * 3 + [[2.0]] * 3)
+    a = sp.coo_matrix(np.ones((1, 3)))
+    b = np.matrix([[supply]])
+    return c, g, h, a, b
+
+
+class TestCvxoptSolver(unittest.TestCase):
+    def test_dense(self):
+        sparse_solution = CvxoptSolver(dense=False).solve(*transport_lp(3.0))
+        dense_solution = CvxoptSolver(dense=True).solve(*transport_lp(3.0))
+
+        np.testing.assert_allclose(np.array(sparse_solution).ravel(), [2.0, 1.0, 0.0], atol=1e-5)
+        np.testing.assert_allclose(np.array(dense_solution).ravel(), [2.0, 1.0, 0.0], atol=1e-5)
+
+    def test_solve_batch(self):
+        supplies = [1.0, 3.0, 5.0]
+        expected = [[1.0, 0.0, 0.0], [2.0, 1.0, 0.0], [2.0, 2.0, 1.0]]
+
+        solver = CvxoptSolver()
+        solutions = solver.solve_batch((transport_lp(supply) for supply in supplies), warm_start=True)
+        for solution, expected_solution in zip(solutions, expected):
+            np.testing.assert_allclose(np.array(solution).ravel(), expected_solution, atol=1e-5)
+
+    def test_warm_start(self):
+        from pyDatalog import pyDatalog
+        from reloop.languages.rlp import RlpProblem, LpMinimize, ForAll, RlpSum, eq, sub_symbols, numeric_predicate, \
+            boolean_predicate
+        from reloop.languages.rlp.grounding.block import BlockGrounder
+        from reloop.languages.rlp.logkb import PyDatalogLogKb
+
+        pyDatalog.assert_fact('ws_item', 'a')
+        pyDatalog.assert_fact('ws_item', 'b')
+        pyDatalog.assert_fact('ws_cost', 'a', 1)
+        pyDatalog.assert_fact('ws_cost', 'b', 2)
+
+        X = sub_symbols('X')
+        amount = numeric_predicate("ws_amount", 1)
+        cost = numeric_predicate("ws_cost", 1)
+        item = boolean_predicate("ws_item", 1)
+
+        model = RlpProblem("warm start", LpMinimize, BlockGrounder(PyDatalogLogKb()), CvxoptSolver())
+        model.add_reloop_variable(amount)
+        model += RlpSum([X], item(X), cost(X) * amount(X))
+        model += RlpSum([X], item(X), amount(X)) |eq| 3.0
+        model += ForAll([X], item(X), amount(X) >= 0)
+        model += ForAll([X], item(X), amount(X) <= 2)
+
+        model.solve()
+        solution = model.get_solution()
+        model.solve(warm_start=solution)
+        warm_solution = model.get_solution()
+
+        for variable, value in solution.items():
+            self.assertAlmostEqual(value, warm_solution[variable], places=5)
+        self.assertAlmostEqual(warm_solution[amount('a')], 2.0, places=5)
+        self.assertEqual(model.status(), "optimal")
+        self.assertAlmostEqual(model.get_objective_value(), 4.0, places=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
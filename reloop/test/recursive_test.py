@@ -87,5 +87,114 @@ class TestRecursiveGrounder(unittest.TestCase):
 
     def test_sudoku(self):
         pass
+
+    def test_sqlite_staging(self):
+        from sql_test import maxflow_kb
+        from block_test import canonical_lp
+        from reloop.languages.rlp import RlpProblem, LpMaximize, ForAll, RlpSum, sub_symbols, numeric_predicate, \
+            boolean_predicate
+
+        X, Y, Z = sub_symbols('X', 'Y', 'Z')
+        flow = numeric_predicate("flow", 2)
+        cost = numeric_predicate("cost", 2)
+        edge = boolean_predicate("edge", 2)
+        node = boolean_predicate("node", 1)
+        source = boolean_predicate("source", 1)
+
+        lps = []
+        for staging_threshold in (1, 1000):
+            logkb = maxflow_kb()
+            logkb.staging_threshold = staging_threshold
+            grounder = RecursiveGrounder(logkb)
+            model = RlpProblem("staged maxflow", LpMaximize, grounder, None)
+            model.add_reloop_variable(flow)
+            model += RlpSum([X, Y], source(X) & edge(X, Y), flow(X, Y))
+            model += ForAll([Z], node(Z) & ~source(Z), RlpSum([X], edge(X, Z), flow(X, Z)) >= 0)
+            model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= cost(X, Y))
+            lp, varmap = grounder.ground(model)
+            lps.append(canonical_lp(lp, varmap, model))
+
+        self.assertEqual(lps[0], lps[1])
+
+    def test_affine_template(self):
+        from pyDatalog import pyDatalog
+        from reloop.languages.rlp import RlpProblem, LpMinimize, ForAll, RlpSum, sub_symbols, numeric_predicate, \
+            boolean_predicate
+        from reloop.languages.rlp.logkb import PyDatalogLogKb
+
+        pyDatalog.assert_fact('aff_edge', 'a', 'b')
+        pyDatalog.assert_fact('aff_edge', 'a', 'c')
+        pyDatalog.assert_fact('aff_cost', 'a', 'b', 2)
+        pyDatalog.assert_fact('aff_cost', 'a', 'c', 4)
+
+        X, Y = sub_symbols('X', 'Y')
+        flow = numeric_predicate("aff_flow", 2)
+        cost = numeric_predicate("aff_cost", 2)
+        edge = boolean_predicate("aff_edge", 2)
+
+        grounder = RecursiveGrounder(PyDatalogLogKb())
+        model = RlpProblem("affine", LpMinimize, grounder, None)
+        model.add_reloop_variable(flow)
+        model += RlpSum([X, Y], edge(X, Y), cost(X, Y) * flow(X, Y)) + 1
+        model += ForAll([X], edge(X, 'b'), RlpSum([Y], edge(X, Y), 0.5 * flow(X, Y)) >= cost(X, 'b') - 1)
+        model += ForAll([X, Y], edge(X, Y), 2 * flow(X, Y) <= cost(X, Y) + flow(X, Y))
+
+        (c, g, h, a, b), varmap = grounder.ground(model)
+        columns = [tuple(str(arg) for arg in args) for args in varmap[flow]]
+        ab, ac = columns.index(('a', 'b')), columns.index(('a', 'c'))
+
+        self.assertEqual((c[ab, 0], c[ac, 0]), (2, 4))
+        rows = sorted((tuple(g.toarray()[i, [ab, ac]]), h[i, 0]) for i in range(g.shape[0]))
+        self.assertEqual(rows, [((-0.5, -0.5), -1), ((0, 1), 4), ((1, 0), 2)])
+        self.assertEqual(a.shape[0], 0)
+
+    def test_lp_problem(self):
+        from reloop.languages.rlp import RlpProblem, LpMinimize, numeric_predicate
+        from reloop.languages.rlp.grounding.recursive import LpProblem
+
+        x = numeric_predicate("lpp_x", 1)
+        y = numeric_predicate("lpp_y", 1)
+        model = RlpProblem("lp problem", LpMinimize, None, None)
+        model.add_reloop_variable(x, y)
+
+        lp = LpProblem(LpMinimize)
+        # the factors of x(a), which occurs twice, are merged into a single entry
+        lp.add_affine_constraint([((x, ('a',)), 1.0), ((y, ('a',)), 2.0), ((x, ('a',)), 3.0)], 1, 0)
+        lp.add_affine_constraint([((y, ('b',)), 1.0), ((x, ('a',)), 0.0)], 2, 1)
+        lp.add_affine_constraint([((x, ('b',)), 1.0), ((y, ('a',)), -1.0)], 0, -1)
+        lp.add_affine_objective([((x, ('a',)), 1.0), ((y, ('b',)), 1.0)])
+
+        c, g, h, a, b = lp.get_scipy_matrices(model)
+        columns = [(predicate, str(args[0])) for predicate in model.reloop_variables
+                   for args in lp.lp_variables[predicate]]
+        order = [columns.index(column) for column in [(x, 'a'), (x, 'b'), (y, 'a'), (y, 'b')]]
+
+        self.assertEqual(a.toarray()[:, order].tolist(), [[4, 0, 2, 0]])
+        self.assertEqual(a.nnz, 2)
+        self.assertEqual(b.tolist(), [[1]])
+        self.assertEqual(g.toarray()[:, order].tolist(), [[0, 1, -1, 0], [0, 0, 0, -1]])
+        self.assertEqual(h.tolist(), [[0], [-2]])
+        self.assertEqual(c[order].tolist(), [[1], [0], [0], [1]])
+        self.assertEqual(g.nnz, 3)
+
+    def test_triplets(self):
+        from reloop.languages.rlp import numeric_predicate
+        from reloop.languages.rlp.grounding.recursive import Triplets
+
+        x = numeric_predicate("trp_x", 1)
+        y = numeric_predicate("trp_y", 1)
+
+        triplets = Triplets()
+        triplets.append([(x, 0, 2.0), (y, 1, 0.0)], 5)
+        triplets.append([(y, 0, -1.0), (x, 1, 3.0)], 6)
+        self.assertEqual(len(triplets), 2)
+        self.assertEqual(triplets.rhs, [5, 6])
+
+        # the columns of y follow the two columns of x, zero factors are dropped
+        rows, columns, factors = triplets.entries({x: 0, y: 2})
+        self.assertEqual(rows.tolist(), [0, 1, 1])
+        self.assertEqual(columns.tolist(), [0, 2, 1])
+        self.assertEqual(factors.tolist(), [2.0, -1.0, 3.0])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,113 @@
+import unittest
+from block_test import canonical_lp
+from reloop.languages.rlp.grounding.block import BlockGrounder
+from reloop.languages.rlp.grounding.sql import SQLGrounder
+from reloop.solvers.lpsolver import CvxoptSolver
+
+
+def maxflow_kb():
+    from reloop.languages.rlp.logkb import SQLiteKb
+
+    logkb = SQLiteKb()
+    logkb.execute("CREATE TABLE node (x TEXT)")
+    logkb.execute("CREATE TABLE edge (x TEXT, y TEXT)")
+    logkb.execute("CREATE TABLE source (x TEXT)")
+    logkb.execute("CREATE TABLE target (x TEXT)")
+    logkb.execute("CREATE TABLE cost (x TEXT, y TEXT, z INTEGER)")
+
+    costs = [('a', 'b', 50), ('a', 'c', 100), ('b', 'd', 40), ('b', 'e', 20), ('c', 'd', 60), ('c', 'f', 20),
+             ('d', 'e', 50), ('d', 'f', 60), ('e', 'g', 70), ('f', 'g', 70)]
+    logkb.cursor.executemany("INSERT INTO node VALUES (?)", [(node,) for node in "abcdefg"])
+    logkb.cursor.executemany("INSERT INTO edge VALUES (?, ?)", [(x, y) for x, y, z in costs])
+    logkb.cursor.executemany("INSERT INTO cost VALUES (?, ?, ?)", costs)
+    logkb.execute("INSERT INTO source VALUES ('a')")
+    logkb.execute("INSERT INTO target VALUES ('g')")
+    return logkb
+
+
+def maxflow(grounder):
+    from reloop.languages.rlp import RlpProblem, LpMaximize, ForAll, RlpSum, sub_symbols, numeric_predicate, \
+        boolean_predicate
+
+    X, Y, Z = sub_symbols('X', 'Y', 'Z')
+    flow = numeric_predicate("flow", 2)
+    slack = numeric_predicate("slack", 0)
+    cost = numeric_predicate("cost", 2)
+    source = boolean_predicate("source", 1)
+    target = boolean_predicate("target", 1)
+    edge = boolean_predicate("edge", 2)
+    node = boolean_predicate("node", 1)
+
+    model = RlpProblem("maxflow", LpMaximize, grounder, CvxoptSolver())
+    model.add_reloop_variable(flow, slack)
+
+    model += RlpSum([X, Y], source(X) & edge(X, Y), flow(X, Y)) - slack()
+
+    outFlow = RlpSum([X, ], edge(X, Z), flow(X, Z))
+    inFlow = RlpSum([Y, ], edge(Z, Y), flow(Z, Y))
+    model += ForAll([Z, ], node(Z) & ~source(Z) & ~target(Z), inFlow >= outFlow)
+    model += ForAll([Z, ], node(Z) & ~source(Z) & ~target(Z), inFlow <= outFlow)
+
+    model += ForAll([X, Y], edge(X, Y), flow(X, Y) >= 0)
+    model += ForAll([X, Y], edge(X, Y), flow(X, Y) <= cost(X, Y))
+    model += ForAll([X], source(X), flow(X, 'b') + slack() <= 30)
+    model += slack() >= 0
+    return model
+
+
+class TestSQLGrounder(unittest.TestCase):
+    def test_sqlite(self):
+        grounder = SQLGrounder(maxflow_kb(), chunk_size=4)
+        model = maxflow(grounder)
+        lp, varmap = grounder.ground(model)
+
+        block_model = maxflow(BlockGrounder(maxflow_kb()))
+        block_lp, block_varmap = block_model.grounder.ground(block_model)
+        self.assertEqual(canonical_lp(lp, varmap, model), canonical_lp(block_lp, block_varmap, block_model))
+
+        # the temporary tables are dropped after grounding
+        grounder.logkb.execute("SELECT name FROM sqlite_temp_master")
+        self.assertEqual(grounder.logkb.cursor.fetchall(), [])
+
+        model.solve()
+        self.assertEqual(model.status(), "optimal")
+        self.assertAlmostEqual(model.get_objective_value(), 110.0, places=4)
+
+    def test_sqlite_optimized_queries(self):
+        logkb = maxflow_kb()
+        logkb.optimize_queries = True
+        grounder = SQLGrounder(logkb, chunk_size=4)
+        model = maxflow(grounder)
+        lp, varmap = grounder.ground(model)
+
+        block_model = maxflow(BlockGrounder(maxflow_kb()))
+        block_lp, block_varmap = block_model.grounder.ground(block_model)
+        self.assertEqual(canonical_lp(lp, varmap, model), canonical_lp(block_lp, block_varmap, block_model))
+
+    def test_sqlite_failed_summand(self):
+        logkb = maxflow_kb()
+        execute, discard_transaction = logkb.execute, logkb.discard_transaction
+        rollbacks = []
+
+        def failing_execute(query, parameters=None):
+            if query.startswith("CREATE TEMPORARY TABLE reloop_summand_2 "):
+                raise ValueError("summand failed")
+            execute(query, parameters)
+
+        def counted_discard_transaction():
+            rollbacks.append(True)
+            discard_transaction()
+
+        logkb.execute, logkb.discard_transaction = failing_execute, counted_discard_transaction
+        grounder = SQLGrounder(logkb)
+        self.assertRaisesRegexp(ValueError, "summand failed", grounder.ground, maxflow(grounder))
+        self.assertEqual([True], rollbacks)
+
+        # the tables created before the failure are dropped after the rollback
+        logkb.execute("SELECT name FROM sqlite_temp_master")
+        self.assertEqual(logkb.cursor.fetchall(), [])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
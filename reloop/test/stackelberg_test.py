@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+
+STACKELBERG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "RLP", "stackelberg")
+
+
+class TestDobss(unittest.TestCase):
+    def test_parallel(self):
+        import cvxopt
+        from pyDatalog import pyDatalog
+        from reloop.languages.rlp.grounding.block import BlockGrounder
+        from reloop.languages.rlp.logkb import PyDatalogLogKb
+        from reloop.solvers.lpsolver import CvxoptSolver
+
+        # the DOBSS example imports its helpers from its own directory
+        sys.path.insert(0, STACKELBERG)
+        try:
+            import DOBSS
+        finally:
+            sys.path.remove(STACKELBERG)
+
+        cvxopt.solvers.options["show_progress"] = False
+        for action in ("l1", "l2"):
+            pyDatalog.assert_fact("leaderAction", action)
+        for action in ("f1", "f2"):
+            pyDatalog.assert_fact("followerAction", action)
+        pyDatalog.assert_fact("followerOccurrence", "t1", 0.7)
+        pyDatalog.assert_fact("followerOccurrence", "t2", 0.3)
+        utilities = {("t1", "l1", "f1"): (5, 1), ("t1", "l1", "f2"): (1, 2), ("t1", "l2", "f1"): (3, 4),
+                     ("t1", "l2", "f2"): (2, 1), ("t2", "l1", "f1"): (4, 3), ("t2", "l1", "f2"): (0, 1),
+                     ("t2", "l2", "f1"): (1, 0), ("t2", "l2", "f2"): (6, 2)}
+        for key, (leader, follower) in utilities.items():
+            pyDatalog.assert_fact("leaderUtility", *(key + (leader,)))
+            pyDatalog.assert_fact("followerUtility", *(key + (follower,)))
+
+        grounder = lambda logkb: BlockGrounder(logkb, incremental=True)
+        solver = lambda: CvxoptSolver()
+        state, value = DOBSS.solve_dobss_subproblems(grounder, PyDatalogLogKb(), solver)
+        self.assertIsNotNone(value)
+
+        # the best state is enumerated first and the enumerated states are counted, with a backlog of one state they
+        # are the solved states
+        enum_states = DOBSS.enumStates
+        solved = []
+
+        def counted_states(fTypes, fActions):
+            for next_state in sorted(enum_states(fTypes, fActions), key=lambda s: sorted(s) != sorted(state)):
+                solved.append(next_state)
+                yield next_state
+
+        DOBSS.enumStates = counted_states
+        try:
+            # without an attainable upper bound all states are solved, the last improvement is the best one
+            improvements = list(DOBSS.solve_dobss_parallel(grounder, PyDatalogLogKb(), solver, processes=2,
+                                                           upper_bound=float("inf"), backlog=1))
+            self.assertEqual(sorted(improvements[-1][0]), sorted(state))
+            self.assertAlmostEqual(improvements[-1][1], value, places=5)
+            unbounded = len(solved)
+
+            # the upper bound stops the enumeration at the first state attaining it
+            del solved[:]
+            improvements = list(DOBSS.solve_dobss_parallel(grounder, PyDatalogLogKb(), solver, processes=2,
+                                                           upper_bound=value, backlog=1))
+            self.assertAlmostEqual(improvements[-1][1], value, places=5)
+            self.assertEqual(1, len(solved))
+            self.assertLess(len(solved), unbounded)
+        finally:
+            DOBSS.enumStates = enum_states
+
+
+if __name__ == '__main__':
+    unittest.main()